@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from app.painel import consolidar
+
+
+class Command(BaseCommand):
+    help = (
+        "Soma as pendências de Painel_pendentes às tabelas Painel_* do painel. "
+        "Deve ser agendado com frequência (ex.: a cada minuto)."
+    )
+
+    def handle(self, *args, **options):
+        somadas = consolidar()
+
+        if somadas is None:
+            self.stdout.write("Outra consolidação está em andamento")
+            return
+        self.stdout.write(self.style.SUCCESS(f"{somadas} pendências consolidadas"))
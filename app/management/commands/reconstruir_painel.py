@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from biblioteca.db import execute
+
+
+class Command(BaseCommand):
+    help = "Recalcula do zero as tabelas Painel_* do painel da página inicial"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for tabela in ['Painel_pendentes', 'Painel_dia', 'Painel_livros', 'Painel_generos', 'Painel_situacao']:
+                execute(f"DELETE FROM {tabela}")
+
+            execute("""
+                INSERT INTO Painel_dia (Dia, Emprestimos)
+                SELECT Data_emprestimo, COUNT(*)
+                FROM Emprestimos
+                WHERE Data_emprestimo IS NOT NULL
+                GROUP BY Data_emprestimo
+            """)
+
+            execute("""
+                INSERT INTO Painel_dia (Dia, Devolucoes)
+                SELECT Data_devolucao_real, COUNT(*)
+                FROM Emprestimos
+                WHERE Status_emprestimo = 'devolvido' AND Data_devolucao_real IS NOT NULL
+                GROUP BY Data_devolucao_real
+                ON DUPLICATE KEY UPDATE Devolucoes = VALUES(Devolucoes)
+            """)
+
+            # Mesma regra de painel_anotar: marcado 'atrasado' ou devolvido
+            # depois da data prevista, contado no dia seguinte a ela
+            execute("""
+                INSERT INTO Painel_dia (Dia, Atrasos)
+                SELECT DATE_ADD(Data_devolucao_prevista, INTERVAL 1 DAY), COUNT(*)
+                FROM Emprestimos
+                WHERE Data_devolucao_prevista IS NOT NULL
+                  AND (Status_emprestimo = 'atrasado'
+                       OR (Status_emprestimo = 'devolvido'
+                           AND Data_devolucao_real > Data_devolucao_prevista))
+                GROUP BY Data_devolucao_prevista
+                ON DUPLICATE KEY UPDATE Atrasos = VALUES(Atrasos)
+            """)
+
+            execute("""
+                INSERT INTO Painel_livros (Livro_id, Emprestimos)
+                SELECT Livro_id, COUNT(*) FROM Emprestimos
+                WHERE Livro_id IS NOT NULL
+                GROUP BY Livro_id
+            """)
+
+            execute("""
+                INSERT INTO Painel_generos (Genero_id, Emprestimos)
+                SELECT Livros.Genero_id, COUNT(*)
+                FROM Emprestimos
+                JOIN Livros ON Emprestimos.Livro_id = Livros.ID_livro
+                WHERE Livros.Genero_id IS NOT NULL
+                GROUP BY Livros.Genero_id
+            """)
+
+            execute("""
+                INSERT INTO Painel_situacao (Status_emprestimo, Total)
+                SELECT Status_emprestimo, COUNT(*)
+                FROM Emprestimos
+                WHERE Status_emprestimo IS NOT NULL
+                GROUP BY Status_emprestimo
+            """)
+
+        self.stdout.write(self.style.SUCCESS("Painel recalculado"))
@@ -0,0 +1,83 @@
+"""
+Consolidação do painel da página inicial.
+
+Os triggers painel_emprestimos_* só acrescentam linhas a Painel_pendentes
+(a contribuição antiga de um empréstimo com Sinal -1 e a nova com +1), sem
+travar linhas de contador na transação do empréstimo. consolidar() soma
+essas pendências aos Painel_* e as apaga; roda pelo comando
+consolidar_painel, agendado no cron (ex.: a cada minuto), uma sessão por
+vez (GET_LOCK). A página inicial só lê os Painel_*, que ficam atrasados
+no máximo um intervalo do agendamento.
+
+As pendências a somar são travadas com SELECT ... FOR UPDATE antes das
+somas, então uma linha ainda não confirmada por outra sessão é esperada,
+e não pulada nem apagada sem ser somada.
+"""
+from django.db import transaction
+
+from biblioteca.db import query, execute
+
+
+TRAVA = 'painel_consolidar'
+
+
+def consolidar():
+    """
+    Soma Painel_pendentes aos agregados Painel_*. Retorna quantas pendências
+    foram somadas, ou None se outra sessão já está consolidando.
+    """
+    if not query("SELECT GET_LOCK(%s, 0) AS ok", [TRAVA])[0].ok:
+        return None
+    try:
+        with transaction.atomic():
+            ate = query("SELECT MAX(ID_pendente) AS id FROM Painel_pendentes")[0].id
+            if ate is None:
+                return 0
+            query("SELECT COUNT(*) AS total FROM Painel_pendentes WHERE ID_pendente <= %s FOR UPDATE", [ate])
+
+            for coluna, dia in [
+                ('Emprestimos', 'Dia_emprestimo'),
+                ('Devolucoes', 'Dia_devolucao'),
+                ('Atrasos', 'Dia_atraso'),
+            ]:
+                execute(f"""
+                    INSERT INTO Painel_dia (Dia, {coluna})
+                    SELECT {dia}, SUM(Sinal)
+                    FROM Painel_pendentes
+                    WHERE ID_pendente <= %s AND {dia} IS NOT NULL
+                    GROUP BY {dia}
+                    ON DUPLICATE KEY UPDATE {coluna} = {coluna} + VALUES({coluna})
+                """, [ate])
+
+            execute("""
+                INSERT INTO Painel_livros (Livro_id, Emprestimos)
+                SELECT Livro_id, SUM(Sinal)
+                FROM Painel_pendentes
+                WHERE ID_pendente <= %s AND Livro_id IS NOT NULL
+                GROUP BY Livro_id
+                ON DUPLICATE KEY UPDATE Emprestimos = Emprestimos + VALUES(Emprestimos)
+            """, [ate])
+
+            # Gênero atual do livro, como em reconstruir_painel
+            execute("""
+                INSERT INTO Painel_generos (Genero_id, Emprestimos)
+                SELECT Livros.Genero_id, SUM(Painel_pendentes.Sinal)
+                FROM Painel_pendentes
+                JOIN Livros ON Painel_pendentes.Livro_id = Livros.ID_livro
+                WHERE Painel_pendentes.ID_pendente <= %s AND Livros.Genero_id IS NOT NULL
+                GROUP BY Livros.Genero_id
+                ON DUPLICATE KEY UPDATE Emprestimos = Emprestimos + VALUES(Emprestimos)
+            """, [ate])
+
+            execute("""
+                INSERT INTO Painel_situacao (Status_emprestimo, Total)
+                SELECT Status_emprestimo, SUM(Sinal)
+                FROM Painel_pendentes
+                WHERE ID_pendente <= %s AND Status_emprestimo IS NOT NULL
+                GROUP BY Status_emprestimo
+                ON DUPLICATE KEY UPDATE Total = Total + VALUES(Total)
+            """, [ate])
+
+            return execute("DELETE FROM Painel_pendentes WHERE ID_pendente <= %s", [ate])
+    finally:
+        query("SELECT RELEASE_LOCK(%s) AS ok", [TRAVA])
@@ -1,7 +1,59 @@
 from django.shortcuts import render, redirect
-from django.db import connection
+from biblioteca.db import query
+
+
+DIAS_PAINEL = 30
+
 
 def index(request):
-    return render(request, 'base.html')
+    if not request.session.get('usuario_logado'):
+        return render(request, 'base.html')
+
+    # Só lê os agregados Painel_*, consolidados pelo comando consolidar_painel:
+    # o custo não cresce com o histórico nem com o volume de empréstimos
+    por_dia = query("""
+        SELECT Dia, Emprestimos, Devolucoes, Atrasos
+        FROM Painel_dia
+        WHERE Dia > DATE_SUB(CURDATE(), INTERVAL %s DAY)
+        ORDER BY Dia
+    """, [DIAS_PAINEL])
+
+    livros = query("""
+        SELECT Painel_livros.Livro_id, Catalogo.Titulo, Painel_livros.Emprestimos
+        FROM Painel_livros
+        JOIN Catalogo ON Painel_livros.Livro_id = Catalogo.ID_livro
+        ORDER BY Painel_livros.Emprestimos DESC
+        LIMIT 10
+    """)
+
+    generos = query("""
+        SELECT Generos.Nome_genero, Painel_generos.Emprestimos
+        FROM Painel_generos
+        JOIN Generos ON Painel_generos.Genero_id = Generos.ID_genero
+        ORDER BY Painel_generos.Emprestimos DESC
+        LIMIT 10
+    """)
+
+    situacao = {s.Status_emprestimo: s.Total for s in query(
+        "SELECT Status_emprestimo, Total FROM Painel_situacao"
+    )}
+
+    esgotados = query("""
+        SELECT ID_livro, Titulo
+        FROM Catalogo
+        WHERE Quantidade_disponivel <= 0
+        ORDER BY Quantidade_disponivel, ID_livro
+        LIMIT 10
+    """)
 
+    maximo = max((d.Emprestimos for d in por_dia), default=0)
 
+    return render(request, 'painel.html', {
+        'por_dia': por_dia,
+        'maximo': maximo,
+        'livros': livros,
+        'generos': generos,
+        'pendentes': situacao.get('pendente', 0),
+        'atrasados': situacao.get('atrasado', 0),
+        'esgotados': esgotados,
+    })
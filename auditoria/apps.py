@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def marcar_auditoria_aplicacao(sender, connection, **kwargs):
+    """Desliga os triggers de auditoria nas conexões do Django"""
+    with connection.cursor() as cursor:
+        cursor.execute("SET @auditoria_aplicacao = 1")
 
 
 class AuditoriaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'auditoria'
+
+    def ready(self):
+        if settings.AUDITORIA_MODO == 'aplicacao':
+            connection_created.connect(marcar_auditoria_aplicacao)
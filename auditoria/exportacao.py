@@ -0,0 +1,96 @@
+"""
+Exportação completa da Auditoria em CSV ou JSON Lines.
+
+As linhas são lidas com um cursor do lado do servidor (SSCursor) numa
+conexão dedicada, então a memória fica constante independente do volume
+exportado.
+"""
+import csv
+import json
+
+from django.db import connection
+from MySQLdb.cursors import SSCursor
+
+
+COLUNAS = [
+    'ID_auditoria',
+    'Tabela_afetada',
+    'Operacao',
+    'ID_registro',
+    'Usuario_sistema',
+    'Data_hora',
+    'Dados_antigos',
+    'Dados_novos',
+    'Campos_alterados',
+    'Descricao',
+]
+
+FORMATOS = ('csv', 'jsonl')
+
+LOTE = 1000
+
+
+def filtrar(tabela='', operacao='', dias=''):
+    """Monta o WHERE dos filtros de tabela, operação e período"""
+    sql = " WHERE 1=1"
+    params = []
+
+    if tabela:
+        sql += " AND Tabela_afetada = %s"
+        params.append(tabela)
+
+    if operacao:
+        sql += " AND Operacao = %s"
+        params.append(operacao)
+
+    if dias and str(dias).isdigit():
+        sql += " AND Data_hora >= DATE_SUB(NOW(), INTERVAL %s DAY)"
+        params.append(int(dias))
+
+    return sql, params
+
+
+def linhas(tabela='', operacao='', dias=''):
+    """Itera sobre as linhas filtradas sem carregar o resultado em memória"""
+    where, params = filtrar(tabela, operacao, dias)
+    sql = f"SELECT {', '.join(COLUNAS)} FROM Auditoria{where} ORDER BY ID_auditoria"
+
+    conexao = connection.get_new_connection(connection.get_connection_params())
+    try:
+        cursor = conexao.cursor(SSCursor)
+        cursor.execute(sql, params)
+        while True:
+            lote = cursor.fetchmany(LOTE)
+            if not lote:
+                break
+            yield from lote
+        cursor.close()
+    finally:
+        conexao.close()
+
+
+class _Eco:
+    """Buffer que apenas devolve o que o csv.writer escreve"""
+
+    def write(self, valor):
+        return valor
+
+
+def gerar_csv(registros):
+    writer = csv.writer(_Eco())
+    yield writer.writerow(COLUNAS)
+    for registro in registros:
+        yield writer.writerow(registro)
+
+
+def gerar_jsonl(registros):
+    for registro in registros:
+        yield json.dumps(dict(zip(COLUNAS, registro)), default=str, ensure_ascii=False) + '\n'
+
+
+def exportar(formato, tabela='', operacao='', dias=''):
+    """Gera o conteúdo da exportação no formato pedido, pedaço por pedaço"""
+    registros = linhas(tabela, operacao, dias)
+    if formato == 'jsonl':
+        return gerar_jsonl(registros)
+    return gerar_csv(registros)
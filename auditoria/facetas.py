@@ -0,0 +1,92 @@
+"""
+Lista de tabelas (Tabela_afetada) do filtro da auditoria.
+
+Em vez de um SELECT DISTINCT na tabela inteira a cada acesso, guarda no
+cache a lista junto com o maior ID_auditoria já visto e, no máximo a cada
+ATUALIZACAO segundos, olha só os registros novos desde então.
+
+A retenção (retencao.py) apaga os registros mais antigos, e com eles uma
+tabela pode sumir da auditoria: quando o menor ID_auditoria muda a lista
+é refeita do zero. Como o cache é por processo, isso vale também para a
+limpeza feita pelo comando purgar_auditoria; no próprio processo a
+retenção ainda chama invalidar().
+"""
+import time
+
+from django.core.cache import cache
+
+from biblioteca.db import query
+from biblioteca.db_async import aquery
+
+
+CHAVE = 'auditoria:tabelas'
+ATUALIZACAO = 60
+
+LIMITES = "SELECT MIN(ID_auditoria) AS primeiro, MAX(ID_auditoria) AS ultimo FROM Auditoria"
+
+NOVOS = """
+    SELECT DISTINCT Tabela_afetada
+    FROM Auditoria
+    WHERE ID_auditoria > %s AND ID_auditoria <= %s
+"""
+
+
+def invalidar():
+    """Descarta a lista guardada; ela é refeita no próximo acesso"""
+    cache.delete(CHAVE)
+
+
+def _valido(estado, agora):
+    return estado and agora - estado['verificado'] < ATUALIZACAO
+
+
+def _anterior(estado, limites):
+    """Estado a partir do qual continuar, ou None se houve remoção desde então"""
+    if estado and estado.get('primeiro') == limites.primeiro:
+        return estado
+    return None
+
+
+def _salvar(estado, limites, novos, agora):
+    nomes = set(estado['tabelas']) if estado else set()
+    nomes.update(r.Tabela_afetada for r in novos)
+    estado = {
+        'tabelas': sorted(nomes),
+        'primeiro': limites.primeiro,
+        'ultimo': limites.ultimo or 0,
+        'verificado': agora,
+    }
+    cache.set(CHAVE, estado, None)
+    return estado['tabelas']
+
+
+def tabelas():
+    """Nomes das tabelas com registros de auditoria, em ordem alfabética"""
+    estado = cache.get(CHAVE)
+    agora = time.time()
+
+    if _valido(estado, agora):
+        return estado['tabelas']
+
+    limites = query(LIMITES)[0]
+    estado = _anterior(estado, limites)
+    ultimo_visto = estado['ultimo'] if estado else 0
+    ultimo = limites.ultimo or 0
+    novos = query(NOVOS, [ultimo_visto, ultimo]) if ultimo > ultimo_visto else []
+    return _salvar(estado, limites, novos, agora)
+
+
+async def atabelas():
+    """Versão assíncrona de tabelas, sobre biblioteca.db_async"""
+    estado = cache.get(CHAVE)
+    agora = time.time()
+
+    if _valido(estado, agora):
+        return estado['tabelas']
+
+    limites = (await aquery(LIMITES))[0]
+    estado = _anterior(estado, limites)
+    ultimo_visto = estado['ultimo'] if estado else 0
+    ultimo = limites.ultimo or 0
+    novos = await aquery(NOVOS, [ultimo_visto, ultimo]) if ultimo > ultimo_visto else []
+    return _salvar(estado, limites, novos, agora)
@@ -0,0 +1,256 @@
+"""
+Auditoria pela aplicação: alternativa aos triggers *_audit_*.
+
+Com settings.AUDITORIA_MODO = 'aplicacao' as views registram os eventos
+de alteração aqui; cada evento é anotado (com fsync) num arquivo de spool
+local e colocado numa fila em memória. Uma thread gravadora junta os
+eventos e faz um INSERT de várias linhas em Auditoria a cada lote (ou a
+cada AUDITORIA_LOTE_ESPERA segundos).
+
+O spool de cada processo fica em AUDITORIA_SPOOL dividido em segmentos
+(<pid>-<n>.jsonl). Ao pegar um lote a gravadora fecha o segmento atual e
+leva junto tudo o que estava na fila, então o lote cobre exatamente os
+segmentos fechados; eles são apagados assim que o lote é confirmado no
+banco, mesmo que novos eventos continuem chegando. A numeração começa no
+instante (em ms) em que o processo sobe, então segmentos deixados por um
+processo anterior com o mesmo pid têm números menores.
+
+Antes do primeiro lote a gravadora regrava os segmentos de processos que
+não existem mais. Cada um é reivindicado com os.rename para
+<pid>-<nome>.recuperando, em nome deste processo: se dois processos
+disputam o mesmo segmento, só um consegue renomeá-lo. Um evento pode ser
+gravado duas vezes após uma queda, mas nunca perdido.
+
+Com AUDITORIA_MODO = 'trigger' (padrão) nada aqui é usado e os triggers
+continuam gravando a auditoria dentro da transação, como antes.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from biblioteca.db import execute, marcadores
+
+
+logger = logging.getLogger(__name__)
+
+CAMPOS = [
+    'Tabela_afetada',
+    'Operacao',
+    'ID_registro',
+    'Usuario_sistema',
+    'Data_hora',
+    'Dados_antigos',
+    'Dados_novos',
+    'Campos_alterados',
+    'Descricao',
+]
+
+_eventos = []
+_condicao = threading.Condition()
+# Uma gravação por vez (a gravadora ou o descarregar() do encerramento)
+_gravando = threading.Lock()
+_gravadora = None
+_segmento = 0
+_inicio = 0
+_arquivo = None
+
+
+def ativa():
+    return settings.AUDITORIA_MODO == 'aplicacao'
+
+
+def _spool(segmento, pid=None):
+    return os.path.join(settings.AUDITORIA_SPOOL, f'{pid or os.getpid()}-{segmento}.jsonl')
+
+
+def registrar(tabela, operacao, id_registro, dados_novos=None, dados_antigos=None,
+              campos_alterados=None, descricao=None, usuario=None):
+    """Enfileira um evento de auditoria (sem efeito no modo 'trigger')"""
+    if not ativa():
+        return
+
+    evento = [
+        tabela,
+        operacao,
+        id_registro,
+        usuario or settings.DATABASES['default']['USER'],
+        connection.ops.adapt_datetimefield_value(timezone.now()),
+        dados_antigos,
+        dados_novos,
+        campos_alterados,
+        descricao,
+    ]
+
+    # Só entra na fila se a transação da alteração for confirmada
+    transaction.on_commit(lambda: _enfileirar([evento]))
+
+
+def _anotar(eventos):
+    """Acrescenta os eventos ao segmento atual do spool (chamar com _condicao)"""
+    for evento in eventos:
+        _arquivo.write(json.dumps(evento, default=str, ensure_ascii=False) + '\n')
+    _arquivo.flush()
+    os.fsync(_arquivo.fileno())
+
+
+def _enfileirar(eventos):
+    iniciar()
+    with _condicao:
+        _anotar(eventos)
+        _eventos.extend(eventos)
+        _condicao.notify()
+
+
+def gravar(eventos):
+    """Grava os eventos em Auditoria, um INSERT por AUDITORIA_LOTE_TAMANHO eventos"""
+    tamanho = settings.AUDITORIA_LOTE_TAMANHO
+    with transaction.atomic():
+        for i in range(0, len(eventos), tamanho):
+            parte = eventos[i:i + tamanho]
+            execute(f"""
+                INSERT INTO Auditoria ({', '.join(CAMPOS)})
+                VALUES {marcadores(len(parte), len(CAMPOS))}
+            """, [valor for evento in parte for valor in evento])
+
+
+def _girar():
+    """
+    Fecha o segmento atual e abre o próximo. Retorna o número do segmento
+    fechado e os eventos da fila, que são os que ele e os anteriores ainda
+    guardam.
+    """
+    global _arquivo, _segmento
+    with _condicao:
+        eventos = _eventos[:]
+        del _eventos[:]
+        _arquivo.close()
+        fechado = _segmento
+        _segmento += 1
+        _arquivo = open(_spool(_segmento), 'a', encoding='utf-8')
+    return fechado, eventos
+
+
+def _apagar_spool(ate):
+    """Apaga os segmentos deste processo até o número `ate`, já gravados no banco"""
+    for caminho in glob.glob(_spool('*')):
+        segmento = os.path.basename(caminho).rsplit('.', 1)[0].rpartition('-')[2]
+        # Os de antes de _inicio são de um processo anterior com o mesmo pid
+        if segmento.isdigit() and _inicio <= int(segmento) <= ate:
+            os.remove(caminho)
+
+
+def _proximo_lote():
+    """Espera o primeiro evento e dá AUDITORIA_LOTE_ESPERA segundos para o lote encher"""
+    with _condicao:
+        _condicao.wait_for(lambda: _eventos)
+        _condicao.wait_for(
+            lambda: len(_eventos) >= settings.AUDITORIA_LOTE_TAMANHO,
+            timeout=settings.AUDITORIA_LOTE_ESPERA,
+        )
+
+
+def _insistir(lote):
+    """Grava o lote, tentando de novo até conseguir"""
+    while True:
+        try:
+            gravar(lote)
+            return
+        except Exception:
+            # O lote continua no spool; tenta de novo com outra conexão
+            logger.exception("Falha ao gravar %d eventos de auditoria", len(lote))
+            connection.close()
+            time.sleep(1)
+
+
+def _executar():
+    with _gravando:
+        _recuperar_spool()
+    while True:
+        _proximo_lote()
+        with _gravando:
+            segmento, lote = _girar()
+            _insistir(lote)
+            _apagar_spool(segmento)
+
+
+def descarregar():
+    """Grava imediatamente tudo o que está na fila (usado no encerramento)"""
+    # Se a gravadora não liberar a tempo, os eventos ficam no spool
+    if _gravadora is None or not _gravando.acquire(timeout=5):
+        return
+    try:
+        segmento, eventos = _girar()
+        if eventos:
+            gravar(eventos)
+        _apagar_spool(segmento)
+    finally:
+        _gravando.release()
+
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _recuperar_spool():
+    """
+    Regrava o spool deixado por processos que já terminaram (inclusive um
+    de mesmo pid, reciclado após uma queda). Roda na gravadora, antes do
+    primeiro lote.
+    """
+    for nome in sorted(os.listdir(settings.AUDITORIA_SPOOL)):
+        base, _, extensao = nome.partition('.')
+        pid, _, segmento = base.partition('-')
+        if extensao not in ('jsonl', 'recuperando') or not pid.isdigit():
+            continue
+
+        caminho = os.path.join(settings.AUDITORIA_SPOOL, nome)
+        if int(pid) == os.getpid():
+            # Nenhum outro processo mexe nos arquivos de um pid vivo
+            if extensao == 'jsonl' and not (segmento.isdigit() and int(segmento) < _inicio):
+                continue
+            reivindicado = caminho
+        elif _processo_vivo(int(pid)):
+            continue
+        else:
+            reivindicado = os.path.join(settings.AUDITORIA_SPOOL, f'{os.getpid()}-{base}.recuperando')
+            try:
+                os.rename(caminho, reivindicado)
+            except FileNotFoundError:
+                # Outro processo reivindicou primeiro
+                continue
+
+        with open(reivindicado, encoding='utf-8') as antigo:
+            eventos = [json.loads(linha) for linha in antigo if linha.strip()]
+        if eventos:
+            _insistir(eventos)
+        os.remove(reivindicado)
+
+
+def iniciar():
+    """Sobe a thread gravadora uma vez por processo"""
+    global _gravadora, _arquivo, _segmento, _inicio
+    if _gravadora is not None:
+        return
+    with _condicao:
+        if _gravadora is not None:
+            return
+        os.makedirs(settings.AUDITORIA_SPOOL, exist_ok=True)
+        _segmento = _inicio = int(time.time() * 1000)
+        _arquivo = open(_spool(_segmento), 'a', encoding='utf-8')
+        _gravadora = threading.Thread(target=_executar, name='auditoria-gravadora', daemon=True)
+        _gravadora.start()
+        atexit.register(descarregar)
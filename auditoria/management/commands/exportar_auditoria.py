@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from auditoria.exportacao import FORMATOS, exportar
+
+
+class Command(BaseCommand):
+    help = "Exporta a Auditoria filtrada em CSV ou JSON Lines, em streaming"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=FORMATOS, default='csv')
+        parser.add_argument('--tabela', default='')
+        parser.add_argument('--operacao', default='', choices=['', 'INSERT', 'UPDATE', 'DELETE'])
+        parser.add_argument('--dias', default='', help="Apenas registros dos últimos N dias")
+        parser.add_argument('--saida', default='-', help="Arquivo de saída ('-' para stdout)")
+
+    def handle(self, *args, **options):
+        conteudo = exportar(
+            options['formato'],
+            options['tabela'],
+            options['operacao'],
+            options['dias'],
+        )
+
+        if options['saida'] == '-':
+            for pedaco in conteudo:
+                sys.stdout.write(pedaco)
+            return
+
+        with open(options['saida'], 'w', encoding='utf-8', newline='') as arquivo:
+            for pedaco in conteudo:
+                arquivo.write(pedaco)
+
+        self.stderr.write(self.style.SUCCESS(f"Exportação gravada em {options['saida']}"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from auditoria.retencao import particionada, particionar
+
+
+class Command(BaseCommand):
+    help = (
+        "Particiona a Auditoria por mês ou, se já particionada, cria as "
+        "partições dos próximos meses (agendar mensalmente)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=3, help="Meses à frente com partição pronta")
+
+    def handle(self, *args, **options):
+        ja_particionada = particionada()
+        criadas = particionar(options['meses'])
+
+        if ja_particionada:
+            self.stdout.write(self.style.SUCCESS(f"{criadas} novas partições criadas"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Auditoria particionada em {criadas} meses"))
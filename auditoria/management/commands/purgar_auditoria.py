@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from auditoria.retencao import LOTE, PAUSA, purgar
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove a auditoria mais antiga que --dias: descarta partições mensais "
+        "inteiras e apaga o restante em lotes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=90)
+        parser.add_argument('--lote', type=int, default=LOTE, help="Linhas por DELETE")
+        parser.add_argument('--pausa', type=float, default=PAUSA, help="Segundos entre lotes")
+
+    def handle(self, *args, **options):
+        total, particoes = purgar(options['dias'], options['lote'], options['pausa'])
+
+        if particoes:
+            self.stdout.write(f"Partições descartadas: {', '.join(particoes)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} registros de auditoria removidos (mais de {options['dias']} dias)"
+        ))
@@ -0,0 +1,154 @@
+"""
+Retenção da Auditoria.
+
+Com a tabela particionada por mês (RANGE sobre UNIX_TIMESTAMP(Data_hora))
+apagar um mês inteiro é um DROP PARTITION, sem varrer linhas nem segurar
+travas. O que sobra do mês de corte, ou a tabela inteira quando ela não é
+particionada, é apagado em lotes pequenos com pausa entre eles, para não
+travar as gravações de empréstimos.
+"""
+import time
+from datetime import date
+
+from biblioteca.db import query, execute
+from .facetas import invalidar
+
+
+LOTE = 5000
+PAUSA = 0.05
+
+
+def particoes():
+    """Partições da Auditoria (vazio se a tabela não é particionada)"""
+    return query("""
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE()
+          AND TABLE_NAME = 'Auditoria'
+          AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """)
+
+
+def particionada():
+    return bool(particoes())
+
+
+def _proximo_mes(dia):
+    return date(dia.year + dia.month // 12, dia.month % 12 + 1, 1)
+
+
+def _definicao(mes):
+    """PARTITION pAAAAMM com os registros do mês `mes`"""
+    limite = _proximo_mes(mes)
+    return (
+        f"PARTITION p{mes:%Y%m} VALUES LESS THAN "
+        f"(UNIX_TIMESTAMP('{limite:%Y-%m-%d} 00:00:00'))"
+    )
+
+
+def _meses(inicio, fim):
+    mes = date(inicio.year, inicio.month, 1)
+    while mes <= fim:
+        yield mes
+        mes = _proximo_mes(mes)
+
+
+def particionar(meses_a_frente=3):
+    """
+    Particiona a Auditoria por mês (reconstrói a tabela; rodar uma vez, fora
+    do horário de pico) ou, se já particionada, cria as partições dos
+    próximos meses separando-as da partição pmax.
+    """
+    hoje = date.today()
+    fim = date(hoje.year + (hoje.month + meses_a_frente - 1) // 12,
+               (hoje.month + meses_a_frente - 1) % 12 + 1, 1)
+
+    existentes = particoes()
+
+    if not existentes:
+        mais_antigo = query("SELECT MIN(Data_hora) AS inicio FROM Auditoria")[0].inicio
+        inicio = mais_antigo.date() if mais_antigo else hoje
+        definicoes = [_definicao(mes) for mes in _meses(inicio, fim)]
+        definicoes.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+
+        execute("""
+            ALTER TABLE Auditoria
+                MODIFY Data_hora TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                DROP PRIMARY KEY,
+                ADD PRIMARY KEY (ID_auditoria, Data_hora)
+        """)
+        execute(
+            "ALTER TABLE Auditoria PARTITION BY RANGE (UNIX_TIMESTAMP(Data_hora)) ("
+            + ', '.join(definicoes) + ")"
+        )
+        return len(definicoes) - 1
+
+    nomes = {p.PARTITION_NAME for p in existentes}
+    novas = [_definicao(mes) for mes in _meses(hoje, fim) if f"p{mes:%Y%m}" not in nomes]
+
+    if novas:
+        execute(
+            "ALTER TABLE Auditoria REORGANIZE PARTITION pmax INTO ("
+            + ', '.join(novas) + ", PARTITION pmax VALUES LESS THAN MAXVALUE)"
+        )
+    return len(novas)
+
+
+def apagar_em_lotes(dias, lote=LOTE, pausa=PAUSA):
+    """Apaga registros com mais de `dias` dias em lotes de `lote` linhas"""
+    total = 0
+    while True:
+        apagados = execute("""
+            DELETE FROM Auditoria
+            WHERE Data_hora < DATE_SUB(NOW(), INTERVAL %s DAY)
+            ORDER BY ID_auditoria
+            LIMIT %s
+        """, [dias, lote])
+        total += apagados
+        if apagados < lote:
+            if total:
+                invalidar()
+            return total
+        time.sleep(pausa)
+
+
+def descartar_particoes(dias):
+    """
+    Descarta as partições mensais inteiramente mais antigas que `dias`
+    dias. Retorna (removidos estimados pelo information_schema, partições
+    descartadas); não faz nada se a tabela não é particionada.
+    """
+    removidos = 0
+    descartadas = []
+
+    existentes = particoes()
+    if not existentes:
+        return removidos, descartadas
+
+    limite = query(
+        "SELECT UNIX_TIMESTAMP(DATE_SUB(NOW(), INTERVAL %s DAY)) AS limite",
+        [dias]
+    )[0].limite
+
+    for p in existentes:
+        if p.PARTITION_DESCRIPTION == 'MAXVALUE':
+            continue
+        if int(p.PARTITION_DESCRIPTION) <= limite:
+            descartadas.append(p.PARTITION_NAME)
+            removidos += p.TABLE_ROWS or 0
+
+    if descartadas:
+        execute(f"ALTER TABLE Auditoria DROP PARTITION {', '.join(descartadas)}")
+        invalidar()
+    return removidos, descartadas
+
+
+def purgar(dias, lote=LOTE, pausa=PAUSA):
+    """
+    Remove a auditoria com mais de `dias` dias: descarta as partições e
+    apaga o restante em lotes. Retorna (removidos, partições descartadas).
+    """
+    removidos, descartadas = descartar_particoes(dias)
+    removidos += apagar_em_lotes(dias, lote, pausa)
+    return removidos, descartadas
@@ -1,8 +1,13 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Views de leitura assíncronas (biblioteca.db_async) quando PILHA_VIEWS = 'async'
+ASSINCRONA = settings.PILHA_VIEWS == 'async'
+
 urlpatterns = [
-    path('', views.auditoria, name='auditoria'),
+    path('', views.aauditoria if ASSINCRONA else views.auditoria, name='auditoria'),
     path('detalhes/<int:id>/', views.auditoria_detalhes, name='auditoria_detalhes'),
+    path('exportar/', views.exportar_auditoria, name='exportar_auditoria'),
     path('limpar/', views.limpar_auditoria, name='limpar_auditoria'),
 ]
\ No newline at end of file
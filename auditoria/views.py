@@ -1,6 +1,15 @@
 from django.shortcuts import render, redirect
-from django.db import connection
 from django.contrib import messages
+from django.http import StreamingHttpResponse
+from biblioteca.db import query
+from biblioteca.db_async import aquery
+from biblioteca.paginacao import codificar_cursor, decodificar_cursor
+from .exportacao import COLUNAS, FORMATOS, filtrar, exportar
+from .retencao import descartar_particoes
+from .facetas import tabelas, atabelas
+
+
+POR_PAGINA = 100
 
 
 def login_required(view_func):
@@ -11,71 +20,90 @@ def login_required(view_func):
     return wrapper
 
 
-def query(sql, params=None):
-    with connection.cursor() as cursor:
-        cursor.execute(sql, params or [])
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-
-def execute(sql, params=None):
-    with connection.cursor() as cursor:
-        cursor.execute(sql, params or [])
-    return True
+def alogin_required(view_func):
+    async def wrapper(request, *args, **kwargs):
+        if not await request.session.aget('usuario_logado'):
+            return redirect('login')
+        return await view_func(request, *args, **kwargs)
+    return wrapper
 
 
-@login_required
-def auditoria(request):
-    """Lista todos os registros de auditoria"""
-    filtro_tabela = request.GET.get('tabela', '')
-    filtro_operacao = request.GET.get('operacao', '')
-    filtro_dias = request.GET.get('dias', '7')
-    
-    sql = """
-        SELECT 
-            ID_auditoria,
-            Tabela_afetada,
-            Operacao,
-            ID_registro,
-            Usuario_sistema,
-            Data_hora,
-            Dados_antigos,
-            Dados_novos,
-            Campos_alterados,
-            Descricao
-        FROM Auditoria
-        WHERE 1=1
-    """
-    params = []
-    
-    if filtro_tabela:
-        sql += " AND Tabela_afetada = %s"
-        params.append(filtro_tabela)
-    
-    if filtro_operacao:
-        sql += " AND Operacao = %s"
-        params.append(filtro_operacao)
+def _consulta(request):
+    """SELECT da página pedida e os filtros para o template"""
+    filtros = {
+        'filtro_tabela': request.GET.get('tabela', ''),
+        'filtro_operacao': request.GET.get('operacao', ''),
+        'filtro_dias': request.GET.get('dias', '7'),
+    }
     
-    if filtro_dias and filtro_dias.isdigit():
-        sql += " AND Data_hora >= DATE_SUB(NOW(), INTERVAL %s DAY)"
-        params.append(int(filtro_dias))
+    where, params = filtrar(*filtros.values())
     
-    sql += " ORDER BY Data_hora DESC LIMIT 100"
+    # "Carregar mais antigos": continua a partir do último registro exibido
+    cursor = decodificar_cursor(request.GET.get('antes'))
+    if cursor:
+        data_hora, id_auditoria = cursor
+        where += " AND (Data_hora < %s OR (Data_hora = %s AND ID_auditoria < %s))"
+        params += [data_hora, data_hora, id_auditoria]
     
-    dados = query(sql, params)
-    tabelas = query("SELECT DISTINCT Tabela_afetada FROM Auditoria ORDER BY Tabela_afetada")
+    sql = f"""
+        SELECT {', '.join(COLUNAS)} FROM Auditoria{where}
+        ORDER BY Data_hora DESC, ID_auditoria DESC
+        LIMIT %s
+    """
+    params.append(POR_PAGINA + 1)
+    return sql, params, filtros
+
+
+def _contexto(dados, nomes, filtros):
+    antes = ''
+    if len(dados) > POR_PAGINA:
+        dados = dados[:POR_PAGINA]
+        antes = codificar_cursor(str(dados[-1].Data_hora), dados[-1].ID_auditoria)
     
-    context = {
+    return {
         'dados': dados,
-        'tabelas': tabelas,
-        'filtro_tabela': filtro_tabela,
-        'filtro_operacao': filtro_operacao,
-        'filtro_dias': filtro_dias
+        'tabelas': nomes,
+        'antes': antes,
+        **filtros,
     }
-    
+
+
+@login_required
+def auditoria(request):
+    """Lista todos os registros de auditoria"""
+    sql, params, filtros = _consulta(request)
+    context = _contexto(query(sql, params), tabelas(), filtros)
+    return render(request, 'auditoria.html', context)
+
+
+@alogin_required
+async def aauditoria(request):
+    """Versão assíncrona da listagem, sobre biblioteca.db_async"""
+    sql, params, filtros = _consulta(request)
+    context = _contexto(await aquery(sql, params), await atabelas(), filtros)
     return render(request, 'auditoria.html', context)
 
 
+@login_required
+def exportar_auditoria(request):
+    """Exporta todos os registros filtrados em CSV ou JSON Lines"""
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS:
+        formato = 'csv'
+
+    conteudo = exportar(
+        formato,
+        request.GET.get('tabela', ''),
+        request.GET.get('operacao', ''),
+        request.GET.get('dias', ''),
+    )
+
+    tipo = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(conteudo, content_type=f'{tipo}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="auditoria.{formato}"'
+    return response
+
+
 @login_required
 def auditoria_detalhes(request, id):
     """Mostra detalhes de um registro de auditoria"""
@@ -90,7 +118,11 @@ def auditoria_detalhes(request, id):
 
 @login_required
 def limpar_auditoria(request):
-    """Limpa registros antigos de auditoria (mais de 90 dias)"""
+    """
+    Limpa registros antigos de auditoria (mais de 90 dias). Só descarta
+    partições mensais inteiras; o restante, apagado em lotes, fica com o
+    comando purgar_auditoria (cron), fora do ciclo da requisição.
+    """
     if request.method == 'POST':
         dias = request.POST.get('dias', '90')
         
@@ -98,20 +130,14 @@ def limpar_auditoria(request):
             messages.error(request, "Número de dias inválido")
             return redirect('auditoria')
         
-        result = query("""
-            SELECT COUNT(*) as total 
-            FROM Auditoria 
-            WHERE Data_hora < DATE_SUB(NOW(), INTERVAL %s DAY)
-        """, [int(dias)])
-        
-        total = result[0]['total'] if result else 0
-        
-        execute("""
-            DELETE FROM Auditoria 
-            WHERE Data_hora < DATE_SUB(NOW(), INTERVAL %s DAY)
-        """, [int(dias)])
+        total, particoes = descartar_particoes(int(dias))
         
-        messages.success(request, f"{total} registros de auditoria removidos (mais de {dias} dias)")
+        if particoes:
+            messages.success(request, f"{total} registros de auditoria removidos (mais de {dias} dias)")
+            messages.info(request, f"Partições descartadas: {', '.join(particoes)}")
+        else:
+            messages.info(request, f"Nenhuma partição inteira com mais de {dias} dias para descartar")
+        messages.info(request, "O restante é apagado pelo comando purgar_auditoria")
         return redirect('auditoria')
     
     return redirect('auditoria')
@@ -1,8 +1,12 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Views de leitura assíncronas (biblioteca.db_async) quando PILHA_VIEWS = 'async'
+ASSINCRONA = settings.PILHA_VIEWS == 'async'
+
 urlpatterns = [
-    path('', views.autores, name='autores'),
+    path('', views.aautores if ASSINCRONA else views.autores, name='autores'),
     path('add/', views.autores_add, name='autores_add'),
     path('edit/<int:id>/', views.autores_edit, name='autores_edit'),
     path('delete/<int:id>/', views.autores_delete, name='autores_delete'),
@@ -1,7 +1,11 @@
 from django.shortcuts import render, redirect
-from django.db import connection, transaction
 from django.contrib import messages
 from django.db.utils import IntegrityError, DatabaseError
+from biblioteca.db import query, execute
+from biblioteca import fragmentos
+from biblioteca.referencias import invalidar
+from biblioteca.paginacao import paginar, apaginar
+from biblioteca.versoes import condicional
 
 
 def login_required(view_func):
@@ -12,17 +16,12 @@ def login_required(view_func):
     return wrapper
 
 
-def query(sql, params=None):
-    with connection.cursor() as cursor:
-        cursor.execute(sql, params or [])
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-
-def execute(sql, params=None):
-    with transaction.atomic():
-        with connection.cursor() as cursor:
-            cursor.execute(sql, params or [])
+def alogin_required(view_func):
+    async def wrapper(request, *args, **kwargs):
+        if not await request.session.aget('usuario_logado'):
+            return redirect('login')
+        return await view_func(request, *args, **kwargs)
+    return wrapper
 
 
 def get_mysql_message(exception):
@@ -35,10 +34,23 @@ def get_mysql_message(exception):
         return str(exception)
 
 
+LISTAGEM = ('Autores', 'ID_autor', {'nome': 'Nome_autor'})
+
+
 @login_required
 def autores(request):
-    dados = query("SELECT * FROM Autores")
-    return render(request, 'autores.html', {'dados': dados})
+    contexto = fragmentos.obter(
+        'autores', request, lambda: paginar(request, *LISTAGEM), 'autores_tabela.html'
+    )
+    return render(request, 'autores.html', contexto)
+
+
+@alogin_required
+async def aautores(request):
+    contexto = await fragmentos.aobter(
+        'autores', request, lambda: apaginar(request, *LISTAGEM), 'autores_tabela.html'
+    )
+    return render(request, 'autores.html', contexto)
 
 
 @login_required
@@ -55,6 +67,8 @@ def autores_add(request):
                 (Nome_autor, Nacionalidade, Data_nascimento, Biografia) 
                 VALUES (%s, %s, %s, %s)
             """, [nome, nac, data, bio])
+            invalidar('autores')
+            fragmentos.invalidar('autores', 'livros')
 
             messages.success(request, f"Autor '{nome}' cadastrado com sucesso!")
             return redirect('autores')
@@ -89,6 +103,8 @@ def autores_edit(request, id):
                     Biografia=%s
                 WHERE ID_autor=%s
             """, [nome, nac, data, bio, id])
+            invalidar('autores')
+            fragmentos.invalidar('autores', 'livros')
 
             messages.success(request, f"Autor '{nome}' atualizado com sucesso!")
             return redirect('autores')
@@ -117,12 +133,14 @@ def autores_delete(request, id):
             messages.error(request, "Autor não encontrado")
             return redirect('autores')
 
-        nome = autor[0]['Nome_autor']
+        nome = autor[0].Nome_autor
 
         execute(
             "DELETE FROM Autores WHERE ID_autor=%s",
             [id]
         )
+        invalidar('autores')
+        fragmentos.invalidar('autores', 'livros')
 
         messages.success(request, f"Autor '{nome}' excluído com sucesso!")
 
@@ -138,6 +156,7 @@ def autores_delete(request, id):
     return redirect('autores')
 
 @login_required
+@condicional('Autores')
 def autor_detalhes(request, id):
     autor = query("SELECT * FROM Autores WHERE ID_autor=%s", [id])[0]
     return render(request, 'autor_detalhes.html', {'autor': autor})
\ No newline at end of file
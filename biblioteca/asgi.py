@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'biblioteca.settings')
 
 application = get_asgi_application()
+
+# Libera o pool do aiomysql das views assíncronas (PILHA_VIEWS = 'async')
+from biblioteca import db_async  # noqa: E402
+
+db_async.habilitar()
@@ -0,0 +1,83 @@
+"""
+Camada de acesso a dados compartilhada por todos os apps.
+
+As conexões são persistentes e verificadas antes do reuso (CONN_MAX_AGE e
+CONN_HEALTH_CHECKS em settings.py), então cada requisição reaproveita a
+conexão MySQL da thread em vez de abrir uma nova.
+
+O texto SQL vai ao driver como está, sem normalização nem cache de
+comandos preparados (o MySQLdb monta cada comando no cliente). O único
+cache aqui é o da classe de registro por conjunto de colunas (registro()).
+
+execute() retorna o número de linhas afetadas (cursor.rowcount). As cópias
+antigas de cada app retornavam sempre True; nenhuma chamada dependia disso.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+from django.db import connection, transaction
+
+
+@lru_cache(maxsize=256)
+def registro(colunas):
+    """Retorna a classe de registro (namedtuple) para um conjunto de colunas"""
+    return namedtuple('Registro', colunas, rename=True)
+
+
+def query(sql, params=None):
+    """Executa um SELECT e retorna a lista de registros"""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params or [])
+        Registro = registro(tuple(col[0] for col in cursor.description))
+        return [Registro._make(row) for row in cursor.fetchall()]
+
+
+def execute(sql, params=None):
+    """
+    Executa um comando de escrita em transação e retorna as linhas afetadas
+    (0 quando nada mudou; antes retornava sempre True)
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params or [])
+            return cursor.rowcount
+
+
+def inserir(sql, params=None):
+    """
+    Executa um INSERT em transação e retorna o id gerado. Em inserções de
+    várias linhas é o id da primeira; os demais não são garantidamente
+    consecutivos (innodb_autoinc_lock_mode=2) e devem ser relidos.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params or [])
+            return cursor.lastrowid
+
+
+def marcadores(linhas, colunas):
+    """Gera '(%s, %s), (%s, %s)' para um INSERT de várias linhas"""
+    linha = '(' + ', '.join(['%s'] * colunas) + ')'
+    return ', '.join([linha] * linhas)
+
+
+def marcadores_in(valores):
+    """Gera '%s, %s, %s' para uma cláusula IN"""
+    return ', '.join(['%s'] * len(valores))
+
+
+def chamar(procedimento, params=None):
+    """
+    Executa CALL de um procedimento armazenado numa única ida ao banco e
+    retorna os registros do primeiro resultado.
+    """
+    params = params or []
+    with connection.cursor() as cursor:
+        cursor.execute(f"CALL {procedimento}({marcadores_in(params)})", params)
+        dados = []
+        if cursor.description:
+            Registro = registro(tuple(col[0] for col in cursor.description))
+            dados = [Registro._make(row) for row in cursor.fetchall()]
+        while cursor.nextset():
+            pass
+        return dados
@@ -0,0 +1,76 @@
+"""
+Acesso assíncrono ao MySQL para as views de leitura (PILHA_VIEWS = 'async').
+
+Usa o aiomysql com um pool de conexões próprio por event loop, então as
+consultas não passam pelo sync_to_async nem prendem uma thread enquanto
+esperam o banco. Só para leitura: as gravações continuam em biblioteca.db,
+dentro das transações do Django.
+
+Sob WSGI (inclusive o runserver) cada view assíncrona roda num event loop
+novo e descartado, e cada um deixaria um pool aberto; por isso o pool só é
+criado depois que biblioteca.asgi chama habilitar(). Os pools ficam num
+WeakKeyDictionary pelo loop, que some junto com ele.
+"""
+import asyncio
+import time
+import weakref
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from biblioteca import metricas
+from biblioteca.db import registro
+
+
+_pools = weakref.WeakKeyDictionary()
+_habilitado = False
+
+
+def habilitar():
+    """Chamado por biblioteca.asgi: o processo roda sob um servidor ASGI"""
+    global _habilitado
+    _habilitado = True
+
+
+async def _criar_pool():
+    import aiomysql
+
+    banco = settings.DATABASES['default']
+    opcoes = banco.get('OPTIONS', {})
+    return await aiomysql.create_pool(
+        host=banco['HOST'] or 'localhost',
+        port=int(banco['PORT'] or 3306),
+        user=banco['USER'],
+        password=banco['PASSWORD'],
+        db=banco['NAME'],
+        charset=opcoes.get('charset', 'utf8mb4'),
+        init_command=opcoes.get('init_command'),
+        autocommit=True,
+        minsize=settings.POOL_ASSINCRONO_MINIMO,
+        maxsize=settings.POOL_ASSINCRONO_MAXIMO,
+        pool_recycle=banco.get('CONN_MAX_AGE') or -1,
+    )
+
+
+async def pool():
+    """Pool do event loop atual, criado no primeiro uso"""
+    if not _habilitado:
+        raise ImproperlyConfigured(
+            "PILHA_VIEWS = 'async' só funciona sob ASGI "
+            "(ex.: uvicorn biblioteca.asgi:application)"
+        )
+    loop = asyncio.get_running_loop()
+    if loop not in _pools:
+        _pools[loop] = loop.create_task(_criar_pool())
+    return await _pools[loop]
+
+
+async def aquery(sql, params=None):
+    """Executa um SELECT e retorna a lista de registros (como db.query)"""
+    async with (await pool()).acquire() as conexao:
+        async with conexao.cursor() as cursor:
+            inicio = time.perf_counter()
+            await cursor.execute(sql, params or None)
+            metricas.anotar(sql, time.perf_counter() - inicio)
+            Registro = registro(tuple(col[0] for col in cursor.description))
+            return [Registro._make(row) for row in await cursor.fetchall()]
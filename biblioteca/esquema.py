@@ -0,0 +1,138 @@
+"""
+Versão do esquema MySQL.
+
+As tabelas, índices, triggers e procedimentos ficam em db.sql e
+triggers_biblioteca.sql e são aplicados uma vez por manage.py
+preparar_banco, que grava VERSAO em Controle_tarefas. Nada disso roda na
+subida dos processos; a verificação da versão é um único SELECT, feito pelo
+system check de banco (manage.py check --database default, migrate).
+
+Ao mudar um dos arquivos .sql, incremente VERSAO.
+"""
+from pathlib import Path
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from django.db import DatabaseError, connection
+
+from biblioteca.db import query, execute
+
+
+VERSAO = 6
+
+ARQUIVOS = ['db.sql', 'triggers_biblioteca.sql']
+
+CHAVE = 'esquema_versao'
+
+# Já existe (tabela, índice, coluna, banco): bancos criados pela versão
+# antiga do BibliotecaConfig.ready() ou aplicados pela metade
+JA_EXISTE = {1007, 1050, 1060, 1061}
+
+
+def _aspa_aberta(linha, aberta=None):
+    """Aspa (' ou ") ainda aberta ao fim de `linha`, partindo de `aberta`"""
+    escape = False
+    for c in linha:
+        if escape:
+            escape = False
+        elif aberta:
+            if c == '\\':
+                escape = True
+            elif c == aberta:
+                aberta = None
+        elif c in '\'"':
+            aberta = c
+    return aberta
+
+
+def _comando(linhas, delimitador=''):
+    """Texto do comando sem o delimitador final (None para os que não rodam aqui)"""
+    texto = ''.join(linhas).rstrip()
+    if delimitador and texto.endswith(delimitador):
+        texto = texto[:-len(delimitador)]
+    texto = texto.strip()
+    # O banco é o de settings.DATABASES, não o do script
+    if texto and not texto.upper().startswith(('CREATE DATABASE', 'USE ')):
+        return texto
+    return None
+
+
+def comandos(caminho):
+    """
+    Divide um arquivo .sql em comandos, respeitando DELIMITER e textos
+    entre aspas. O último comando vale mesmo sem delimitador.
+    """
+    delimitador = ';'
+    atual = []
+    aberta = None
+    with open(caminho, encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            limpa = linha.strip()
+            if aberta is None:
+                if limpa.upper().startswith('DELIMITER '):
+                    delimitador = limpa.split()[1]
+                    continue
+                if not atual and (not limpa or limpa.startswith('--')):
+                    continue
+                atual.append(linha)
+                # Comentário no meio do comando não o encerra, mesmo terminando em ';'
+                if limpa.startswith('--'):
+                    continue
+            else:
+                atual.append(linha)
+
+            aberta = _aspa_aberta(linha, aberta)
+            if aberta is None and limpa.endswith(delimitador):
+                texto = _comando(atual, delimitador)
+                atual = []
+                if texto:
+                    yield texto
+
+    texto = _comando(atual)
+    if texto:
+        yield texto
+
+
+def versao_instalada():
+    """Versão gravada no banco (0 se o esquema nunca foi aplicado)"""
+    try:
+        linha = query("SELECT Valor FROM Controle_tarefas WHERE Nome = %s", [CHAVE])
+    except DatabaseError:
+        return 0
+    return int(linha[0].Valor) if linha else 0
+
+
+def aplicar():
+    """Aplica os arquivos .sql e grava a versão; retorna os comandos executados"""
+    total = 0
+    # Cursor direto e sem parâmetros: o texto vai ao MySQL como está no
+    # arquivo, sem a formatação com % do driver (os triggers usam LIKE '%@%')
+    with connection.cursor() as cursor:
+        for nome in ARQUIVOS:
+            for comando in comandos(Path(settings.BASE_DIR) / nome):
+                try:
+                    cursor.execute(comando)
+                except DatabaseError as e:
+                    if e.args[0] not in JA_EXISTE:
+                        raise
+                total += 1
+
+    execute("""
+        INSERT INTO Controle_tarefas (Nome, Valor) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE Valor = VALUES(Valor)
+    """, [CHAVE, str(VERSAO)])
+    return total
+
+
+@register(Tags.database)
+def verificar_versao(app_configs, databases=None, **kwargs):
+    if not databases or 'default' not in databases:
+        return []
+    instalada = versao_instalada()
+    if instalada == VERSAO:
+        return []
+    return [Error(
+        f"Esquema do banco na versão {instalada}, o código espera a versão {VERSAO}.",
+        hint="Rode manage.py preparar_banco.",
+        id='biblioteca.E001',
+    )]
@@ -0,0 +1,132 @@
+"""
+Cache do HTML já renderizado das tabelas das listagens (livros, autores,
+empréstimos).
+
+Cada entrada guarda a tabela renderizada e o contexto de paginação da
+página pedida (caminho + query string), junto com a geração da listagem em
+que foi feita. As views de escrita incrementam a geração (invalidar());
+como ela fica no banco (Geracoes), a invalidação vale para todos os workers.
+
+Uma entrada vencida (geração antiga ou mais velha que FRAGMENTOS_TTL) é
+refeita por uma única requisição, que pega a trava da chave (cache.add);
+as demais continuam servindo a cópia antiga enquanto isso. Com o
+LocMemCache de settings a trava, como o próprio cache, vale por processo:
+cada worker refaz a sua cópia. Num backend compartilhado (Redis,
+Memcached) ela passa a valer para todos. A idade da entrada é medida com
+o relógio de parede (time.time()), que faz sentido entre processos.
+
+O alias 'fragmentos' de settings.CACHES limita o número de entradas e
+FRAGMENTOS_TAMANHO_MAXIMO o tamanho de cada uma.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from biblioteca import metricas
+from biblioteca.db import query, execute, marcadores
+from biblioteca.db_async import aquery
+
+
+GERACAO = "SELECT Geracao FROM Geracoes WHERE Listagem = %s"
+
+TRAVA = 30
+
+
+def _cache():
+    return caches['fragmentos']
+
+
+def invalidar(*listagens):
+    """Incrementa a geração das listagens alteradas por uma escrita"""
+    execute(f"""
+        INSERT INTO Geracoes (Listagem) VALUES {marcadores(len(listagens), 1)}
+        ON DUPLICATE KEY UPDATE Geracao = Geracao + 1
+    """, list(listagens))
+
+
+def _chave(listagem, request, extra):
+    texto = f"{request.get_full_path()}|{extra}"
+    return f"{listagem}:{hashlib.sha1(texto.encode()).hexdigest()}"
+
+
+def _valida(entrada, geracao):
+    return (
+        entrada is not None
+        and entrada['geracao'] == geracao
+        and time.time() - entrada['criado'] < settings.FRAGMENTOS_TTL
+    )
+
+
+def _renderizar(chave, geracao, template, contexto):
+    html = render_to_string(template, contexto)
+    resultado = {'tabela': mark_safe(html), 'pagina': contexto.get('pagina')}
+    if len(html) <= settings.FRAGMENTOS_TAMANHO_MAXIMO:
+        _cache().set(chave, {
+            'geracao': geracao,
+            'criado': time.time(),
+            'contexto': resultado,
+        })
+    return resultado
+
+
+def _consultar_cache(listagem, chave, geracao):
+    """
+    Retorna (contexto, trava): o contexto quando a entrada pode ser servida
+    (válida, ou vencida mas já sendo refeita por outra requisição) e se
+    esta requisição ficou com a trava para refazê-la.
+    """
+    cache = _cache()
+    entrada = cache.get(chave)
+
+    if _valida(entrada, geracao):
+        metricas.contar('biblioteca_fragmentos_total', listagem=listagem, resultado='acerto')
+        return entrada['contexto'], False
+
+    trava = cache.add(f"{chave}:trava", 1, TRAVA)
+    if entrada is not None and not trava:
+        metricas.contar('biblioteca_fragmentos_total', listagem=listagem, resultado='antigo')
+        return entrada['contexto'], False
+
+    metricas.contar('biblioteca_fragmentos_total', listagem=listagem, resultado='falta')
+    return None, trava
+
+
+def obter(listagem, request, consultar, template, extra=''):
+    """
+    Contexto da listagem com 'tabela' (HTML pronto) e 'pagina'. `consultar`
+    só é chamada quando a entrada precisa ser refeita.
+    """
+    chave = _chave(listagem, request, extra)
+    geracao = query(GERACAO, [listagem])
+    geracao = geracao[0].Geracao if geracao else 0
+
+    contexto, trava = _consultar_cache(listagem, chave, geracao)
+    if contexto is not None:
+        return contexto
+
+    try:
+        return _renderizar(chave, geracao, template, consultar())
+    finally:
+        if trava:
+            _cache().delete(f"{chave}:trava")
+
+
+async def aobter(listagem, request, consultar, template, extra=''):
+    """Versão assíncrona de obter; `consultar` é uma corrotina"""
+    chave = _chave(listagem, request, extra)
+    geracao = await aquery(GERACAO, [listagem])
+    geracao = geracao[0].Geracao if geracao else 0
+
+    contexto, trava = _consultar_cache(listagem, chave, geracao)
+    if contexto is not None:
+        return contexto
+
+    try:
+        return _renderizar(chave, geracao, template, await consultar())
+    finally:
+        if trava:
+            _cache().delete(f"{chave}:trava")
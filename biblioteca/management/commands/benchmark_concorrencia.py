@@ -0,0 +1,97 @@
+import asyncio
+import statistics
+import time
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+
+PAGINAS = ['livros', 'autores', 'editoras', 'generos', 'emprestimos', 'auditoria']
+
+
+class Command(BaseCommand):
+    help = (
+        "Dispara requisições concorrentes contra um servidor já rodando "
+        "(ex.: gunicorn com PILHA_VIEWS = 'sync' e uvicorn com 'async') "
+        "e mede requisições por segundo e latência das páginas de leitura"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--usuario', type=int, required=True)
+        parser.add_argument('--clientes', type=int, default=100)
+        parser.add_argument('--requisicoes', type=int, default=2000)
+
+    def sessao(self, usuario):
+        """Cria uma sessão logada no backend configurado e devolve o cookie"""
+        sessao = import_module(settings.SESSION_ENGINE).SessionStore()
+        sessao['usuario_logado'] = usuario
+        sessao['nome_usuario'] = 'benchmark'
+        sessao.save()
+        return f"{settings.SESSION_COOKIE_NAME}={sessao.session_key}"
+
+    async def requisitar(self, host, porta, caminho, cookie):
+        leitor, escritor = await asyncio.open_connection(host, porta)
+        escritor.write((
+            f"GET {caminho} HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            f"Cookie: {cookie}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode())
+        await escritor.drain()
+        linha = (await leitor.readline()).split()
+        await leitor.read()
+        escritor.close()
+        await escritor.wait_closed()
+        # Conexão fechada sem resposta (ou linha de status malformada) conta como erro
+        if len(linha) < 2 or not linha[1].isdigit():
+            return 0
+        return int(linha[1])
+
+    async def cliente(self, fila, host, porta, cookie, latencias, erros):
+        while True:
+            try:
+                caminho = fila.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            inicio = time.perf_counter()
+            try:
+                status = await self.requisitar(host, porta, caminho, cookie)
+            except OSError:
+                status = 0
+            if status != 200:
+                erros.append(status)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    async def executar(self, url, cookie, clientes, requisicoes):
+        partes = urlsplit(url)
+        caminhos = [reverse(pagina) for pagina in PAGINAS]
+
+        fila = asyncio.Queue()
+        for i in range(requisicoes):
+            fila.put_nowait(caminhos[i % len(caminhos)])
+
+        latencias, erros = [], []
+        inicio = time.perf_counter()
+        await asyncio.gather(*[
+            self.cliente(fila, partes.hostname, partes.port or 80, cookie, latencias, erros)
+            for _ in range(clientes)
+        ])
+        return time.perf_counter() - inicio, latencias, erros
+
+    def handle(self, *args, **options):
+        cookie = self.sessao(options['usuario'])
+        decorrido, latencias, erros = asyncio.run(self.executar(
+            options['url'], cookie, options['clientes'], options['requisicoes']
+        ))
+
+        percentis = statistics.quantiles(latencias, n=100) if len(latencias) > 1 else (latencias or [0]) * 99
+        self.stdout.write(
+            f"{options['clientes']} clientes, {len(latencias)} requisições em {decorrido:.1f} s: "
+            f"{len(latencias) / decorrido:.1f} req/s, "
+            f"p50 {percentis[49]:.1f} ms, p95 {percentis[94]:.1f} ms, p99 {percentis[98]:.1f} ms, "
+            f"{len(erros)} erros"
+        )
@@ -0,0 +1,57 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Sobe o Django como um worker: setup() e carga das rotas (importa as views)
+SCRIPT = """
+import json, os, sys, time
+inicio = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'biblioteca.settings')
+import django
+django.setup()
+configurado = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+rotas = time.perf_counter()
+from django.db import connection
+print(json.dumps({
+    'setup': configurado - inicio,
+    'rotas': rotas - configurado,
+    'conectou': connection.connection is not None,
+    'pesados': [m for m in ('numpy', 'werkzeug', 'aiomysql') if m in sys.modules],
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a subida de um processo (django.setup() + rotas) em processos "
+        "novos, e se ela abre conexão com o banco ou importa módulos pesados"
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=10)
+
+    def handle(self, *args, **options):
+        medidas = []
+        for _ in range(options['repeticoes']):
+            saida = subprocess.run(
+                [sys.executable, '-c', SCRIPT],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout
+            medidas.append(json.loads(saida.strip().splitlines()[-1]))
+
+        setup = statistics.median(m['setup'] for m in medidas) * 1000
+        rotas = statistics.median(m['rotas'] for m in medidas) * 1000
+        self.stdout.write(
+            f"mediana de {len(medidas)} subidas: setup {setup:.1f} ms, rotas {rotas:.1f} ms, "
+            f"total {setup + rotas:.1f} ms"
+        )
+        self.stdout.write(f"conexão com o banco na subida: {'sim' if medidas[0]['conectou'] else 'não'}")
+        self.stdout.write(f"módulos pesados carregados: {', '.join(medidas[0]['pesados']) or 'nenhum'}")
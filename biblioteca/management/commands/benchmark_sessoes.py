@@ -0,0 +1,66 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from emprestimos.management.commands.benchmark_emprestimos import ContadorConsultas
+
+
+BACKENDS = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+PAGINAS = ['livros', 'autores', 'editoras', 'generos', 'emprestimos', 'usuarios']
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara a latência e as consultas por requisição das listagens "
+        "principais com cada backend de sessão"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', type=int, required=True)
+        parser.add_argument('--requisicoes', type=int, default=100)
+
+    def cliente(self, engine, usuario):
+        """Client com uma sessão logada criada direto no backend"""
+        sessao = import_module(engine).SessionStore()
+        sessao['usuario_logado'] = usuario
+        sessao['nome_usuario'] = 'benchmark'
+        sessao.save()
+
+        cliente = Client()
+        cliente.cookies[settings.SESSION_COOKIE_NAME] = sessao.session_key
+        return cliente
+
+    def handle(self, *args, **options):
+        usuario, requisicoes = options['usuario'], options['requisicoes']
+
+        for nome, engine in BACKENDS.items():
+            with override_settings(SESSION_ENGINE=engine, ALLOWED_HOSTS=['testserver']):
+                cliente = self.cliente(engine, usuario)
+                self.stdout.write(f"\n{nome}")
+
+                for pagina in PAGINAS:
+                    url = reverse(pagina)
+                    cliente.get(url)
+
+                    contador = ContadorConsultas()
+                    with connection.execute_wrapper(contador):
+                        inicio = time.perf_counter()
+                        for _ in range(requisicoes):
+                            resposta = cliente.get(url)
+                        decorrido = time.perf_counter() - inicio
+
+                    self.stdout.write(
+                        f"  {pagina:>12}: {decorrido / requisicoes * 1000:7.2f} ms, "
+                        f"{contador.total / requisicoes:.1f} consultas por requisição "
+                        f"(HTTP {resposta.status_code})"
+                    )
@@ -0,0 +1,274 @@
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from werkzeug.security import generate_password_hash
+
+from biblioteca.db import query, execute, inserir, marcadores
+
+
+# Senha de todos os usuários gerados (usada por manage.py teste_carga)
+SENHA = 'carga123'
+DOMINIO = 'carga.exemplo.com'
+
+PRENOMES = [
+    'Ana', 'Beatriz', 'Bruno', 'Camila', 'Carlos', 'Daniel', 'Eduarda', 'Felipe',
+    'Fernanda', 'Gabriel', 'Helena', 'Igor', 'Isabela', 'João', 'Julia', 'Lucas',
+    'Larissa', 'Marcos', 'Mariana', 'Natália', 'Otávio', 'Paula', 'Pedro', 'Rafael',
+    'Renata', 'Rodrigo', 'Sofia', 'Thiago', 'Vitória', 'Yuri',
+]
+SOBRENOMES = [
+    'Almeida', 'Barbosa', 'Cardoso', 'Carvalho', 'Costa', 'Dias', 'Fernandes',
+    'Ferreira', 'Gomes', 'Lima', 'Martins', 'Melo', 'Oliveira', 'Pereira', 'Ribeiro',
+    'Rocha', 'Rodrigues', 'Santos', 'Silva', 'Souza', 'Teixeira', 'Vieira',
+]
+NACIONALIDADES = ['Brasileira', 'Portuguesa', 'Argentina', 'Chilena', 'Angolana', 'Moçambicana']
+GENEROS = [
+    'Romance', 'Ficção científica', 'Fantasia', 'Mistério', 'Suspense', 'Terror',
+    'Biografia', 'História', 'Poesia', 'Contos', 'Crônicas', 'Drama', 'Aventura',
+    'Infantil', 'Juvenil', 'Autoajuda', 'Filosofia', 'Ciências', 'Tecnologia', 'Arte',
+]
+PALAVRAS = [
+    'sombra', 'mar', 'cidade', 'tempo', 'noite', 'memória', 'jardim', 'silêncio',
+    'viagem', 'segredo', 'rio', 'estrela', 'casa', 'caminho', 'fogo', 'vento',
+    'inverno', 'ilha', 'espelho', 'montanha', 'carta', 'sertão', 'deserto', 'sonho',
+]
+ARTIGOS = ['O', 'A', 'Os', 'As']
+LIGACOES = ['de', 'do', 'da', 'sob o', 'além do', 'entre o']
+
+PRAZO_DIAS = 14
+
+
+def nome_pessoa():
+    return f"{random.choice(PRENOMES)} {random.choice(SOBRENOMES)} {random.choice(SOBRENOMES)}"
+
+
+def titulo():
+    return (
+        f"{random.choice(ARTIGOS)} {random.choice(PALAVRAS)} "
+        f"{random.choice(LIGACOES)} {random.choice(PALAVRAS)}"
+    ).capitalize()
+
+
+def data_aleatoria(inicio, fim):
+    return inicio + timedelta(days=random.randint(0, (fim - inicio).days))
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera dados sintéticos (autores, editoras, gêneros, livros, usuários, "
+        "empréstimos e auditoria) com INSERTs de várias linhas, para testes "
+        "de carga em escala de produção"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--autores', type=int, default=500)
+        parser.add_argument('--editoras', type=int, default=100)
+        parser.add_argument('--generos', type=int, default=len(GENEROS))
+        parser.add_argument('--livros', type=int, default=5000)
+        parser.add_argument('--usuarios', type=int, default=2000)
+        parser.add_argument('--emprestimos', type=int, default=100000)
+        parser.add_argument('--auditoria', type=int, default=100000)
+        parser.add_argument('--anos', type=int, default=3, help="Período do histórico")
+        parser.add_argument('--lote', type=int, default=2000, help="Linhas por INSERT")
+        parser.add_argument('--semente', type=int, default=None)
+
+    def inserir_lotes(self, tabela, colunas, linhas):
+        """Insere `linhas` (iterável) em lotes e retorna o id da primeira"""
+        primeiro, total, lote = None, 0, []
+
+        def gravar(lote):
+            return inserir(f"""
+                INSERT INTO {tabela} ({', '.join(colunas)})
+                VALUES {marcadores(len(lote), len(colunas))}
+            """, [valor for linha in lote for valor in linha])
+
+        for linha in linhas:
+            lote.append(linha)
+            if len(lote) >= self.lote:
+                primeiro = primeiro or gravar(lote)
+                total += len(lote)
+                lote = []
+        if lote:
+            primeiro = primeiro or gravar(lote)
+            total += len(lote)
+
+        self.stdout.write(f"  {tabela}: {total} linhas")
+        return primeiro
+
+    def ids(self, tabela, chave, primeiro):
+        if primeiro is None:
+            return []
+        return [r[0] for r in query(f"SELECT {chave} FROM {tabela} WHERE {chave} >= %s", [primeiro])]
+
+    def handle(self, *args, **options):
+        random.seed(options['semente'])
+        self.lote = options['lote']
+        hoje = date.today()
+        inicio = hoje - timedelta(days=365 * options['anos'])
+        comeco = time.perf_counter()
+
+        anterior = query("SELECT @auditoria_aplicacao AS valor")[0].valor
+        # Os triggers de auditoria, validação, estoque e painel são pulados
+        # nesta conexão; estoque e painel são acertados ao final
+        execute("SET @carga_dados = 1, @auditoria_aplicacao = 1")
+        try:
+            self.gerar(options, hoje, inicio)
+        finally:
+            execute("SET @carga_dados = NULL, @auditoria_aplicacao = %s", [anterior])
+
+        call_command('reconstruir_painel', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f"Dados gerados em {time.perf_counter() - comeco:.1f} s"
+        ))
+
+    def gerar(self, options, hoje, inicio):
+        autores = self.ids('Autores', 'ID_autor', self.inserir_lotes(
+            'Autores', ['Nome_autor', 'Nacionalidade', 'Data_nascimento', 'Biografia'],
+            (
+                (nome_pessoa(), random.choice(NACIONALIDADES),
+                 data_aleatoria(date(1900, 1, 1), date(2000, 12, 31)),
+                 f"Autor de {random.randint(1, 40)} obras.")
+                for _ in range(options['autores'])
+            ),
+        ))
+
+        editoras = self.ids('Editoras', 'ID_editora', self.inserir_lotes(
+            'Editoras', ['Nome_editora', 'Endereco_editora'],
+            (
+                (f"Editora {random.choice(SOBRENOMES)} {n}", f"Rua {random.choice(SOBRENOMES)}, {n}")
+                for n in range(1, options['editoras'] + 1)
+            ),
+        ))
+
+        # generos_validar_insert recusa nomes repetidos: os de GENEROS só
+        # entram se ainda faltarem e os demais levam um número novo a cada execução
+        existentes = {r.Nome_genero.casefold() for r in query("SELECT Nome_genero FROM Generos")}
+        nomes_generos = [g for g in GENEROS if g.casefold() not in existentes][:options['generos']]
+        n = query("SELECT COALESCE(MAX(ID_genero), 0) + 1 AS base FROM Generos")[0].base
+        while len(nomes_generos) < options['generos']:
+            nome = f"{random.choice(GENEROS)} {n}"
+            if nome.casefold() not in existentes:
+                nomes_generos.append(nome)
+            n += 1
+
+        generos = self.ids('Generos', 'ID_genero', self.inserir_lotes(
+            'Generos', ['Nome_genero'], ((nome,) for nome in nomes_generos),
+        ))
+
+        # ISBNs e e-mails únicos entre execuções
+        base_livro = query("SELECT COALESCE(MAX(ID_livro), 0) + 1 AS base FROM Livros")[0].base
+        exemplares = {}
+        primeiro_livro = self.inserir_lotes(
+            'Livros',
+            ['Titulo', 'Autor_id', 'ISBN', 'Ano_publicacao', 'Genero_id', 'Editora_id',
+             'Quantidade_disponivel', 'Resumo'],
+            (
+                (titulo(), random.choice(autores) if autores else None, f"979{base_livro + n:010d}",
+                 random.randint(1950, hoje.year), random.choice(generos) if generos else None,
+                 random.choice(editoras) if editoras else None, random.randint(1, 8),
+                 f"Uma história sobre {random.choice(PALAVRAS)} e {random.choice(PALAVRAS)}.")
+                for n in range(options['livros'])
+            ),
+        )
+        if primeiro_livro is not None:
+            exemplares = {
+                r.ID_livro: r.Quantidade_disponivel for r in query(
+                    "SELECT ID_livro, Quantidade_disponivel FROM Livros WHERE ID_livro >= %s",
+                    [primeiro_livro]
+                )
+            }
+
+        base_usuario = query("SELECT COALESCE(MAX(ID_usuario), 0) + 1 AS base FROM Usuarios")[0].base
+        senha_hash = generate_password_hash(SENHA, method=settings.SENHA_METODO)
+        usuarios = self.ids('Usuarios', 'ID_usuario', self.inserir_lotes(
+            'Usuarios',
+            ['Nome_usuario', 'Email', 'Numero_telefone', 'Data_inscricao', 'Multa_atual', 'Senha'],
+            (
+                (nome_pessoa(), f"usuario{base_usuario + n}@{DOMINIO}",
+                 f"119{random.randint(10000000, 99999999)}", data_aleatoria(inicio, hoje),
+                 Decimal(random.choice([0] * 6 + [2, 4, 10, 20, 60])), senha_hash)
+                for n in range(options['usuarios'])
+            ),
+        ))
+
+        livros = list(exemplares)
+        if livros and usuarios:
+            self.inserir_lotes(
+                'Emprestimos',
+                ['Usuario_id', 'Livro_id', 'Data_emprestimo', 'Data_devolucao_prevista',
+                 'Data_devolucao_real', 'Status_emprestimo'],
+                self.emprestimos(options['emprestimos'], usuarios, livros, exemplares, inicio, hoje),
+            )
+
+            # Estoque = exemplares - empréstimos em aberto gerados
+            execute("""
+                UPDATE Livros
+                JOIN (
+                    SELECT Livro_id, COUNT(*) AS abertos
+                    FROM Emprestimos
+                    WHERE Livro_id >= %s AND Status_emprestimo != 'devolvido'
+                    GROUP BY Livro_id
+                ) e ON e.Livro_id = Livros.ID_livro
+                SET Livros.Quantidade_disponivel = Livros.Quantidade_disponivel - e.abertos
+            """, [primeiro_livro])
+
+        self.inserir_lotes(
+            'Auditoria',
+            ['Tabela_afetada', 'Operacao', 'ID_registro', 'Usuario_sistema', 'Data_hora',
+             'Dados_novos', 'Descricao'],
+            self.auditoria(options['auditoria'], inicio),
+        )
+
+    def emprestimos(self, total, usuarios, livros, exemplares, inicio, hoje):
+        """
+        Empréstimos ao longo do período: os antigos devolvidos (parte com
+        atraso), os recentes em aberto respeitando 5 por usuário e o número
+        de exemplares de cada livro.
+        """
+        abertos_usuario = {}
+        abertos_livro = {}
+
+        for _ in range(total):
+            usuario = random.choice(usuarios)
+            livro = random.choice(livros)
+            emprestimo = data_aleatoria(inicio, hoje)
+            prevista = emprestimo + timedelta(days=PRAZO_DIAS)
+
+            pode_abrir = (
+                (hoje - emprestimo).days <= 2 * PRAZO_DIAS
+                and abertos_usuario.get(usuario, 0) < 5
+                and abertos_livro.get(livro, 0) < exemplares[livro]
+            )
+
+            if pode_abrir and random.random() < 0.7:
+                abertos_usuario[usuario] = abertos_usuario.get(usuario, 0) + 1
+                abertos_livro[livro] = abertos_livro.get(livro, 0) + 1
+                status = 'atrasado' if prevista < hoje else 'pendente'
+                yield usuario, livro, emprestimo, prevista, None, status
+                continue
+
+            if random.random() < 0.2:
+                devolucao = prevista + timedelta(days=random.randint(1, 20))
+            else:
+                devolucao = emprestimo + timedelta(days=random.randint(1, PRAZO_DIAS))
+            yield usuario, livro, emprestimo, prevista, min(devolucao, hoje), 'devolvido'
+
+    def auditoria(self, total, inicio):
+        fim = datetime.now()
+        segundos = int((fim - datetime.combine(inicio, datetime.min.time())).total_seconds())
+        tabelas = ['Livros', 'Emprestimos', 'Usuarios']
+        for _ in range(total):
+            tabela = random.choice(tabelas)
+            operacao = random.choice(['INSERT', 'UPDATE', 'UPDATE', 'DELETE'])
+            id_registro = random.randint(1, 100000)
+            yield (
+                tabela, operacao, id_registro, 'carga@localhost',
+                fim - timedelta(seconds=random.randint(0, segundos)),
+                f"Registro sintético {id_registro}",
+                f"{operacao} sintético em {tabela} - ID: {id_registro}",
+            )
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from biblioteca.db import execute
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove as sessões expiradas de django_session em lotes pequenos "
+        "(para rodar pelo cron). Sem efeito com SESSAO_MODO = 'cookie'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000)
+        parser.add_argument('--pausa', type=float, default=0.05)
+
+    def handle(self, *args, **options):
+        if settings.SESSAO_MODO == 'cookie':
+            self.stdout.write("Sessões em cookie: nada a limpar")
+            return
+
+        # No cache em arquivo cada entrada expira sozinha (TIMEOUT/MAX_ENTRIES)
+        total = 0
+        while True:
+            apagadas = execute("""
+                DELETE FROM django_session
+                WHERE expire_date < UTC_TIMESTAMP()
+                LIMIT %s
+            """, [options['lote']])
+            total += apagadas
+            if apagadas < options['lote']:
+                break
+            time.sleep(options['pausa'])
+
+        self.stdout.write(self.style.SUCCESS(f"{total} sessões expiradas removidas"))
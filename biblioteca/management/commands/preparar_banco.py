@@ -0,0 +1,32 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from biblioteca import esquema
+
+
+class Command(BaseCommand):
+    help = (
+        "Aplica db.sql e triggers_biblioteca.sql (tabelas, índices, triggers e "
+        "procedimentos) se o banco estiver numa versão anterior do esquema"
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forcar', action='store_true', help="Reaplica mesmo na versão atual")
+
+    def handle(self, *args, **options):
+        instalada = esquema.versao_instalada()
+        if instalada == esquema.VERSAO and not options['forcar']:
+            self.stdout.write(f"Esquema já na versão {instalada}")
+            return
+
+        total = esquema.aplicar()
+        self.stdout.write(f"{total} comandos aplicados")
+
+        # Tabelas derivadas mantidas por triggers: recalculadas a partir dos dados atuais
+        call_command('reconstruir_catalogo', stdout=self.stdout)
+        call_command('reconstruir_painel', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Esquema atualizado da versão {instalada} para a {esquema.VERSAO}"
+        ))
@@ -0,0 +1,102 @@
+import json
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from biblioteca import planos
+
+
+class Command(BaseCommand):
+    help = (
+        "Visita as páginas do site, roda EXPLAIN em cada SELECT emitido pelas "
+        "views e aponta varreduras completas, filesort e tabelas temporárias. "
+        "Os índices recomendados saem como CREATE INDEX no formato de db.sql. "
+        "Rode contra um banco com dados (manage.py gerar_dados); com --base "
+        "falha se aparecer um achado que não está na linha de base (para CI)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', type=int, default=None,
+                            help="Usuário que entra pelo login nas visitas (precisa de e-mail)")
+        parser.add_argument('--minimo-linhas', type=int, default=1000,
+                            help="Varreduras menores que isso são ignoradas")
+        parser.add_argument('--saida', default=None, help="Arquivo .sql com os índices recomendados")
+        parser.add_argument('--base', default=None, help="Linha de base (JSON) dos achados aceitos")
+        parser.add_argument('--gravar-base', action='store_true', help="Grava os achados atuais em --base")
+
+    def handle(self, *args, **options):
+        if settings.PILHA_VIEWS != 'sync':
+            raise CommandError(
+                "Só as views síncronas passam pelo execute_wrapper; rode com PILHA_VIEWS = 'sync' "
+                "(as assíncronas usam o mesmo SQL)"
+            )
+        if options['gravar_base'] and not options['base']:
+            raise CommandError("--gravar-base precisa de --base")
+
+        usuario = options['usuario'] or planos.usuario_padrao()
+        if usuario is None:
+            raise CommandError("Banco sem usuários: rode manage.py gerar_dados antes")
+
+        try:
+            comandos, falhas, pulados = planos.capturar(usuario)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        achados = planos.explicar(comandos, options['minimo_linhas'])
+        sugeridos = planos.sugerir(achados)
+
+        self.stdout.write(f"{len(comandos)} comandos distintos capturados como o usuário {usuario}")
+        for caminho, status in falhas:
+            detalhe = f"HTTP {status}" if isinstance(status, int) else status
+            self.stdout.write(self.style.WARNING(f"  {caminho}: {detalhe}"))
+        if pulados:
+            self.stdout.write(f"  rotas sem id de exemplo: {', '.join(pulados)}")
+
+        for a in achados:
+            self.stdout.write(
+                f"\n[{a['tipo']}] {a['tabela']} (~{a['linhas']} linhas) em {', '.join(a['views'])}\n"
+                f"  {a['sql'][:300]}"
+            )
+
+        linhas = planos.migracao(sugeridos)
+        if linhas:
+            texto = (
+                f"-- Índices sugeridos por manage.py sugerir_indices em {date.today()}.\n"
+                "-- Revise, acrescente a db.sql e incremente biblioteca.esquema.VERSAO.\n"
+                + '\n'.join(linhas) + '\n'
+            )
+            if options['saida']:
+                with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                    arquivo.write(texto)
+                self.stdout.write(f"\n{len(linhas)} índices sugeridos em {options['saida']}")
+            else:
+                self.stdout.write('\n' + texto)
+        else:
+            self.stdout.write(self.style.SUCCESS("\nNenhum índice a sugerir"))
+
+        if options['base']:
+            self.comparar(achados, options['base'], options['gravar_base'])
+
+    def comparar(self, achados, caminho, gravar):
+        if gravar:
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                json.dump(
+                    [{k: a[k] for k in ('chave', 'tipo', 'tabela', 'views', 'sql')} for a in achados],
+                    arquivo, indent=2, ensure_ascii=False,
+                )
+            self.stdout.write(f"Linha de base com {len(achados)} achados gravada em {caminho}")
+            return
+
+        try:
+            with open(caminho, encoding='utf-8') as arquivo:
+                aceitos = {a['chave'] for a in json.load(arquivo)}
+        except OSError as e:
+            raise CommandError(f"Não foi possível ler a linha de base {caminho}: {e}")
+
+        novos = [a for a in achados if a['chave'] not in aceitos]
+        if novos:
+            raise CommandError(
+                f"{len(novos)} achados fora da linha de base: "
+                + ', '.join(f"{a['tipo']} em {a['tabela']} ({', '.join(a['views'])})" for a in novos)
+            )
+        self.stdout.write(self.style.SUCCESS("Planos sem regressão em relação à linha de base"))
@@ -0,0 +1,196 @@
+import json
+import random
+import statistics
+import threading
+import time
+from datetime import datetime
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from biblioteca.db import query
+from .gerar_dados import DOMINIO, PALAVRAS, SENHA
+
+
+# Jornadas e seus pesos (proporção entre elas)
+JORNADAS = {
+    'navegar': 50,
+    'emprestar': 20,
+    'devolver': 15,
+    'auditoria': 10,
+    'login': 5,
+}
+
+
+class SemRedirecionar(HTTPRedirectHandler):
+    """Mede só a requisição pedida; o 302 vira resposta e não é seguido"""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Usuario:
+    """Usuário virtual com seus próprios cookies (sessão e CSRF)"""
+
+    def __init__(self, comando, email):
+        self.comando = comando
+        self.email = email
+        self.cookies = CookieJar()
+        self.navegador = build_opener(HTTPCookieProcessor(self.cookies), SemRedirecionar)
+        self.abertos = []
+        self.medidas = []
+
+    def csrf(self):
+        return next((c.value for c in self.cookies if c.name == 'csrftoken'), '')
+
+    def pedir(self, nome, caminho, dados=None, corpo_json=None):
+        cabecalhos = {}
+        corpo = None
+        if dados is not None:
+            corpo = urlencode({**dados, 'csrfmiddlewaretoken': self.csrf()}).encode()
+            cabecalhos['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif corpo_json is not None:
+            corpo = json.dumps(corpo_json).encode()
+            cabecalhos['Content-Type'] = 'application/json'
+            cabecalhos['X-CSRFToken'] = self.csrf()
+
+        pedido = Request(self.comando.url + caminho, data=corpo, headers=cabecalhos)
+        inicio = time.perf_counter()
+        try:
+            with self.navegador.open(pedido, timeout=30) as resposta:
+                status, conteudo = resposta.status, resposta.read()
+        except HTTPError as e:
+            status, conteudo = e.code, e.read()
+        except (URLError, OSError):
+            status, conteudo = 0, b''
+        self.medidas.append((nome, (time.perf_counter() - inicio) * 1000, 0 < status < 400))
+        return status, conteudo
+
+    def login(self):
+        self.pedir('login_formulario', reverse('login'))
+        self.pedir('login', reverse('login'), {'email': self.email, 'senha': SENHA})
+
+    def navegar(self):
+        self.pedir('livros', reverse('livros'))
+        self.pedir('livros_ordem', reverse('livros') + '?ordem=titulo')
+        self.pedir('livro_detalhes', reverse('livro_detalhes', args=[random.choice(self.comando.livros)]))
+        self.pedir('livros_busca', reverse('livros_busca') + '?' + urlencode({'q': random.choice(PALAVRAS)}))
+        self.pedir('autores', reverse('autores'))
+        self.pedir('emprestimos', reverse('emprestimos'))
+
+    def emprestar(self):
+        status, conteudo = self.pedir(
+            'emprestar', reverse('emprestimos_lote'),
+            corpo_json={'livros': [random.choice(self.comando.livros)]},
+        )
+        if status == 200:
+            for r in json.loads(conteudo).get('resultados', []):
+                if r['ok']:
+                    self.abertos.append(r['emprestimo'])
+
+    def devolver(self):
+        if not self.abertos:
+            return self.emprestar()
+        self.pedir(
+            'devolver', reverse('emprestimos_devolver_lote'),
+            corpo_json={'emprestimos': [self.abertos.pop(0)]},
+        )
+
+    def auditoria(self):
+        filtros = {
+            'tabela': random.choice(['', 'Livros', 'Emprestimos', 'Usuarios']),
+            'operacao': random.choice(['', 'INSERT', 'UPDATE']),
+            'dias': random.choice(['7', '30']),
+        }
+        self.pedir('auditoria', reverse('auditoria') + '?' + urlencode(filtros))
+
+    def executar(self, fim):
+        self.login()
+        nomes, pesos = list(JORNADAS), list(JORNADAS.values())
+        while time.monotonic() < fim:
+            getattr(self, random.choices(nomes, pesos)[0])()
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de carga: usuários virtuais (dados de manage.py gerar_dados) "
+        "repetem jornadas ponderadas contra um servidor local e o resultado "
+        "por endpoint (p50/p95/p99 e vazão) é gravado em JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--usuarios', type=int, default=50, help="Usuários virtuais simultâneos")
+        parser.add_argument('--duracao', type=int, default=60, help="Segundos de carga")
+        parser.add_argument('--saida', default=None)
+
+    def handle(self, *args, **options):
+        self.url = options['url'].rstrip('/')
+
+        emails = [r.Email for r in query(
+            "SELECT Email FROM Usuarios WHERE Email LIKE %s LIMIT %s",
+            [f"%@{DOMINIO}", options['usuarios']]
+        )]
+        self.livros = [r.ID_livro for r in query(
+            "SELECT ID_livro FROM Catalogo WHERE Quantidade_disponivel > 0 LIMIT 10000"
+        )]
+        if not emails or not self.livros:
+            raise CommandError("Sem dados de carga: rode manage.py gerar_dados antes")
+
+        virtuais = [Usuario(self, emails[i % len(emails)]) for i in range(options['usuarios'])]
+        fim = time.monotonic() + options['duracao']
+        inicio = time.perf_counter()
+
+        threads = [threading.Thread(target=u.executar, args=(fim,)) for u in virtuais]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        decorrido = time.perf_counter() - inicio
+
+        resultado = self.resumir([m for u in virtuais for m in u.medidas], decorrido, options)
+        saida = options['saida'] or f"carga-{datetime.now():%Y%m%d-%H%M%S}.json"
+        with open(saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+        for nome, e in resultado['endpoints'].items():
+            self.stdout.write(
+                f"{nome:>18}: {e['requisicoes']:6d} req, {e['req_s']:7.1f} req/s, "
+                f"p50 {e['p50_ms']:7.1f}  p95 {e['p95_ms']:7.1f}  p99 {e['p99_ms']:7.1f} ms, "
+                f"{e['erros']} erros"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['requisicoes']} requisições, {resultado['req_s']:.1f} req/s; resultado em {saida}"
+        ))
+
+    def resumir(self, medidas, decorrido, options):
+        por_endpoint = {}
+        for nome, ms, ok in medidas:
+            por_endpoint.setdefault(nome, []).append((ms, ok))
+
+        endpoints = {}
+        for nome, valores in sorted(por_endpoint.items()):
+            tempos = sorted(ms for ms, _ in valores)
+            percentis = statistics.quantiles(tempos, n=100) if len(tempos) > 1 else tempos * 99
+            endpoints[nome] = {
+                'requisicoes': len(valores),
+                'erros': sum(1 for _, ok in valores if not ok),
+                'req_s': len(valores) / decorrido,
+                'p50_ms': percentis[49],
+                'p95_ms': percentis[94],
+                'p99_ms': percentis[98],
+            }
+
+        return {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'url': self.url,
+            'usuarios': options['usuarios'],
+            'duracao_s': decorrido,
+            'requisicoes': len(medidas),
+            'req_s': len(medidas) / decorrido,
+            'endpoints': endpoints,
+        }
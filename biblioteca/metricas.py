@@ -0,0 +1,204 @@
+"""
+Métricas de SQL por requisição, expostas em /metrics (formato Prometheus).
+
+O MetricasMiddleware abre um estado por requisição (numa ContextVar, que
+acompanha as threads do sync_to_async) e um execute_wrapper instalado em
+cada conexão do Django anota ali cada comando: quantidade, tempo total, o
+mais lento e os repetidos (padrão N+1). As consultas assíncronas de
+biblioteca.db_async anotam no mesmo estado. No fim da requisição tudo vai
+para histogramas por nome de URL.
+
+O custo por comando é um par de perf_counter e um incremento de dicionário;
+a trava só é tomada uma vez por requisição. Os números são por processo:
+com vários workers, o Prometheus soma as séries de cada um.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+
+
+logger = logging.getLogger('biblioteca.sql_lento')
+
+# Limites (le) dos histogramas
+SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_atual = ContextVar('metricas_requisicao', default=None)
+_trava = threading.Lock()
+
+
+class Histograma:
+    def __init__(self, limites):
+        self.limites = limites
+        self.series = {}
+
+    def observar(self, rotulo, valor):
+        baldes, soma, total = self.series.get(rotulo) or ([0] * (len(self.limites) + 1), 0, 0)
+        baldes[bisect.bisect_left(self.limites, valor)] += 1
+        self.series[rotulo] = (baldes, soma + valor, total + 1)
+
+    def exportar(self, nome, ajuda):
+        linhas = [f"# HELP {nome} {ajuda}", f"# TYPE {nome} histogram"]
+        for rotulo, (baldes, soma, total) in sorted(self.series.items()):
+            acumulado = 0
+            for limite, quantidade in zip(self.limites, baldes):
+                acumulado += quantidade
+                linhas.append(f'{nome}_bucket{{view="{rotulo}",le="{limite}"}} {acumulado}')
+            linhas.append(f'{nome}_bucket{{view="{rotulo}",le="+Inf"}} {total}')
+            linhas.append(f'{nome}_sum{{view="{rotulo}"}} {soma}')
+            linhas.append(f'{nome}_count{{view="{rotulo}"}} {total}')
+        return linhas
+
+
+duracao = Histograma(SEGUNDOS)
+tempo_sql = Histograma(SEGUNDOS)
+consultas = Histograma(CONSULTAS)
+repeticoes = Counter()
+mais_lenta = {}
+contadores = Counter()
+
+
+class Requisicao:
+    """Comandos SQL de uma requisição"""
+
+    __slots__ = ('total', 'tempo', 'lenta', 'lenta_tempo', 'vistos')
+
+    def __init__(self):
+        self.total = 0
+        self.tempo = 0.0
+        self.lenta = ''
+        self.lenta_tempo = 0.0
+        self.vistos = Counter()
+
+    def anotar(self, sql, segundos):
+        self.total += 1
+        self.tempo += segundos
+        self.vistos[sql] += 1
+        if segundos > self.lenta_tempo:
+            self.lenta, self.lenta_tempo = sql, segundos
+        if segundos * 1000 >= settings.METRICAS_SQL_LENTO_MS:
+            logger.warning("%.1f ms: %s", segundos * 1000, sql)
+
+
+def anotar(sql, segundos):
+    """Registra um comando na requisição atual (sem efeito fora de uma)"""
+    estado = _atual.get()
+    if estado is not None:
+        estado.anotar(sql, segundos)
+
+
+def contar(nome, **rotulos):
+    """Incrementa um contador exportado em /metrics (ex.: acertos de cache)"""
+    with _trava:
+        contadores[nome, tuple(sorted(rotulos.items()))] += 1
+
+
+def _instrumentar(execute, sql, params, many, context):
+    estado = _atual.get()
+    if estado is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        estado.anotar(sql, time.perf_counter() - inicio)
+
+
+@receiver(connection_created)
+def _instalar(sender, connection, **kwargs):
+    if _instrumentar not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_instrumentar)
+
+
+def _fechar(request, estado, segundos):
+    match = getattr(request, 'resolver_match', None)
+    view = (match.view_name if match else '') or 'sem_rota'
+
+    repetidos = [sql for sql, n in estado.vistos.items() if n >= settings.METRICAS_REPETICOES]
+    for sql in repetidos:
+        logger.info("%s: %d vezes o mesmo comando (N+1?): %s", view, estado.vistos[sql], sql)
+
+    with _trava:
+        duracao.observar(view, segundos)
+        tempo_sql.observar(view, estado.tempo)
+        consultas.observar(view, estado.total)
+        if repetidos:
+            repeticoes[view] += 1
+        if estado.lenta_tempo > mais_lenta.get(view, 0):
+            mais_lenta[view] = estado.lenta_tempo
+
+
+class MetricasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+
+        estado = Requisicao()
+        token = _atual.set(estado)
+        inicio = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            _atual.reset(token)
+            _fechar(request, estado, time.perf_counter() - inicio)
+
+    async def __acall__(self, request):
+        estado = Requisicao()
+        token = _atual.set(estado)
+        inicio = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            _atual.reset(token)
+            _fechar(request, estado, time.perf_counter() - inicio)
+
+
+def metrics(request):
+    """Exporta as métricas no formato texto do Prometheus"""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICAS_IPS:
+        return HttpResponseForbidden()
+
+    with _trava:
+        linhas = (
+            duracao.exportar('biblioteca_requisicao_segundos', "Duração da requisição por view")
+            + tempo_sql.exportar('biblioteca_sql_segundos', "Tempo total de SQL por requisição")
+            + consultas.exportar('biblioteca_sql_consultas', "Comandos SQL por requisição")
+        )
+        linhas += [
+            "# HELP biblioteca_sql_repeticoes_total Requisições com o mesmo comando repetido (N+1)",
+            "# TYPE biblioteca_sql_repeticoes_total counter",
+        ]
+        linhas += [f'biblioteca_sql_repeticoes_total{{view="{v}"}} {n}' for v, n in sorted(repeticoes.items())]
+        linhas += [
+            "# HELP biblioteca_sql_mais_lenta_segundos Comando SQL mais lento já visto na view",
+            "# TYPE biblioteca_sql_mais_lenta_segundos gauge",
+        ]
+        linhas += [f'biblioteca_sql_mais_lenta_segundos{{view="{v}"}} {s}' for v, s in sorted(mais_lenta.items())]
+
+        anterior = None
+        for (nome, rotulos), n in sorted(contadores.items()):
+            if nome != anterior:
+                linhas.append(f"# TYPE {nome} counter")
+                anterior = nome
+            texto = ','.join(f'{k}="{v}"' for k, v in rotulos)
+            linhas.append(f"{nome}{{{texto}}} {n}")
+
+    return HttpResponse('\n'.join(linhas) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,134 @@
+"""
+Paginação por chave (keyset) para as listagens do catálogo.
+
+Cada página é buscada a partir do último registro visto, com
+WHERE coluna > cursor ORDER BY coluna LIMIT n, então o custo é o mesmo
+na primeira página ou na milésima. As colunas de ordenação aceitas
+precisam de índice (ver db.sql); com '-' na frente (ex.: '-Ano_publicacao')
+a ordem é decrescente, e a chave primária desempata no mesmo sentido.
+"""
+import base64
+import json
+
+from django.conf import settings
+
+from biblioteca.db import query
+from biblioteca.db_async import aquery
+
+
+def codificar_cursor(valor, chave):
+    """Gera o token opaco usado nos links de próxima/anterior"""
+    dados = json.dumps([valor, chave], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(dados).decode().rstrip('=')
+
+
+def decodificar_cursor(token):
+    """Lê o token do cursor; retorna None se ausente ou inválido"""
+    if not token:
+        return None
+    try:
+        dados = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        valor, chave = json.loads(dados)
+    except (ValueError, TypeError):
+        return None
+    return valor, chave
+
+
+def tamanho_pagina(request):
+    """Tamanho da página pedido em ?tamanho=, limitado ao máximo configurado"""
+    tamanho = request.GET.get('tamanho', '')
+    if not tamanho.isdigit() or int(tamanho) < 1:
+        return settings.PAGINACAO_TAMANHO
+    return min(int(tamanho), settings.PAGINACAO_TAMANHO_MAXIMO)
+
+
+def _consulta(request, tabela, chave, ordens, colunas):
+    """Monta o SELECT da página pedida e o estado usado para montar os links"""
+    ordem = request.GET.get('ordem', '')
+    if ordem not in ordens:
+        ordem = ''
+    coluna = ordens.get(ordem, chave)
+    descendente = coluna.startswith('-')
+    coluna = coluna.lstrip('-')
+    tamanho = tamanho_pagina(request)
+
+    cursor = decodificar_cursor(request.GET.get('antes'))
+    voltando = cursor is not None
+    if not voltando:
+        cursor = decodificar_cursor(request.GET.get('apos'))
+
+    sql = f"SELECT {colunas} FROM {tabela}"
+    params = []
+    # Voltar uma página inverte o sentido da ordem pedida
+    crescente = voltando == descendente
+    operador = '>' if crescente else '<'
+
+    if cursor is not None:
+        valor, id_cursor = cursor
+        if coluna == chave:
+            sql += f" WHERE {chave} {operador} %s"
+            params.append(id_cursor)
+        else:
+            sql += f" WHERE ({coluna} {operador} %s OR ({coluna} = %s AND {chave} {operador} %s))"
+            params.extend([valor, valor, id_cursor])
+
+    direcao = 'ASC' if crescente else 'DESC'
+    sql += f" ORDER BY {coluna} {direcao}"
+    if coluna != chave:
+        sql += f", {chave} {direcao}"
+    sql += " LIMIT %s"
+    params.append(tamanho + 1)
+
+    estado = {
+        'chave': chave,
+        'coluna': coluna,
+        'ordem': ordem,
+        'ordens': list(ordens),
+        'tamanho': tamanho,
+        'voltando': voltando,
+        'inicio': cursor is None,
+    }
+    return sql, params, estado
+
+
+def _contexto(dados, estado):
+    tamanho, coluna, chave = estado['tamanho'], estado['coluna'], estado['chave']
+    mais = len(dados) > tamanho
+    dados = dados[:tamanho]
+
+    if estado['voltando']:
+        dados.reverse()
+        tem_anterior, tem_proximo = mais, True
+    else:
+        tem_anterior, tem_proximo = not estado['inicio'], mais
+
+    def token(registro):
+        return codificar_cursor(getattr(registro, coluna), getattr(registro, chave))
+
+    return {
+        'dados': dados,
+        'pagina': {
+            'anterior': token(dados[0]) if dados and tem_anterior else '',
+            'proximo': token(dados[-1]) if dados and tem_proximo else '',
+            'ordem': estado['ordem'],
+            'ordens': estado['ordens'],
+            'tamanho': tamanho,
+        },
+    }
+
+
+def paginar(request, tabela, chave, ordens=None, colunas='*'):
+    """
+    Busca uma página de `tabela` ordenada pela chave primária ou por uma
+    das colunas de `ordens` ({'nome no link': 'Coluna'}).
+
+    Retorna o contexto com 'dados' e 'pagina' para o template paginacao.html.
+    """
+    sql, params, estado = _consulta(request, tabela, chave, ordens or {}, colunas)
+    return _contexto(query(sql, params), estado)
+
+
+async def apaginar(request, tabela, chave, ordens=None, colunas='*'):
+    """Versão assíncrona de paginar, sobre biblioteca.db_async"""
+    sql, params, estado = _consulta(request, tabela, chave, ordens or {}, colunas)
+    return _contexto(await aquery(sql, params), estado)
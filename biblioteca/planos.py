@@ -0,0 +1,397 @@
+"""
+Planos de execução do SQL das views (usado por manage.py sugerir_indices).
+
+capturar() entra no site com o cliente de teste do Django pelo formulário
+de login (com uma senha provisória gravada para o usuário escolhido),
+visita as páginas e faz os POSTs de empréstimo e devolução (avulso e em
+lote) com dados válidos, anotando cada comando com seus parâmetros e as
+views que o emitiram. Tudo roda numa transação desfeita ao final, inclusive
+a senha provisória e os empréstimos criados.
+explicar() roda EXPLAIN FORMAT=JSON em cada SELECT e aponta varreduras
+completas de tabela, ordenação em arquivo (filesort) e tabelas
+temporárias. sugerir() transforma cada achado num índice: colunas de
+igualdade, depois as de intervalo e por fim as do ORDER BY, quando o
+índice ainda não existe.
+"""
+import hashlib
+import json
+import re
+import secrets
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from biblioteca.db import query, execute
+from emprestimos.circulacao import LIMITE_ATIVOS
+from usuarios.login_ultilitarios import gerar_hash
+
+
+# Rotas que alteram dados num GET ou não consultam o banco
+IGNORAR = {'logout', 'metrics', 'limpar_auditoria'}
+
+# Rotas só de POST, exercitadas por _postar()
+SO_POST = {'emprestimos_devolver_lote'}
+
+# Tabela de onde sai o <int:id> das rotas, pelo prefixo da URL
+TABELAS = {
+    'livros': ('Livros', 'ID_livro'),
+    'autores': ('Autores', 'ID_autor'),
+    'editoras': ('Editoras', 'ID_editora'),
+    'generos': ('Generos', 'ID_genero'),
+    'emprestimos': ('Emprestimos', 'ID_emprestimo'),
+    'auditoria': ('Auditoria', 'ID_auditoria'),
+}
+
+# Filtros e ordenações visitados além da página padrão
+VARIACOES = {
+    'livros': ['?ordem=titulo'],
+    'livros_busca': ['?q=casa'],
+    'emprestimos_lote': ['?q=casa'],
+    'autores': ['?ordem=nome'],
+    'editoras': ['?ordem=nome'],
+    'generos': ['?ordem=nome'],
+    'usuarios': ['?ordem=nome'],
+    'auditoria': ['?dias=30', '?tabela=Livros&operacao=UPDATE&dias=365'],
+    'exportar_auditoria': ['?formato=csv&dias=30'],
+    'emprestimos_multas': ['?formato=json'],
+}
+
+PALAVRAS_SQL = {
+    'on', 'where', 'join', 'left', 'right', 'inner', 'outer', 'cross', 'group',
+    'order', 'limit', 'using', 'union', 'as', 'straight_join', 'force', 'use',
+    'ignore', 'natural', 'having', 'for', 'window',
+}
+
+
+def _rotas(padroes, prefixo=''):
+    """Gera (nome, rota completa, tem parâmetro) de todas as URLs nomeadas"""
+    for p in padroes:
+        if isinstance(p, URLResolver):
+            if p.app_name == 'admin':
+                continue
+            yield from _rotas(p.url_patterns, prefixo + str(p.pattern))
+        elif isinstance(p, URLPattern) and p.name:
+            yield p.name, prefixo + str(p.pattern), bool(p.pattern.converters)
+
+
+def _exemplo(tabela, chave):
+    linha = query(f"SELECT MIN({chave}) AS id FROM {tabela}")
+    return linha[0].id if linha else None
+
+
+def usuario_padrao():
+    """
+    Usuário com e-mail e mais empréstimos (deixa as páginas dele com dados)
+    que ainda pode pegar os dois livros dos POSTs de _postar()
+    """
+    linha = query("""
+        SELECT e.Usuario_id AS id
+        FROM Emprestimos e
+        JOIN Usuarios u ON e.Usuario_id = u.ID_usuario
+        WHERE u.Email IS NOT NULL
+        GROUP BY e.Usuario_id
+        HAVING SUM(e.Status_emprestimo = 'pendente') <= %s
+        ORDER BY COUNT(*) DESC LIMIT 1
+    """, [LIMITE_ATIVOS - 2]) or query("SELECT MIN(ID_usuario) AS id FROM Usuarios WHERE Email IS NOT NULL")
+    return linha[0].id if linha else None
+
+
+def caminhos(usuario):
+    """(nome da rota, caminho) das páginas a visitar e as rotas puladas"""
+    visitas, pulados = [], []
+    for nome, rota, parametro in _rotas(get_resolver().url_patterns):
+        if nome in IGNORAR or nome in SO_POST or nome.endswith('_delete'):
+            continue
+
+        args = []
+        if parametro:
+            prefixo = rota.split('/', 1)[0]
+            if prefixo == 'usuarios':
+                args = [usuario]
+            elif prefixo in TABELAS:
+                id = _exemplo(*TABELAS[prefixo])
+                if id is None:
+                    pulados.append(nome)
+                    continue
+                args = [id]
+            else:
+                pulados.append(nome)
+                continue
+
+        caminho = reverse(nome, args=args)
+        visitas.append((nome, caminho))
+        visitas += [(nome, caminho + v) for v in VARIACOES.get(nome, [])]
+    return visitas, pulados
+
+
+class Captura:
+    """execute_wrapper que anota cada comando com a view que está rodando"""
+
+    def __init__(self):
+        self.view = ''
+        self.comandos = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql not in self.comandos:
+            self.comandos[sql] = {'sql': sql, 'params': params, 'views': set()}
+        self.comandos[sql]['views'].add(self.view)
+        return execute(sql, params, many, context)
+
+
+def _entrar(cliente, usuario):
+    """
+    Grava uma senha provisória para `usuario` (desfeita com a transação) e
+    entra pelo formulário de login. Retorna a resposta do POST.
+    """
+    email = query("SELECT Email FROM Usuarios WHERE ID_usuario = %s", [usuario])
+    if not email or not email[0].Email:
+        raise RuntimeError(f"Usuário {usuario} sem e-mail para o login")
+
+    senha = secrets.token_urlsafe(12)
+    # Sem multa, para que os empréstimos abaixo sejam aceitos
+    execute(
+        "UPDATE Usuarios SET Senha = %s, Multa_atual = 0 WHERE ID_usuario = %s",
+        [gerar_hash(senha), usuario]
+    )
+    return cliente.post(reverse('login'), {'email': email[0].Email, 'senha': senha})
+
+
+def _postar(cliente, captura, falhas):
+    """Empréstimo avulso, em lote e devolução em lote de um livro disponível"""
+    livro = query("""
+        SELECT MIN(ID_livro) AS id FROM Livros WHERE Quantidade_disponivel > 1
+    """)[0].id
+    if livro is None:
+        falhas.append(('POST emprestimos', 'nenhum livro com 2 exemplares disponíveis'))
+        return
+
+    captura.view = 'emprestimos_add'
+    resposta = cliente.post(reverse('emprestimos_add'), {'livro': livro})
+    if resposta.status_code not in (200, 302):
+        falhas.append((reverse('emprestimos_add'), resposta.status_code))
+
+    captura.view = 'emprestimos_lote'
+    resultados = _postar_lote(cliente, 'emprestimos_lote', {'livros': [livro]}, falhas)
+    emprestados = [r['emprestimo'] for r in resultados if r['ok']]
+    if emprestados:
+        captura.view = 'emprestimos_devolver_lote'
+        _postar_lote(cliente, 'emprestimos_devolver_lote', {'emprestimos': emprestados}, falhas)
+
+
+def _postar_lote(cliente, nome, corpo, falhas):
+    """POST JSON numa rota de lote; anota em `falhas` se nenhum item foi aceito"""
+    resposta = cliente.post(reverse(nome), corpo, content_type='application/json')
+    if resposta.status_code != 200:
+        falhas.append((reverse(nome), resposta.status_code))
+        return []
+    resultados = resposta.json()['resultados']
+    if not any(r['ok'] for r in resultados):
+        falhas.append((reverse(nome), resultados[0]['mensagem'] if resultados else 'lote vazio'))
+    return resultados
+
+
+def capturar(usuario):
+    """
+    Entra como `usuario`, visita as páginas e faz os POSTs de circulação.
+    Retorna (comandos, falhas, pulados): os comandos distintos com
+    parâmetros e views, as requisições que falharam e as rotas sem id de
+    exemplo.
+    """
+    cliente = Client(raise_request_exception=False)
+
+    # Sem cache, para que cada página faça as suas consultas
+    for alias in ('fragmentos', 'referencias'):
+        caches[alias].clear()
+
+    captura = Captura()
+    visitas, pulados = caminhos(usuario)
+    falhas = []
+    # Libera o host 'testserver' do cliente em ALLOWED_HOSTS
+    setup_test_environment()
+    try:
+        with transaction.atomic():
+            with connection.execute_wrapper(captura):
+                captura.view = 'login'
+                resposta = _entrar(cliente, usuario)
+                if resposta.status_code != 302:
+                    raise RuntimeError(f"Login como o usuário {usuario} recusado")
+
+                for nome, caminho in visitas:
+                    captura.view = nome
+                    resposta = cliente.get(caminho)
+                    if resposta.status_code not in (200, 302, 304):
+                        falhas.append((caminho, resposta.status_code))
+
+                _postar(cliente, captura, falhas)
+            transaction.set_rollback(True)
+    finally:
+        teardown_test_environment()
+        if settings.SESSION_COOKIE_NAME in cliente.cookies:
+            cliente.session.delete()
+
+    return list(captura.comandos.values()), falhas, pulados
+
+
+def _apelidos(sql):
+    """Mapa apelido -> tabela das cláusulas FROM/JOIN"""
+    apelidos = {}
+    for tabela, apelido in re.findall(r'\b(?:FROM|JOIN)\s+`?(\w+)`?(?:\s+(?:AS\s+)?`?(\w+)`?)?', sql, re.I):
+        if apelido.lower() in PALAVRAS_SQL:
+            apelido = ''
+        apelidos[apelido or tabela] = tabela
+        apelidos[tabela] = tabela
+    return apelidos
+
+
+def _tabelas(no):
+    """Nós 'table' do plano, em profundidade"""
+    if isinstance(no, dict):
+        if 'table_name' in no:
+            yield no
+        for valor in no.values():
+            yield from _tabelas(valor)
+    elif isinstance(no, list):
+        for item in no:
+            yield from _tabelas(item)
+
+
+def _operacoes(no):
+    """Nós com using_filesort ou using_temporary_table"""
+    if isinstance(no, dict):
+        if no.get('using_filesort') or no.get('using_temporary_table'):
+            yield no
+        for valor in no.values():
+            yield from _operacoes(valor)
+    elif isinstance(no, list):
+        for item in no:
+            yield from _operacoes(item)
+
+
+def _condicao(condicao, apelido):
+    """Colunas do apelido na condição: (igualdades, intervalos)"""
+    iguais, intervalos = [], []
+    padrao = r'`%s`\.`(\w+)`\s*(=|<=|>=|<>|<|>|in\b|between\b|like\b|is\b)?' % re.escape(apelido)
+    for coluna, operador in re.findall(padrao, condicao or '', re.I):
+        destino = iguais if operador.lower() in ('=', 'in', 'is') else intervalos
+        if coluna not in iguais + intervalos:
+            destino.append(coluna)
+    return iguais, intervalos
+
+
+def _ordem(sql, apelido, unica):
+    """Colunas do ORDER BY que pertencem ao apelido"""
+    achado = re.search(r'\bORDER BY\s+(.+?)(?:\bLIMIT\b|\bFOR\s+(?:UPDATE|SHARE)\b|$)', sql, re.I | re.S)
+    if not achado:
+        return []
+    colunas = []
+    for termo in achado.group(1).split(','):
+        partes = termo.replace('`', '').split()
+        # Só colunas simples, com ASC/DESC; expressões (CASE, funções) não viram índice
+        if not partes or len(partes) > 2 or (len(partes) == 2 and partes[1].upper() not in ('ASC', 'DESC')):
+            continue
+        termo = partes[0]
+        if not re.fullmatch(r'\w+(\.\w+)?', termo) or termo.lower() in PALAVRAS_SQL:
+            continue
+        if '.' in termo:
+            dono, coluna = termo.split('.', 1)
+            if dono == apelido:
+                colunas.append(coluna)
+        elif unica:
+            colunas.append(termo)
+    return colunas
+
+
+def _chave(tipo, tabela, sql):
+    return f"{tipo}:{tabela}:{hashlib.sha1(sql.encode()).hexdigest()[:12]}"
+
+
+def explicar(comandos, minimo_linhas):
+    """
+    EXPLAIN de cada SELECT capturado. Retorna os achados: varredura
+    completa (com pelo menos `minimo_linhas` linhas), filesort e tabela
+    temporária, cada um com tabela, colunas candidatas e views.
+    """
+    achados = []
+    with connection.cursor() as cursor:
+        for c in comandos:
+            if not c['sql'].strip().lstrip('(').upper().startswith(('SELECT', 'WITH')):
+                continue
+            cursor.execute('EXPLAIN FORMAT=JSON ' + c['sql'], c['params'])
+            plano = json.loads(cursor.fetchone()[0])
+            apelidos = _apelidos(c['sql'])
+            unica = len(set(apelidos.values())) == 1
+
+            for no in _tabelas(plano):
+                apelido = no['table_name']
+                tabela = apelidos.get(apelido)
+                linhas = no.get('rows_examined_per_scan', 0)
+                if tabela is None or no.get('access_type') != 'ALL' or linhas < minimo_linhas:
+                    continue
+                iguais, intervalos = _condicao(no.get('attached_condition'), apelido)
+                achados.append({
+                    'tipo': 'varredura', 'tabela': tabela, 'linhas': linhas,
+                    'colunas': iguais + intervalos + _ordem(c['sql'], apelido, unica),
+                    'sql': c['sql'], 'views': sorted(c['views']),
+                })
+
+            for op in _operacoes(plano):
+                primeiro = next(_tabelas(op), None)
+                if primeiro is None or primeiro['table_name'] not in apelidos:
+                    continue
+                apelido = primeiro['table_name']
+                iguais, _ = _condicao(primeiro.get('attached_condition'), apelido)
+                achados.append({
+                    'tipo': 'filesort' if op.get('using_filesort') else 'temporaria',
+                    'tabela': apelidos[apelido],
+                    'linhas': primeiro.get('rows_examined_per_scan', 0),
+                    'colunas': iguais + _ordem(c['sql'], apelido, unica),
+                    'sql': c['sql'], 'views': sorted(c['views']),
+                })
+
+    for a in achados:
+        a['chave'] = _chave(a['tipo'], a['tabela'], a['sql'])
+    return achados
+
+
+def indices_existentes():
+    """Mapa tabela -> lista de índices (tupla de colunas, na ordem)"""
+    indices = {}
+    for r in query("""
+        SELECT TABLE_NAME, INDEX_NAME, GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX) AS colunas
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE()
+        GROUP BY TABLE_NAME, INDEX_NAME
+    """):
+        indices.setdefault(r.TABLE_NAME.lower(), []).append(tuple(r.colunas.lower().split(',')))
+    return indices
+
+
+def sugerir(achados, maximo_colunas=3):
+    """Índices recomendados (tabela, colunas) que ainda não existem, sem repetição"""
+    existentes = indices_existentes()
+    sugeridos = []
+    for a in achados:
+        colunas = tuple(dict.fromkeys(a['colunas']))[:maximo_colunas]
+        if not colunas:
+            continue
+        minusculas = tuple(c.lower() for c in colunas)
+        cobertos = existentes.get(a['tabela'].lower(), []) + [
+            tuple(c.lower() for c in s[1]) for s in sugeridos if s[0] == a['tabela']
+        ]
+        if any(indice[:len(minusculas)] == minusculas for indice in cobertos):
+            continue
+        sugeridos.append((a['tabela'], colunas))
+    return sugeridos
+
+
+def migracao(sugeridos):
+    """Comandos CREATE INDEX no formato de db.sql"""
+    linhas = []
+    for tabela, colunas in sugeridos:
+        nome = f"idx_{tabela.lower()}_{'_'.join(c.lower() for c in colunas)}"[:64]
+        linhas.append(f"CREATE INDEX {nome} ON {tabela} ({', '.join(colunas)});")
+    return linhas
@@ -0,0 +1,52 @@
+"""
+Cache das tabelas de referência (Autores, Gêneros, Editoras) usadas nos
+<select> dos formulários de livros.
+
+Usa o cache 'referencias' de settings.CACHES: por padrão em memória do
+processo, com TTL e número máximo de entradas; apontar esse alias para
+Redis/Memcached torna a invalidação visível a todos os workers.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from biblioteca.db import query, registro
+
+
+REFERENCIAS = {
+    'autores': ('ID_autor', 'Nome_autor', 'Autores'),
+    'generos': ('ID_genero', 'Nome_genero', 'Generos'),
+    'editoras': ('ID_editora', 'Nome_editora', 'Editoras'),
+}
+
+
+def _cache():
+    return caches['referencias']
+
+
+def _carregar(nome):
+    chave, coluna, tabela = REFERENCIAS[nome]
+    linhas = _cache().get(nome)
+    if linhas is None:
+        linhas = [
+            tuple(r) for r in query(f"SELECT {chave}, {coluna} FROM {tabela} ORDER BY {coluna}")
+        ]
+        if len(linhas) <= settings.REFERENCIAS_MAXIMO_ITENS:
+            _cache().set(nome, linhas)
+    return linhas
+
+
+def referencias(nome):
+    """Lista (id, nome) da tabela de referência, pronta para o template"""
+    chave, coluna, _ = REFERENCIAS[nome]
+    Registro = registro((chave, coluna))
+    return [Registro._make(linha) for linha in _carregar(nome)]
+
+
+def nomes(nome):
+    """Mapa id -> nome da tabela de referência"""
+    return dict(_carregar(nome))
+
+
+def invalidar(nome):
+    """Descarta o cache da tabela após uma escrita"""
+    _cache().delete(nome)
@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'biblioteca.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -95,6 +96,8 @@ DATABASES = {
         'PASSWORD': 'root',
         'HOST': 'localhost',
         'PORT': '3306',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
         'OPTIONS': {
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
             'charset': 'utf8mb4',
@@ -103,6 +106,135 @@ DATABASES = {
     }
 }
 
+# Cache
+# O alias 'referencias' guarda os mapas id -> nome de Autores/Gêneros/Editoras.
+# Para compartilhar entre workers, troque o BACKEND por Redis ou Memcached.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'referencias': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'referencias',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 16},
+    },
+    'sessoes': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'sessoes_cache',
+        'TIMEOUT': 60 * 60 * 24 * 14,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'fragmentos': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragmentos',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+# Tabelas de referência maiores que isso não são guardadas no cache
+REFERENCIAS_MAXIMO_ITENS = 5000
+
+# Paginação por chave das listagens (?tamanho= aceita até o máximo)
+
+PAGINACAO_TAMANHO = 50
+PAGINACAO_TAMANHO_MAXIMO = 200
+
+# Auditoria
+# 'trigger': os triggers *_audit_* gravam cada evento na própria transação.
+# 'aplicacao': as views enfileiram os eventos e uma thread os grava em lote
+# (ver auditoria/fila.py), com spool local para não perder nada numa queda.
+
+AUDITORIA_MODO = 'trigger'
+AUDITORIA_SPOOL = BASE_DIR / 'auditoria_spool'
+AUDITORIA_LOTE_TAMANHO = 500
+AUDITORIA_LOTE_ESPERA = 0.5
+
+# Métricas de SQL por requisição (biblioteca/metricas.py, exportadas em /metrics)
+# Comandos acima de METRICAS_SQL_LENTO_MS vão para sql_lento.log; um mesmo
+# comando repetido METRICAS_REPETICOES vezes numa requisição conta como N+1.
+
+METRICAS_SQL_LENTO_MS = 200
+METRICAS_REPETICOES = 5
+METRICAS_IPS = ['127.0.0.1', '::1']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simples': {'format': '{asctime} {levelname} {message}', 'style': '{'},
+    },
+    'handlers': {
+        'sql_lento': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': BASE_DIR / 'sql_lento.log',
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 3,
+            'formatter': 'simples',
+        },
+    },
+    'loggers': {
+        'biblioteca.sql_lento': {'handlers': ['sql_lento'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Pilha das views de leitura (livros, autores, editoras, gêneros,
+# empréstimos e auditoria): 'sync' usa as views de sempre; 'async' usa as
+# versões assíncronas sobre o aiomysql, com pool próprio (só sob ASGI, ex.:
+# uvicorn biblioteca.asgi:application).
+
+PILHA_VIEWS = 'sync'
+POOL_ASSINCRONO_MINIMO = 1
+POOL_ASSINCRONO_MAXIMO = 20
+
+# Sessões
+# 'cached_db' (padrão): o login_required lê a sessão do cache 'sessoes' (em
+# arquivo, compartilhado pelos workers da máquina) e só consulta o banco
+# quando ela não está lá.
+# 'cookie': sessão assinada no próprio cookie, sem banco nem cache; o logout
+# não invalida cópias antigas do cookie até SESSION_COOKIE_AGE.
+# 'db': backend padrão do Django, uma consulta em django_session por página.
+# As mensagens ficam em cookie para não gravar a sessão a cada aviso.
+
+SESSAO_MODO = 'cached_db'
+SESSION_ENGINE = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}[SESSAO_MODO]
+SESSION_CACHE_ALIAS = 'sessoes'
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Hash de senhas (ver usuarios/login_ultilitarios.py)
+# SENHA_METODO segue o formato do werkzeug; ao mudar o custo, os hashes
+# antigos são refeitos no próximo login de cada usuário.
+# SENHA_POOL (só no login assíncrono, PILHA_VIEWS = 'async'): 'thread' ou
+# 'processo'; SENHA_TRABALHADORES = None usa um trabalhador por núcleo.
+
+SENHA_METODO = 'scrypt:32768:8:1'
+SENHA_SALT_TAMANHO = 16
+SENHA_POOL = 'thread'
+SENHA_TRABALHADORES = None
+
+# Cache das tabelas das listagens (biblioteca/fragmentos.py)
+# As views de escrita invalidam na hora; FRAGMENTOS_TTL limita o quanto uma
+# tabela fica desatualizada depois de escritas fora das views (comandos,
+# SQL direto). Tabelas maiores que FRAGMENTOS_TAMANHO_MAXIMO (bytes) não
+# são guardadas.
+
+FRAGMENTOS_TTL = 60
+FRAGMENTOS_TAMANHO_MAXIMO = 512 * 1024
+
+# Empréstimos (emprestimos/circulacao.py)
+# Em deadlock ou espera de trava esgotada a transação é repetida até
+# EMPRESTIMO_TENTATIVAS vezes, esperando até EMPRESTIMO_ESPERA segundos
+# (vezes o número da tentativa) entre elas.
+
+EMPRESTIMO_TENTATIVAS = 3
+EMPRESTIMO_ESPERA = 0.05
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
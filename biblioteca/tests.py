@@ -0,0 +1,366 @@
+import base64
+import io
+import json
+import tempfile
+from collections import namedtuple
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from biblioteca import paginacao, planos
+from biblioteca.esquema import comandos
+from biblioteca.paginacao import codificar_cursor, decodificar_cursor, paginar
+
+
+Livro = namedtuple('Livro', ['ID_livro', 'Titulo', 'Ano_publicacao'])
+
+ORDENS = {'titulo': 'Titulo', 'recentes': '-Ano_publicacao'}
+
+
+def livros(*ids):
+    return [Livro(i, f"Livro {i:03d}", 2000 + i) for i in ids]
+
+
+@override_settings(PAGINACAO_TAMANHO=3, PAGINACAO_TAMANHO_MAXIMO=10)
+class PaginacaoTests(SimpleTestCase):
+    def setUp(self):
+        self.fabrica = RequestFactory()
+
+    def paginar(self, url, dados, ordens=ORDENS):
+        """Roda paginar() com `dados` como resposta do banco; retorna (contexto, sql, params)"""
+        with mock.patch.object(paginacao, 'query', return_value=dados) as query:
+            contexto = paginar(self.fabrica.get(url), 'Livros', 'ID_livro', ordens)
+        sql, params = query.call_args.args
+        return contexto, sql, params
+
+    def test_cursor_ida_e_volta(self):
+        for valor, chave in [('Dom Casmurro', 7), (1999, 3), (None, 1), ('ação/ç?&=', 42)]:
+            token = codificar_cursor(valor, chave)
+            self.assertNotIn('=', token)
+            self.assertEqual(decodificar_cursor(token), (valor, chave))
+
+    def test_cursor_invalido(self):
+        valido = codificar_cursor('Titulo', 5)
+        # JSON que não é um par [valor, chave]
+        outros = [base64.urlsafe_b64encode(j.encode()).decode() for j in ['"x"', '7', '[1, 2, 3]', '{}']]
+        for token in ['', None, '!!!', 'bm9wZQ', valido[:-3], *outros]:
+            self.assertIsNone(decodificar_cursor(token), token)
+
+    def test_cursor_adulterado_vira_primeira_pagina(self):
+        contexto, sql, params = self.paginar('/livros/?apos=lixo%%%', livros(1, 2, 3, 4))
+        self.assertNotIn('WHERE', sql)
+        self.assertEqual(params, [4])
+        self.assertEqual(contexto['pagina']['anterior'], '')
+
+    def test_primeira_pagina_usa_linha_extra_para_o_proximo(self):
+        contexto, sql, params = self.paginar('/livros/', livros(1, 2, 3, 4))
+
+        self.assertEqual(sql, "SELECT * FROM Livros ORDER BY ID_livro ASC LIMIT %s")
+        self.assertEqual(params, [4])
+        self.assertEqual([l.ID_livro for l in contexto['dados']], [1, 2, 3])
+        self.assertEqual(contexto['pagina']['anterior'], '')
+        # O token vem da última linha mostrada, não da linha extra
+        self.assertEqual(decodificar_cursor(contexto['pagina']['proximo']), (3, 3))
+
+    def test_ultima_pagina_sem_proximo(self):
+        contexto, _, _ = self.paginar('/livros/?apos=' + codificar_cursor(3, 3), livros(4, 5))
+        self.assertEqual([l.ID_livro for l in contexto['dados']], [4, 5])
+        self.assertEqual(contexto['pagina']['proximo'], '')
+        self.assertEqual(decodificar_cursor(contexto['pagina']['anterior']), (4, 4))
+
+    def test_voltar_inverte_a_consulta_e_a_ordem_das_linhas(self):
+        # Voltando a partir do 7: o banco devolve 6, 5, 4 e a linha extra 3
+        contexto, sql, params = self.paginar('/livros/?antes=' + codificar_cursor(7, 7), livros(6, 5, 4, 3))
+
+        self.assertIn("WHERE ID_livro < %s", sql)
+        self.assertIn("ORDER BY ID_livro DESC", sql)
+        self.assertEqual(params, [7, 4])
+        self.assertEqual([l.ID_livro for l in contexto['dados']], [4, 5, 6])
+        self.assertEqual(decodificar_cursor(contexto['pagina']['anterior']), (4, 4))
+        self.assertEqual(decodificar_cursor(contexto['pagina']['proximo']), (6, 6))
+
+    def test_ordem_crescente_por_coluna_desempata_pela_chave(self):
+        cursor = codificar_cursor('Livro 002', 2)
+        contexto, sql, params = self.paginar(f'/livros/?ordem=titulo&apos={cursor}', livros(3, 4, 5, 6))
+
+        self.assertIn("WHERE (Titulo > %s OR (Titulo = %s AND ID_livro > %s))", sql)
+        self.assertIn("ORDER BY Titulo ASC, ID_livro ASC", sql)
+        self.assertEqual(params, ['Livro 002', 'Livro 002', 2, 4])
+        self.assertEqual(decodificar_cursor(contexto['pagina']['proximo']), ('Livro 005', 5))
+
+    def test_ordem_decrescente(self):
+        cursor = codificar_cursor(2009, 9)
+        contexto, sql, params = self.paginar(f'/livros/?ordem=recentes&apos={cursor}', livros(8, 7, 6, 5))
+
+        self.assertIn("WHERE (Ano_publicacao < %s OR (Ano_publicacao = %s AND ID_livro < %s))", sql)
+        self.assertIn("ORDER BY Ano_publicacao DESC, ID_livro DESC", sql)
+        self.assertEqual(params, [2009, 2009, 9, 4])
+        self.assertEqual([l.ID_livro for l in contexto['dados']], [8, 7, 6])
+        self.assertEqual(decodificar_cursor(contexto['pagina']['proximo']), (2006, 6))
+        self.assertEqual(contexto['pagina']['ordem'], 'recentes')
+
+    def test_ordem_decrescente_voltando(self):
+        cursor = codificar_cursor(2005, 5)
+        contexto, sql, _ = self.paginar(f'/livros/?ordem=recentes&antes={cursor}', livros(6, 7))
+
+        self.assertIn("WHERE (Ano_publicacao > %s OR (Ano_publicacao = %s AND ID_livro > %s))", sql)
+        self.assertIn("ORDER BY Ano_publicacao ASC, ID_livro ASC", sql)
+        self.assertEqual([l.ID_livro for l in contexto['dados']], [7, 6])
+        self.assertEqual(contexto['pagina']['anterior'], '')
+
+    def test_ordem_desconhecida_usa_a_chave(self):
+        _, sql, _ = self.paginar('/livros/?ordem=Senha', livros(1))
+        self.assertIn("ORDER BY ID_livro ASC", sql)
+
+    def test_tamanho_limitado(self):
+        _, _, params = self.paginar('/livros/?tamanho=500', [])
+        self.assertEqual(params, [11])
+        _, _, params = self.paginar('/livros/?tamanho=-2', [])
+        self.assertEqual(params, [4])
+
+
+class ComandosTests(SimpleTestCase):
+    def arquivo(self, nome):
+        return list(comandos(Path(settings.BASE_DIR) / nome))
+
+    def texto(self, conteudo):
+        with tempfile.NamedTemporaryFile('w', suffix='.sql', encoding='utf-8', delete=False) as arquivo:
+            arquivo.write(conteudo)
+        self.addCleanup(Path(arquivo.name).unlink)
+        return list(comandos(arquivo.name))
+
+    def test_db_sql(self):
+        lista = self.arquivo('db.sql')
+
+        self.assertTrue(lista[0].startswith('CREATE TABLE Autores ('))
+        # O último comando do arquivo, sem linhas de comentário antes dele
+        self.assertTrue(lista[-1].startswith('CREATE TABLE Geracoes ('))
+        self.assertTrue(lista[-1].endswith(')'))
+        for comando in lista:
+            self.assertFalse(comando.endswith(';'), comando)
+            self.assertFalse(comando.startswith('--'), comando)
+            self.assertFalse(comando.upper().startswith(('CREATE DATABASE', 'USE ')), comando)
+
+    def test_triggers_com_delimiter(self):
+        lista = self.arquivo('triggers_biblioteca.sql')
+        conteudo = (Path(settings.BASE_DIR) / 'triggers_biblioteca.sql').read_text(encoding='utf-8')
+
+        triggers = [c for c in lista if c.startswith('CREATE TRIGGER')]
+        procedimentos = [c for c in lista if c.startswith('CREATE PROCEDURE')]
+        self.assertEqual(len(triggers), conteudo.count('\nCREATE TRIGGER '))
+        self.assertEqual(len(procedimentos), conteudo.count('\nCREATE PROCEDURE '))
+
+        # Cada corpo vem inteiro, com os ';' internos e sem o '$$'
+        for comando in triggers + procedimentos:
+            self.assertTrue(comando.endswith('END'), comando[:60])
+            self.assertNotIn('$$', comando)
+            self.assertNotIn('DELIMITER', comando)
+        self.assertIn('DROP TRIGGER IF EXISTS livros_audit_update', lista)
+
+    def test_ponto_e_virgula_dentro_de_texto_no_arquivo(self):
+        lista = self.arquivo('triggers_biblioteca.sql')
+        auditoria = next(c for c in lista if c.startswith('CREATE TRIGGER livros_audit_update'))
+
+        self.assertIn("NEW.Titulo, '; ');", auditoria)
+        self.assertIn("LEAVE corpo;", auditoria)
+        self.assertGreater(auditoria.count(';'), 5)
+
+    def test_ponto_e_virgula_dentro_de_texto(self):
+        lista = self.texto(
+            "INSERT INTO t VALUES ('a;', \"b;\");\n"
+            "INSERT INTO t VALUES ('várias\nlinhas;\n', 'it''s;\n');\n"
+            "INSERT INTO t VALUES ('barra \\' ;\n', 'c');\n"
+        )
+        self.assertEqual(lista, [
+            "INSERT INTO t VALUES ('a;', \"b;\")",
+            "INSERT INTO t VALUES ('várias\nlinhas;\n', 'it''s;\n')",
+            "INSERT INTO t VALUES ('barra \\' ;\n', 'c')",
+        ])
+
+    def test_delimiter_e_comentarios(self):
+        lista = self.texto(
+            "CREATE DATABASE x;\nUSE x;\n"
+            "-- comentário;\n"
+            "DELIMITER $$\n"
+            "CREATE PROCEDURE p()\nBEGIN\n    -- dentro do corpo;\n    SELECT 1;\n    SELECT ';$$';\nEND$$\n"
+            "DELIMITER ;\n"
+            "SELECT 2;\n"
+        )
+        self.assertEqual(lista, [
+            "CREATE PROCEDURE p()\nBEGIN\n    -- dentro do corpo;\n    SELECT 1;\n    SELECT ';$$';\nEND",
+            "SELECT 2",
+        ])
+
+    def test_ultimo_comando_sem_delimitador(self):
+        self.assertEqual(self.texto("SELECT 1;\n\nSELECT 2\n  FROM t\n"), ["SELECT 1", "SELECT 2\n  FROM t"])
+        self.assertEqual(self.texto("SELECT 1;\n-- fim\n\n"), ["SELECT 1"])
+
+
+# Planos no formato de EXPLAIN FORMAT=JSON do MySQL 8, pelo SQL explicado
+ATRASADOS = (
+    "SELECT e.ID_emprestimo, l.Titulo FROM Emprestimos e JOIN Livros l ON e.Livro_id = l.ID_livro "
+    "WHERE e.Usuario_id = %s AND e.Data_devolucao_prevista < %s ORDER BY e.Data_emprestimo DESC LIMIT 10"
+)
+TITULOS = "SELECT ID_livro, Titulo FROM Livros ORDER BY Titulo LIMIT %s"
+GENEROS = "SELECT * FROM Generos"
+
+PLANOS = {
+    ATRASADOS: {'query_block': {'select_id': 1, 'ordering_operation': {
+        'using_filesort': True,
+        'nested_loop': [
+            {'table': {
+                'table_name': 'e', 'access_type': 'ALL', 'rows_examined_per_scan': 5000,
+                'attached_condition': "((`biblioteca`.`e`.`Usuario_id` = 7) and "
+                                      "(`biblioteca`.`e`.`Data_devolucao_prevista` < DATE'2024-03-10'))",
+            }},
+            {'table': {'table_name': 'l', 'access_type': 'eq_ref', 'rows_examined_per_scan': 1}},
+        ],
+    }}},
+    TITULOS: {'query_block': {'select_id': 1, 'ordering_operation': {
+        'using_filesort': True,
+        'table': {'table_name': 'Livros', 'access_type': 'ALL', 'rows_examined_per_scan': 20000},
+    }}},
+    GENEROS: {'query_block': {'select_id': 1, 'table': {
+        'table_name': 'Generos', 'access_type': 'ALL', 'rows_examined_per_scan': 12,
+    }}},
+}
+
+INDICES = {
+    'emprestimos': [('id_emprestimo',), ('status_emprestimo', 'data_devolucao_prevista')],
+    'livros': [('id_livro',), ('titulo',)],
+}
+
+
+class CursorExplain:
+    """Cursor falso que responde ao EXPLAIN com o plano de PLANOS"""
+
+    def __init__(self, planos):
+        self.planos = planos
+        self.explicados = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql, params=None):
+        self.explicados.append(sql.removeprefix('EXPLAIN FORMAT=JSON '))
+
+    def fetchone(self):
+        return (json.dumps(self.planos[self.explicados[-1]]),)
+
+
+def capturados(*sqls):
+    return [{'sql': sql, 'params': [], 'views': {'emprestimos'}} for sql in sqls]
+
+
+class PlanosTests(SimpleTestCase):
+    def explicar(self, comandos, minimo_linhas=1000):
+        cursor = CursorExplain(PLANOS)
+        with mock.patch.object(planos, 'connection') as connection:
+            connection.cursor.return_value = cursor
+            achados = planos.explicar(comandos, minimo_linhas)
+        return achados, cursor.explicados
+
+    def test_condicao(self):
+        condicao = (
+            "((`b`.`e`.`Usuario_id` = 7) and (`b`.`e`.`Data_emprestimo` > DATE'2024-01-01') "
+            "and (`b`.`e`.`Status_emprestimo` in ('pendente','atrasado')) "
+            "and (`b`.`e`.`Usuario_id` is not null) and (`b`.`l`.`Genero_id` = 2) "
+            "and (`b`.`e`.`Livro_id` between 1 and 9))"
+        )
+        self.assertEqual(
+            planos._condicao(condicao, 'e'),
+            (['Usuario_id', 'Status_emprestimo'], ['Data_emprestimo', 'Livro_id']),
+        )
+        self.assertEqual(planos._condicao(condicao, 'l'), (['Genero_id'], []))
+        self.assertEqual(planos._condicao(None, 'e'), ([], []))
+
+    def test_ordem(self):
+        self.assertEqual(planos._ordem(ATRASADOS, 'e', False), ['Data_emprestimo'])
+        self.assertEqual(planos._ordem(ATRASADOS, 'l', False), [])
+        self.assertEqual(planos._ordem(TITULOS, 'Livros', True), ['Titulo'])
+        # Coluna sem apelido só conta quando a consulta tem uma tabela só
+        self.assertEqual(planos._ordem(TITULOS, 'Livros', False), [])
+        # Expressões não viram índice
+        sql = "SELECT * FROM Livros ORDER BY CASE WHEN Quantidade_disponivel > 0 THEN 0 ELSE 1 END, Titulo"
+        self.assertEqual(planos._ordem(sql, 'Livros', True), ['Titulo'])
+        self.assertEqual(planos._ordem(GENEROS, 'Generos', True), [])
+        sql = "SELECT * FROM Emprestimos WHERE Usuario_id = %s ORDER BY ID_emprestimo\nFOR UPDATE"
+        self.assertEqual(planos._ordem(sql, 'Emprestimos', True), ['ID_emprestimo'])
+
+    def test_explicar(self):
+        comandos = capturados(ATRASADOS, TITULOS, GENEROS, "UPDATE Livros SET Titulo = %s")
+        achados, explicados = self.explicar(comandos)
+
+        # Só SELECTs vão ao EXPLAIN; Generos é pequena demais para contar
+        self.assertEqual(explicados, [ATRASADOS, TITULOS, GENEROS])
+        self.assertEqual([(a['tipo'], a['tabela'], a['colunas']) for a in achados], [
+            ('varredura', 'Emprestimos', ['Usuario_id', 'Data_devolucao_prevista', 'Data_emprestimo']),
+            ('filesort', 'Emprestimos', ['Usuario_id', 'Data_emprestimo']),
+            ('varredura', 'Livros', ['Titulo']),
+            ('filesort', 'Livros', ['Titulo']),
+        ])
+        self.assertEqual(achados[0]['views'], ['emprestimos'])
+        self.assertEqual(len({a['chave'] for a in achados}), 4)
+
+    def test_sugerir_e_migracao(self):
+        achados, _ = self.explicar(capturados(ATRASADOS, TITULOS))
+        with mock.patch.object(planos, 'indices_existentes', return_value=INDICES):
+            sugeridos = planos.sugerir(achados)
+
+        # Livros.Titulo já tem índice; o filesort de Emprestimos não é prefixo do primeiro sugerido
+        self.assertEqual(sugeridos, [
+            ('Emprestimos', ('Usuario_id', 'Data_devolucao_prevista', 'Data_emprestimo')),
+            ('Emprestimos', ('Usuario_id', 'Data_emprestimo')),
+        ])
+        self.assertEqual(planos.migracao(sugeridos), [
+            "CREATE INDEX idx_emprestimos_usuario_id_data_devolucao_prevista_data_empresti "
+            "ON Emprestimos (Usuario_id, Data_devolucao_prevista, Data_emprestimo);",
+            "CREATE INDEX idx_emprestimos_usuario_id_data_emprestimo ON Emprestimos (Usuario_id, Data_emprestimo);",
+        ])
+
+    def test_sugerir_sem_repetir_prefixos(self):
+        achados = [
+            {'tabela': 'Livros', 'colunas': ['Genero_id', 'Ano_publicacao', 'Titulo', 'ISBN']},
+            {'tabela': 'Livros', 'colunas': ['Genero_id', 'Genero_id']},
+            {'tabela': 'Livros', 'colunas': []},
+        ]
+        with mock.patch.object(planos, 'indices_existentes', return_value=INDICES):
+            self.assertEqual(planos.sugerir(achados), [('Livros', ('Genero_id', 'Ano_publicacao', 'Titulo'))])
+
+    def sugerir_indices(self, comandos, **opcoes):
+        saida = io.StringIO()
+        cursor = CursorExplain(PLANOS)
+        with mock.patch.object(planos, 'usuario_padrao', return_value=1), \
+                mock.patch.object(planos, 'capturar', return_value=(comandos, [], [])), \
+                mock.patch.object(planos, 'indices_existentes', return_value=INDICES), \
+                mock.patch.object(planos, 'connection') as connection:
+            connection.cursor.return_value = cursor
+            call_command('sugerir_indices', stdout=saida, **opcoes)
+        return saida.getvalue()
+
+    def test_linha_de_base(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            base = str(Path(pasta) / 'base.json')
+
+            saida = self.sugerir_indices(capturados(TITULOS), base=base, gravar_base=True)
+            self.assertIn("Linha de base com 2 achados gravada", saida)
+            gravados = json.loads(Path(base).read_text(encoding='utf-8'))
+            self.assertEqual([(a['tipo'], a['tabela']) for a in gravados], [('varredura', 'Livros'), ('filesort', 'Livros')])
+
+            saida = self.sugerir_indices(capturados(TITULOS, GENEROS), base=base)
+            self.assertIn("Planos sem regressão", saida)
+
+            with self.assertRaisesMessage(CommandError, "2 achados fora da linha de base"):
+                self.sugerir_indices(capturados(TITULOS, ATRASADOS), base=base)
+
+    def test_linha_de_base_ausente(self):
+        with self.assertRaisesMessage(CommandError, "Não foi possível ler a linha de base"):
+            self.sugerir_indices(capturados(TITULOS), base='/nao/existe.json')
+        with self.assertRaisesMessage(CommandError, "--gravar-base precisa de --base"):
+            self.sugerir_indices(capturados(TITULOS), gravar_base=True)
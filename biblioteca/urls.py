@@ -17,8 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from biblioteca import metricas
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metricas.metrics, name='metrics'),
     path('', include('app.urls')),
     path('editoras/', include('editoras.urls')),
     path('emprestimos/', include('emprestimos.urls')),
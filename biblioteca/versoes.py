@@ -0,0 +1,83 @@
+"""
+GET condicional (ETag / Last-Modified) das páginas de detalhes.
+
+A versão de cada registro fica em Versoes, mantida pelos triggers
+versoes_* (triggers_biblioteca.sql). A view decorada com condicional()
+consulta só essa linha pela chave primária: se o navegador já tem a
+versão atual responde 304 sem tocar nas tabelas principais nem renderizar.
+
+O ETag inclui o usuário logado, porque o cabeçalho da página mostra o nome
+dele; por isso as respostas são 'private' (cache do navegador, não de
+proxies compartilhados).
+"""
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from biblioteca.db import query
+from biblioteca.db_async import aquery
+
+
+# UNIX_TIMESTAMP converte o TIMESTAMP a partir do UTC guardado, qualquer que
+# seja o time_zone da sessão; Alterado_em lido como DATETIME viria ingênuo,
+# no fuso da sessão, e .timestamp() o trataria como hora local do processo
+VERSAO = """
+    SELECT Versao, UNIX_TIMESTAMP(Alterado_em) AS Modificado
+    FROM Versoes
+    WHERE Tabela = %s AND ID_registro = %s
+"""
+
+
+def _cabecalhos(response, etag, modificado):
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modificado)
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def condicional(tabela):
+    """Responde 304 quando If-None-Match / If-Modified-Since já é a versão atual"""
+    def decorador(view_func):
+        @wraps(view_func)
+        def wrapper(request, id, *args, **kwargs):
+            atual = query(VERSAO, [tabela, id])
+
+            # Sem versão, ou com mensagens a exibir: renderiza normalmente
+            if not atual or len(get_messages(request)):
+                return view_func(request, id, *args, **kwargs)
+
+            usuario = request.session.get('usuario_logado')
+            etag = f'"{tabela}-{id}-{atual[0].Versao}-{usuario}"'
+            modificado = int(atual[0].Modificado)
+
+            response = get_conditional_response(request, etag=etag, last_modified=modificado)
+            if response is None:
+                response = view_func(request, id, *args, **kwargs)
+            return _cabecalhos(response, etag, modificado)
+        return wrapper
+    return decorador
+
+
+def acondicional(tabela):
+    """Versão assíncrona de condicional, sobre biblioteca.db_async"""
+    def decorador(view_func):
+        @wraps(view_func)
+        async def wrapper(request, id, *args, **kwargs):
+            atual = await aquery(VERSAO, [tabela, id])
+
+            if not atual or len(get_messages(request)):
+                return await view_func(request, id, *args, **kwargs)
+
+            usuario = await request.session.aget('usuario_logado')
+            etag = f'"{tabela}-{id}-{atual[0].Versao}-{usuario}"'
+            modificado = int(atual[0].Modificado)
+
+            response = get_conditional_response(request, etag=etag, last_modified=modificado)
+            if response is None:
+                response = await view_func(request, id, *args, **kwargs)
+            return _cabecalhos(response, etag, modificado)
+        return wrapper
+    return decorador
@@ -58,3 +58,30 @@ CREATE TABLE Emprestimos (
 
 ALTER TABLE Usuarios ADD COLUMN Senha VARCHAR(255) NOT NULL;
 
+-- Índices das colunas de ordenação das listagens paginadas
+CREATE INDEX idx_livros_titulo ON Livros (Titulo);
+CREATE INDEX idx_autores_nome ON Autores (Nome_autor);
+CREATE INDEX idx_editoras_nome ON Editoras (Nome_editora);
+CREATE INDEX idx_generos_nome ON Generos (Nome_genero);
+CREATE INDEX idx_usuarios_nome ON Usuarios (Nome_usuario);
+
+-- Consultas de unicidade dos triggers livros_validar_insert e usuarios_validar_insert
+CREATE INDEX idx_livros_isbn ON Livros (ISBN);
+CREATE INDEX idx_usuarios_email ON Usuarios (Email);
+
+-- Pendentes por data prevista: usado pela marcação incremental de atrasos
+CREATE INDEX idx_emprestimos_status_prevista ON Emprestimos (Status_emprestimo, Data_devolucao_prevista);
+
+-- Estado das tarefas agendadas (ex.: última execução de manage.py marcar_atrasados)
+CREATE TABLE Controle_tarefas (
+    Nome VARCHAR(100) PRIMARY KEY,
+    Valor VARCHAR(255),
+    Atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Geração de cada listagem com cache de HTML (biblioteca/fragmentos.py),
+-- incrementada pelas views de escrita
+CREATE TABLE Geracoes (
+    Listagem VARCHAR(50) PRIMARY KEY,
+    Geracao BIGINT NOT NULL DEFAULT 1
+);
@@ -1,8 +1,12 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Views de leitura assíncronas (biblioteca.db_async) quando PILHA_VIEWS = 'async'
+ASSINCRONA = settings.PILHA_VIEWS == 'async'
+
 urlpatterns = [
-    path('', views.editoras, name='editoras'),
+    path('', views.aeditoras if ASSINCRONA else views.editoras, name='editoras'),
     path('add/', views.editoras_add, name='editoras_add'),
     path('edit/<int:id>/', views.editoras_edit, name='editoras_edit'),
     path('delete/<int:id>/', views.editoras_delete, name='editoras_delete'),
@@ -1,7 +1,11 @@
 from django.shortcuts import render, redirect
-from django.db import connection, transaction
 from django.contrib import messages
 from django.db.utils import IntegrityError, DatabaseError
+from biblioteca.db import query, execute
+from biblioteca.referencias import invalidar
+from biblioteca import fragmentos
+from biblioteca.paginacao import paginar, apaginar
+from biblioteca.versoes import condicional
 
 
 def login_required(view_func):
@@ -12,17 +16,12 @@ def login_required(view_func):
     return wrapper
 
 
-def query(sql, params=None):
-    with connection.cursor() as cursor:
-        cursor.execute(sql, params or [])
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-
-def execute(sql, params=None):
-    with transaction.atomic():
-        with connection.cursor() as cursor:
-            cursor.execute(sql, params or [])
+def alogin_required(view_func):
+    async def wrapper(request, *args, **kwargs):
+        if not await request.session.aget('usuario_logado'):
+            return redirect('login')
+        return await view_func(request, *args, **kwargs)
+    return wrapper
 
 
 def get_mysql_message(exception):
@@ -37,8 +36,14 @@ def get_mysql_message(exception):
 
 @login_required
 def editoras(request):
-    dados = query("SELECT * FROM Editoras")
-    return render(request, 'editoras.html', {'dados': dados})
+    contexto = paginar(request, 'Editoras', 'ID_editora', {'nome': 'Nome_editora'})
+    return render(request, 'editoras.html', contexto)
+
+
+@alogin_required
+async def aeditoras(request):
+    contexto = await apaginar(request, 'Editoras', 'ID_editora', {'nome': 'Nome_editora'})
+    return render(request, 'editoras.html', contexto)
 
 
 @login_required
@@ -52,6 +57,8 @@ def editoras_add(request):
                 "INSERT INTO Editoras (Nome_editora, Endereco_editora) VALUES (%s, %s)",
                 [nome, end]
             )
+            invalidar('editoras')
+            fragmentos.invalidar('livros')
 
             messages.success(request, f"Editora '{nome}' cadastrada com sucesso!")
             return redirect('editoras')
@@ -78,6 +85,8 @@ def editoras_edit(request, id):
                 "UPDATE Editoras SET Nome_editora=%s, Endereco_editora=%s WHERE ID_editora=%s",
                 [nome, end, id]
             )
+            invalidar('editoras')
+            fragmentos.invalidar('livros')
 
             messages.success(request, f"Editora '{nome}' atualizada com sucesso!")
             return redirect('editoras')
@@ -106,12 +115,14 @@ def editoras_delete(request, id):
             messages.error(request, "Editora não encontrada")
             return redirect('editoras')
 
-        nome = editora[0]['Nome_editora']
+        nome = editora[0].Nome_editora
 
         execute(
             "DELETE FROM Editoras WHERE ID_editora=%s",
             [id]
         )
+        invalidar('editoras')
+        fragmentos.invalidar('livros')
 
         messages.success(request, f"Editora '{nome}' excluída com sucesso!")
 
@@ -128,6 +139,7 @@ def editoras_delete(request, id):
 
 
 @login_required
+@condicional('Editoras')
 def editora_detalhes(request, id):
     editora = query(
         "SELECT * FROM Editoras WHERE ID_editora=%s",
@@ -0,0 +1,115 @@
+"""
+Marcação incremental de empréstimos atrasados.
+
+Substitui o evento diário atualizar_emprestimos_atrasados, que fazia um
+UPDATE em todos os pendentes. Aqui cada execução percorre em lotes o
+trecho ('pendente', data prevista < hoje) do índice
+(Status_emprestimo, Data_devolucao_prevista): como tudo o que ficou para
+trás já foi marcado, ele só contém o que venceu desde a execução anterior
+e os empréstimos gravados com data prevista já vencida depois dela (um
+lote retroativo, por exemplo), que um corte pela data da execução
+anterior deixaria de fora para sempre. A data da execução anterior fica
+em Controle_tarefas, só para o relatório.
+
+Com AUDITORIA_MODO = 'aplicacao' o trigger emprestimos_audit_update não
+grava, então cada empréstimo marcado vira um evento na fila de auditoria.
+"""
+import time
+from datetime import date
+
+from auditoria import fila as auditoria
+from biblioteca.db import query, execute, marcadores_in
+
+
+TAREFA = 'emprestimos_atrasados'
+LOTE = 1000
+USUARIO = 'marcar_atrasados'
+
+
+def ler_marca():
+    marca = query("SELECT Valor FROM Controle_tarefas WHERE Nome = %s", [TAREFA])
+    return date.fromisoformat(marca[0].Valor) if marca else None
+
+
+def gravar_marca(dia):
+    execute("""
+        INSERT INTO Controle_tarefas (Nome, Valor) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE Valor = VALUES(Valor)
+    """, [TAREFA, dia.isoformat()])
+
+
+def auditar(ids):
+    for id in ids:
+        auditoria.registrar(
+            'Emprestimos', 'UPDATE', id,
+            dados_antigos="Status: pendente",
+            dados_novos="Status: atrasado",
+            campos_alterados="Status: pendente -> atrasado; ",
+            descricao=f"Empréstimo atualizado - ID: {id}",
+            usuario=USUARIO,
+        )
+
+
+def marcar_atrasados(lote=LOTE):
+    """
+    Marca como 'atrasado' os pendentes vencidos. Retorna as estatísticas
+    da execução.
+    """
+    inicio = time.perf_counter()
+    hoje = date.today()
+    marca = ler_marca()
+
+    total = 0
+    lotes = 0
+    ultimo = (date.min, 0)
+
+    while True:
+        ids = query("""
+            SELECT ID_emprestimo, Data_devolucao_prevista
+            FROM Emprestimos
+            WHERE Status_emprestimo = 'pendente'
+              AND Data_devolucao_prevista < %s
+              AND (Data_devolucao_prevista > %s
+                   OR (Data_devolucao_prevista = %s AND ID_emprestimo > %s))
+            ORDER BY Data_devolucao_prevista, ID_emprestimo
+            LIMIT %s
+        """, [hoje, ultimo[0], ultimo[0], ultimo[1], lote])
+
+        if not ids:
+            break
+
+        ultimo = (ids[-1].Data_devolucao_prevista, ids[-1].ID_emprestimo)
+        chaves = [r.ID_emprestimo for r in ids]
+
+        marcados = execute(f"""
+            UPDATE Emprestimos
+            SET Status_emprestimo = 'atrasado'
+            WHERE ID_emprestimo IN ({marcadores_in(chaves)})
+              AND Status_emprestimo = 'pendente'
+              AND Data_devolucao_real IS NULL
+        """, chaves)
+        total += marcados
+        lotes += 1
+
+        if auditoria.ativa() and marcados:
+            auditar(chaves if marcados == len(chaves) else [
+                r.ID_emprestimo for r in query(f"""
+                    SELECT ID_emprestimo FROM Emprestimos
+                    WHERE ID_emprestimo IN ({marcadores_in(chaves)})
+                      AND Status_emprestimo = 'atrasado'
+                """, chaves)
+            ])
+
+        if len(ids) < lote:
+            break
+
+    gravar_marca(hoje)
+    decorrido = time.perf_counter() - inicio
+
+    return {
+        'marcados': total,
+        'lotes': lotes,
+        'desde': marca,
+        'segundos': decorrido,
+        'por_segundo': total / decorrido if decorrido else 0,
+    }
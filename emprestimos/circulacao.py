@@ -0,0 +1,278 @@
+"""
+Empréstimo (avulso e em lote) e devolução em lote.
+
+Valida limite de empréstimos, multa e estoque para o conjunto inteiro de
+uma vez (com as linhas travadas via SELECT ... FOR UPDATE) e grava tudo
+com um único INSERT/UPDATE de várias linhas dentro da mesma transação.
+As regras espelham os triggers emprestimos_validar_insert,
+emprestimos_gerar_valores e emprestimos_calcular_multa, que continuam
+valendo como última barreira.
+
+Um deadlock ou tempo de espera de trava esgotado desfaz a transação
+inteira no MySQL; nesses casos ela é repetida até
+EMPRESTIMO_TENTATIVAS vezes, com uma espera curta e aleatória entre elas.
+"""
+import functools
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction, OperationalError
+
+from auditoria import fila as auditoria
+from biblioteca import metricas
+from biblioteca.db import query, execute, inserir, chamar, marcadores, marcadores_in
+
+
+LIMITE_ATIVOS = 5
+LOTE_MAXIMO = 50
+MULTA_BLOQUEIO = Decimal('50.00')
+MULTA_POR_DIA = Decimal('2.00')
+PRAZO_DIAS = 14
+
+# ER_LOCK_DEADLOCK e ER_LOCK_WAIT_TIMEOUT
+REPETIVEIS = (1213, 1205)
+
+
+def com_repeticao(funcao):
+    """
+    Roda `funcao` numa transação e a repete em deadlock. Dentro de uma
+    transação externa não repete: o MySQL já desfez tudo e quem decide é
+    quem abriu a transação.
+    """
+    @functools.wraps(funcao)
+    def wrapper(*args, **kwargs):
+        if connection.in_atomic_block:
+            return funcao(*args, **kwargs)
+
+        tentativa = 1
+        while True:
+            try:
+                with transaction.atomic():
+                    return funcao(*args, **kwargs)
+            except OperationalError as e:
+                if e.args[0] not in REPETIVEIS or tentativa >= settings.EMPRESTIMO_TENTATIVAS:
+                    raise
+                metricas.contar('biblioteca_emprestimo_repeticoes_total', operacao=funcao.__name__)
+                time.sleep(random.uniform(0, settings.EMPRESTIMO_ESPERA * tentativa))
+                tentativa += 1
+    return wrapper
+
+
+def _recusar(resultados, chave, valor, mensagem):
+    resultados.append({chave: valor, 'ok': False, 'mensagem': mensagem})
+
+
+def registrar_multa(usuario_id, emprestimo_id, dias_atraso, usuario=None):
+    """
+    Evento de auditoria da multa somada pelo trigger
+    emprestimos_calcular_multa (no modo 'aplicacao' o usuarios_audit_update
+    não grava)
+    """
+    multa = dias_atraso * MULTA_POR_DIA
+    auditoria.registrar(
+        'Usuarios', 'UPDATE', usuario_id,
+        campos_alterados=f"Multa: + R$ {multa}; ",
+        descricao=f"Multa de R$ {multa} pelo empréstimo {emprestimo_id} ({dias_atraso} dias de atraso)",
+        usuario=usuario,
+    )
+
+
+@com_repeticao
+def emprestar(usuario_id, livro_id, data_emp=None, data_prev=None):
+    """
+    Registra um empréstimo pelo procedimento emprestimos_registrar (baixa
+    condicional do estoque) e retorna o registro com id, datas e título.
+    """
+    return chamar('emprestimos_registrar', [usuario_id, livro_id, data_emp, data_prev])[0]
+
+
+@com_repeticao
+def emprestar_lote(usuario_id, livro_ids, data_emp=None, data_prev=None, usuario=None):
+    """
+    Registra um empréstimo para cada livro de `livro_ids` (um id repetido
+    conta como mais um exemplar). Retorna o resultado item a item.
+    `usuario` é o nome gravado na auditoria.
+    """
+    data_emp = data_emp or date.today()
+    data_prev = data_prev or data_emp + timedelta(days=PRAZO_DIAS)
+    resultados = []
+
+    if not livro_ids:
+        return resultados
+
+    usuario = query(
+        "SELECT Multa_atual FROM Usuarios WHERE ID_usuario = %s FOR UPDATE",
+        [usuario_id]
+    )
+
+    if not usuario:
+        for livro_id in livro_ids:
+            _recusar(resultados, 'livro', livro_id, "Usuário não encontrado")
+        return resultados
+
+    if (usuario[0].Multa_atual or 0) > MULTA_BLOQUEIO:
+        for livro_id in livro_ids:
+            _recusar(
+                resultados, 'livro', livro_id,
+                "Usuário possui multa acima de R$ 50.00. Não pode realizar novos empréstimos"
+            )
+        return resultados
+
+    ativos = query("""
+        SELECT COUNT(*) AS total
+        FROM Emprestimos
+        WHERE Usuario_id = %s AND Status_emprestimo = 'pendente'
+    """, [usuario_id])[0].total
+
+    distintos = sorted(set(livro_ids))
+    livros = {
+        l.ID_livro: l for l in query(f"""
+            SELECT ID_livro, Titulo, Quantidade_disponivel
+            FROM Livros
+            WHERE ID_livro IN ({marcadores_in(distintos)})
+            FOR UPDATE
+        """, distintos)
+    }
+    estoque = {id: l.Quantidade_disponivel or 0 for id, l in livros.items()}
+
+    aceitos = []
+    for livro_id in livro_ids:
+        livro = livros.get(livro_id)
+
+        if livro is None:
+            _recusar(resultados, 'livro', livro_id, "Livro não encontrado")
+        elif estoque[livro_id] <= 0:
+            _recusar(resultados, 'livro', livro_id, "Livro não disponível para empréstimo")
+        elif ativos + len(aceitos) >= LIMITE_ATIVOS:
+            _recusar(
+                resultados, 'livro', livro_id,
+                "Usuário já possui 5 empréstimos ativos (limite máximo)"
+            )
+        else:
+            estoque[livro_id] -= 1
+            resultado = {
+                'livro': livro_id,
+                'ok': True,
+                'titulo': livro.Titulo,
+                'data_emprestimo': data_emp,
+                'data_devolucao_prevista': data_prev,
+            }
+            aceitos.append(resultado)
+            resultados.append(resultado)
+
+    if aceitos:
+        params = []
+        for r in aceitos:
+            params += [usuario_id, r['livro'], data_emp, data_prev, 'pendente']
+
+        primeiro = inserir(f"""
+            INSERT INTO Emprestimos
+            (Usuario_id, Livro_id, Data_emprestimo, Data_devolucao_prevista, Status_emprestimo)
+            VALUES {marcadores(len(aceitos), 5)}
+        """, params)
+
+        # Com innodb_autoinc_lock_mode=2 os ids de um INSERT de várias linhas
+        # podem não ser consecutivos: as linhas do lote são relidas. O
+        # usuário está travado desde o início, e o snapshot da transação
+        # não enxerga linhas de outras sessões gravadas depois dele.
+        distintos = sorted({r['livro'] for r in aceitos})
+        novos = {}
+        for e in query(f"""
+            SELECT ID_emprestimo, Livro_id
+            FROM Emprestimos
+            WHERE Usuario_id = %s
+              AND ID_emprestimo >= %s
+              AND Data_emprestimo = %s
+              AND Status_emprestimo = 'pendente'
+              AND Livro_id IN ({marcadores_in(distintos)})
+            ORDER BY ID_emprestimo
+        """, [usuario_id, primeiro, data_emp] + distintos):
+            novos.setdefault(e.Livro_id, []).append(e.ID_emprestimo)
+
+        for r in aceitos:
+            r['emprestimo'] = novos[r['livro']].pop(0)
+            auditoria.registrar(
+                'Emprestimos', 'INSERT', r['emprestimo'],
+                dados_novos=f"Usuario_id: {usuario_id}, Livro_id: {r['livro']}, Status: pendente",
+                descricao=f"Novo empréstimo registrado - ID: {r['emprestimo']}",
+                usuario=usuario,
+            )
+
+    return resultados
+
+
+@com_repeticao
+def devolver_lote(emprestimo_ids, data_real=None, usuario=None, dono=None):
+    """
+    Marca como devolvidos os empréstimos de `emprestimo_ids` e informa a
+    multa aplicada a cada um. Retorna o resultado item a item.
+    `usuario` é o nome gravado na auditoria; com `dono`, empréstimos de
+    outro usuário são recusados como não encontrados.
+    """
+    data_real = data_real or date.today()
+    resultados = []
+
+    distintos = sorted(set(emprestimo_ids))
+    if not distintos:
+        return resultados
+
+    emprestimos = {
+        e.ID_emprestimo: e for e in query(f"""
+            SELECT e.ID_emprestimo, e.Usuario_id, e.Status_emprestimo, e.Data_devolucao_prevista, l.Titulo
+            FROM Emprestimos e
+            JOIN Livros l ON e.Livro_id = l.ID_livro
+            WHERE e.ID_emprestimo IN ({marcadores_in(distintos)})
+            FOR UPDATE
+        """, distintos)
+    }
+
+    aceitos = []
+    vistos = set()
+    for emprestimo_id in emprestimo_ids:
+        emp = emprestimos.get(emprestimo_id)
+
+        if emp is None or (dono is not None and emp.Usuario_id != dono):
+            _recusar(resultados, 'emprestimo', emprestimo_id, "Empréstimo não encontrado")
+        elif emp.Status_emprestimo == 'devolvido' or emprestimo_id in vistos:
+            _recusar(resultados, 'emprestimo', emprestimo_id, "Empréstimo já devolvido")
+        else:
+            vistos.add(emprestimo_id)
+            prevista = emp.Data_devolucao_prevista or data_real
+            atraso = max((data_real - prevista).days, 0)
+            resultados.append({
+                'emprestimo': emprestimo_id,
+                'ok': True,
+                'titulo': emp.Titulo,
+                'data_devolucao_real': data_real,
+                'dias_atraso': atraso,
+                'multa': atraso * MULTA_POR_DIA,
+            })
+            aceitos.append(emprestimo_id)
+
+    if aceitos:
+        execute(f"""
+            UPDATE Emprestimos
+            SET Status_emprestimo = 'devolvido',
+                Data_devolucao_real = %s
+            WHERE ID_emprestimo IN ({marcadores_in(aceitos)})
+        """, [data_real] + aceitos)
+
+        for r in resultados:
+            if r['ok']:
+                auditoria.registrar(
+                    'Emprestimos', 'UPDATE', r['emprestimo'],
+                    dados_novos="Status: devolvido",
+                    campos_alterados=f"Data_devolucao_real: NULL -> {data_real}; ",
+                    descricao=f"Empréstimo atualizado - ID: {r['emprestimo']}",
+                    usuario=usuario,
+                )
+                if r['dias_atraso']:
+                    registrar_multa(
+                        emprestimos[r['emprestimo']].Usuario_id, r['emprestimo'],
+                        r['dias_atraso'], usuario,
+                    )
+
+    return resultados
@@ -0,0 +1,160 @@
+import math
+import threading
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, DatabaseError, OperationalError
+
+from biblioteca import metricas
+from biblioteca.db import query, execute, marcadores_in
+from emprestimos.circulacao import LIMITE_ATIVOS, REPETIVEIS, emprestar, emprestar_lote
+
+
+ESGOTADO = 'Livro não disponível para empréstimo'
+
+
+def repeticoes():
+    return sum(n for (nome, _), n in metricas.contadores.items()
+               if nome == 'biblioteca_emprestimo_repeticoes_total')
+
+
+class Sessao(threading.Thread):
+    """Uma conexão própria emprestando o mesmo livro com seus usuários"""
+
+    def __init__(self, caminho, livro, usuarios):
+        super().__init__()
+        self.caminho = caminho
+        self.livro = livro
+        self.usuarios = usuarios
+        self.criados = []
+        self.esgotado = 0
+        self.deadlocks = 0
+        self.erros = []
+
+    def tentar(self, usuario):
+        """Retorna o id do empréstimo ou a mensagem da recusa"""
+        if self.caminho == 'lote':
+            resultado = emprestar_lote(usuario, [self.livro])[0]
+            return resultado.get('emprestimo') or resultado['mensagem']
+        try:
+            return emprestar(usuario, self.livro).ID_emprestimo
+        except OperationalError as e:
+            if e.args[0] in REPETIVEIS:
+                raise
+            return e.args[1]
+        except DatabaseError as e:
+            return e.args[1] if len(e.args) > 1 else str(e)
+
+    def run(self):
+        try:
+            for usuario in self.usuarios:
+                for _ in range(LIMITE_ATIVOS):
+                    try:
+                        resultado = self.tentar(usuario)
+                    except OperationalError:
+                        self.deadlocks += 1
+                        continue
+                    if isinstance(resultado, int):
+                        self.criados.append(resultado)
+                    elif resultado == ESGOTADO:
+                        self.esgotado += 1
+                        return
+                    else:
+                        self.erros.append(resultado)
+                        break
+        finally:
+            connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de disputa: várias sessões simultâneas emprestam o mesmo livro "
+        "até acabar o estoque e são medidos vazão, repetições por deadlock e "
+        "se algum exemplar foi emprestado a mais. Os empréstimos criados são "
+        "apagados, o estoque original é restaurado e o painel é recalculado "
+        "ao final (a auditoria gerada permanece)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--livro', type=int, required=True)
+        parser.add_argument('--exemplares', type=int, default=200, help="Estoque colocado no livro")
+        parser.add_argument('--sessoes', type=int, default=32)
+        parser.add_argument('--caminho', choices=['avulso', 'lote'], default='avulso')
+
+    def handle(self, *args, **options):
+        livro, exemplares, total_sessoes = options['livro'], options['exemplares'], options['sessoes']
+
+        original = query("SELECT Quantidade_disponivel FROM Livros WHERE ID_livro = %s", [livro])
+        if not original:
+            raise CommandError(f"Livro {livro} não encontrado")
+        original = original[0].Quantidade_disponivel
+
+        # Usuários suficientes para esgotar o estoque mesmo com o limite de
+        # empréstimos ativos de cada um
+        por_sessao = math.ceil(exemplares / total_sessoes / LIMITE_ATIVOS) + 1
+        usuarios = [r.ID_usuario for r in query("""
+            SELECT u.ID_usuario
+            FROM Usuarios u
+            WHERE COALESCE(u.Multa_atual, 0) <= 50
+              AND NOT EXISTS (
+                  SELECT 1 FROM Emprestimos e
+                  WHERE e.Usuario_id = u.ID_usuario AND e.Status_emprestimo = 'pendente'
+              )
+            LIMIT %s
+        """, [por_sessao * total_sessoes])]
+        if len(usuarios) < por_sessao * total_sessoes:
+            raise CommandError(
+                f"São necessários {por_sessao * total_sessoes} usuários sem empréstimos "
+                f"ativos; rode manage.py gerar_dados ou diminua --sessoes"
+            )
+
+        sessoes = [
+            Sessao(options['caminho'], livro, usuarios[i::total_sessoes])
+            for i in range(total_sessoes)
+        ]
+
+        execute("UPDATE Livros SET Quantidade_disponivel = %s WHERE ID_livro = %s", [exemplares, livro])
+        repetidas = repeticoes()
+        inicio = time.perf_counter()
+        try:
+            for s in sessoes:
+                s.start()
+            for s in sessoes:
+                s.join()
+            decorrido = time.perf_counter() - inicio
+            repetidas = repeticoes() - repetidas
+
+            criados = [i for s in sessoes for i in s.criados]
+            restante = query(
+                "SELECT Quantidade_disponivel FROM Livros WHERE ID_livro = %s", [livro]
+            )[0].Quantidade_disponivel
+        finally:
+            todos = [i for s in sessoes for i in s.criados]
+            if todos:
+                execute(f"DELETE FROM Emprestimos WHERE ID_emprestimo IN ({marcadores_in(todos)})", todos)
+            execute("UPDATE Livros SET Quantidade_disponivel = %s WHERE ID_livro = %s", [original, livro])
+            # Tira do painel os empréstimos criados e apagados pelo teste
+            call_command('reconstruir_painel', stdout=self.stdout)
+
+        a_mais = max(len(criados) - exemplares, 0)
+        erros = [e for s in sessoes for e in s.erros]
+
+        self.stdout.write(
+            f"{options['caminho']}: {total_sessoes} sessões, {len(criados)} empréstimos em {decorrido:.2f} s "
+            f"({len(criados) / decorrido:.1f}/s)"
+        )
+        self.stdout.write(
+            f"  repetições por deadlock: {repetidas}, deadlocks que esgotaram as tentativas: "
+            f"{sum(s.deadlocks for s in sessoes)}, recusas por estoque: {sum(s.esgotado for s in sessoes)}"
+        )
+        if erros:
+            self.stdout.write(f"  outras recusas: {len(erros)} (ex.: {erros[0]})")
+
+        if a_mais or restante < 0 or exemplares - len(criados) != restante:
+            self.stdout.write(self.style.ERROR(
+                f"  Inconsistente: {a_mais} exemplares a mais, estoque final {restante}, "
+                f"esperado {exemplares - len(criados)}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"  Nenhum exemplar emprestado a mais: estoque final {restante}"))
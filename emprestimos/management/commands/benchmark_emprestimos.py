@@ -0,0 +1,87 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from biblioteca.db import query, execute, chamar
+
+
+class ContadorConsultas:
+    """execute_wrapper que conta as idas ao banco"""
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+def fluxo_antigo(usuario, livro):
+    """Sequência de comandos que as views faziam antes dos procedimentos"""
+    execute("""
+        INSERT INTO Emprestimos
+        (Usuario_id, Livro_id, Data_emprestimo, Data_devolucao_prevista, Status_emprestimo)
+        VALUES (%s, %s, %s, %s, %s)
+    """, [usuario, livro, None, None, 'pendente'])
+    query("SELECT Titulo FROM Livros WHERE ID_livro = %s", [livro])
+    emp = query("""
+        SELECT ID_emprestimo, Data_emprestimo, Data_devolucao_prevista
+        FROM Emprestimos
+        WHERE Usuario_id = %s AND Livro_id = %s
+        ORDER BY ID_emprestimo DESC
+        LIMIT 1
+    """, [usuario, livro])[0]
+
+    query("SELECT Status_emprestimo FROM Emprestimos WHERE ID_emprestimo = %s", [emp.ID_emprestimo])
+    execute("""
+        UPDATE Emprestimos
+        SET Usuario_id = %s, Livro_id = %s, Data_emprestimo = %s,
+            Data_devolucao_prevista = %s, Data_devolucao_real = %s, Status_emprestimo = %s
+        WHERE ID_emprestimo = %s
+    """, [usuario, livro, emp.Data_emprestimo, emp.Data_devolucao_prevista, None, 'devolvido', emp.ID_emprestimo])
+    query("""
+        SELECT DATEDIFF(COALESCE(Data_devolucao_real, CURDATE()), Data_devolucao_prevista) AS atraso
+        FROM Emprestimos WHERE ID_emprestimo = %s
+    """, [emp.ID_emprestimo])
+
+
+def fluxo_novo(usuario, livro):
+    """Mesma operação usando os procedimentos de uma ida ao banco"""
+    emp = chamar('emprestimos_registrar', [usuario, livro, None, None])[0]
+    chamar('emprestimos_atualizar', [
+        emp.ID_emprestimo, usuario, livro, emp.Data_emprestimo,
+        emp.Data_devolucao_prevista, None, 'devolvido',
+    ])
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara idas ao banco e latência de empréstimo + devolução antes e depois "
+        "dos procedimentos. Tudo é desfeito ao final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', type=int, required=True)
+        parser.add_argument('--livro', type=int, required=True)
+        parser.add_argument('--iteracoes', type=int, default=200)
+
+    def medir(self, fluxo, usuario, livro, iteracoes):
+        contador = ContadorConsultas()
+        with transaction.atomic():
+            with connection.execute_wrapper(contador):
+                inicio = time.perf_counter()
+                for _ in range(iteracoes):
+                    fluxo(usuario, livro)
+                decorrido = time.perf_counter() - inicio
+            transaction.set_rollback(True)
+        return contador.total / iteracoes, decorrido / iteracoes * 1000
+
+    def handle(self, *args, **options):
+        usuario, livro, iteracoes = options['usuario'], options['livro'], options['iteracoes']
+
+        for nome, fluxo in [('antes', fluxo_antigo), ('depois', fluxo_novo)]:
+            idas, ms = self.medir(fluxo, usuario, livro, iteracoes)
+            self.stdout.write(
+                f"{nome:>6}: {idas:.1f} idas ao banco, {ms:.2f} ms por empréstimo + devolução"
+            )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from emprestimos.atrasos import LOTE, marcar_atrasados
+
+
+class Command(BaseCommand):
+    help = (
+        "Marca como atrasados os empréstimos pendentes já vencidos. "
+        "Pode ser agendado com frequência (ex.: a cada 15 minutos)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=LOTE)
+
+    def handle(self, *args, **options):
+        r = marcar_atrasados(options['lote'])
+
+        anterior = r['desde'] or 'nenhuma'
+        self.stdout.write(self.style.SUCCESS(
+            f"{r['marcados']} empréstimos marcados como atrasados "
+            f"em {r['lotes']} lotes ({r['segundos']:.2f}s, {r['por_segundo']:.0f}/s; "
+            f"execução anterior: {anterior})"
+        ))
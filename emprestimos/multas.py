@@ -0,0 +1,113 @@
+"""
+Projeção de multas dos empréstimos em aberto.
+
+O trigger emprestimos_calcular_multa só lança a multa (R$ 2,00 por dia)
+quando o livro é devolvido. Aqui os empréstimos em aberto são carregados
+de uma vez em arrays NumPy e a multa que cada usuário teria se devolvesse
+tudo numa data é calculada de forma vetorizada, em centavos.
+"""
+from datetime import date
+
+import numpy as np
+from django.db import connection
+
+from .circulacao import MULTA_BLOQUEIO, MULTA_POR_DIA
+
+
+CENTAVOS_POR_DIA = int(MULTA_POR_DIA * 100)
+BLOQUEIO_CENTAVOS = int(MULTA_BLOQUEIO * 100)
+
+
+def carregar_em_aberto():
+    """(usuarios, previstas) dos empréstimos ainda não devolvidos e com usuário"""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT Usuario_id, Data_devolucao_prevista
+            FROM Emprestimos
+            WHERE Status_emprestimo != 'devolvido'
+              AND Data_devolucao_prevista IS NOT NULL
+              AND Usuario_id IS NOT NULL
+        """)
+        linhas = cursor.fetchall()
+
+    usuarios = np.fromiter((l[0] for l in linhas), dtype=np.int64, count=len(linhas))
+    previstas = np.array([l[1] for l in linhas], dtype='datetime64[D]')
+    return usuarios, previstas
+
+
+def carregar_multas_atuais():
+    """(ids, nomes, multas em centavos) de todos os usuários"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT ID_usuario, Nome_usuario, COALESCE(Multa_atual, 0) FROM Usuarios")
+        linhas = cursor.fetchall()
+
+    ids = np.fromiter((l[0] for l in linhas), dtype=np.int64, count=len(linhas))
+    nomes = [l[1] for l in linhas]
+    multas = np.fromiter((int(l[2] * 100) for l in linhas), dtype=np.int64, count=len(linhas))
+    return ids, nomes, multas
+
+
+def multa_por_usuario(usuarios, previstas, data_ref):
+    """
+    Soma por usuário da multa (centavos) e dos empréstimos atrasados se tudo
+    fosse devolvido em `data_ref`. Retorna (ids, centavos, atrasados).
+    """
+    dias = (np.datetime64(data_ref, 'D') - previstas).astype(np.int64)
+    dias = np.clip(dias, 0, None)
+
+    ids, indice = np.unique(usuarios, return_inverse=True)
+    centavos = np.bincount(indice, weights=dias * CENTAVOS_POR_DIA, minlength=len(ids))
+    atrasados = np.bincount(indice, weights=dias > 0, minlength=len(ids))
+    return ids, centavos.astype(np.int64), atrasados.astype(np.int64)
+
+
+def relatorio(data_ref=None, hoje=None):
+    """
+    Multa acumulada, multa corrente (se devolvesse hoje) e projetada (se
+    devolvesse em `data_ref`) por usuário com empréstimos em aberto,
+    ordenado pela projeção. Marca quem passaria do limite de bloqueio.
+    """
+    hoje = hoje or date.today()
+    data_ref = data_ref or hoje
+
+    usuarios, previstas = carregar_em_aberto()
+    ids_todos, nomes, acumuladas = carregar_multas_atuais()
+
+    ids, correntes, atrasados = multa_por_usuario(usuarios, previstas, hoje)
+    _, projetadas, atrasados_proj = multa_por_usuario(usuarios, previstas, data_ref)
+
+    # Multa já acumulada de cada usuário com empréstimo em aberto
+    ordem = np.argsort(ids_todos)
+    posicao = ordem[np.searchsorted(ids_todos, ids, sorter=ordem)]
+    acumulada = acumuladas[posicao]
+
+    total_atual = acumulada + correntes
+    total_projetado = acumulada + projetadas
+    bloqueados = acumulada > BLOQUEIO_CENTAVOS
+    cruzam = ~bloqueados & (total_projetado > BLOQUEIO_CENTAVOS)
+
+    linhas = []
+    for i in np.argsort(-total_projetado, kind='stable'):
+        linhas.append({
+            'usuario': int(ids[i]),
+            'nome': nomes[posicao[i]],
+            'multa_acumulada': acumulada[i] / 100,
+            'multa_corrente': correntes[i] / 100,
+            'multa_projetada': projetadas[i] / 100,
+            'total_atual': total_atual[i] / 100,
+            'total_projetado': total_projetado[i] / 100,
+            'atrasados': int(atrasados[i]),
+            'atrasados_projetados': int(atrasados_proj[i]),
+            'bloqueado': bool(bloqueados[i]),
+            'cruza_bloqueio': bool(cruzam[i]),
+        })
+
+    return {
+        'data_ref': data_ref,
+        'emprestimos': len(usuarios),
+        'usuarios': len(ids),
+        'total_corrente': int(correntes.sum()) / 100,
+        'total_projetado': int(projetadas.sum()) / 100,
+        'cruzam_bloqueio': int(cruzam.sum()),
+        'linhas': linhas,
+    }
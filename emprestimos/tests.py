@@ -1,3 +1,78 @@
-from django.test import TestCase
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase
+
+from emprestimos import multas
+from emprestimos.multas import carregar_em_aberto, multa_por_usuario, relatorio
+
+
+def previstas(*dias):
+    return np.array(dias, dtype='datetime64[D]')
+
+
+class MultasTests(SimpleTestCase):
+    def test_multa_por_usuario(self):
+        usuarios = np.array([7, 3, 7, 3, 9], dtype=np.int64)
+        datas = previstas('2024-03-01', '2024-03-09', '2024-03-12', '2024-02-28', '2024-03-10')
+
+        ids, centavos, atrasados = multa_por_usuario(usuarios, datas, date(2024, 3, 10))
+
+        # 3: 1 dia + 11 dias (fevereiro de 2024 tem 29); 7: 9 dias e um no prazo; 9: vence no dia
+        self.assertEqual(ids.tolist(), [3, 7, 9])
+        self.assertEqual(centavos.tolist(), [2400, 1800, 0])
+        self.assertEqual(atrasados.tolist(), [2, 1, 0])
+        self.assertEqual(centavos.dtype, np.int64)
+
+    def test_multa_por_usuario_sem_emprestimos(self):
+        vazio = np.array([], dtype=np.int64)
+        ids, centavos, atrasados = multa_por_usuario(vazio, previstas(), date(2024, 3, 10))
+
+        self.assertEqual(ids.tolist(), [])
+        self.assertEqual(centavos.tolist(), [])
+        self.assertEqual(atrasados.tolist(), [])
+
+    def test_carregar_em_aberto_ignora_emprestimos_sem_usuario(self):
+        with mock.patch.object(multas, 'connection') as connection:
+            cursor = connection.cursor.return_value.__enter__.return_value
+            cursor.fetchall.return_value = [(7, date(2024, 3, 1)), (3, date(2024, 3, 9))]
+            usuarios, datas = carregar_em_aberto()
+
+        sql = cursor.execute.call_args.args[0]
+        self.assertIn("Usuario_id IS NOT NULL", sql)
+        self.assertIn("Data_devolucao_prevista IS NOT NULL", sql)
+        self.assertEqual(usuarios.tolist(), [7, 3])
+        self.assertEqual(datas.tolist(), [date(2024, 3, 1), date(2024, 3, 9)])
+
+    def test_relatorio(self):
+        em_aberto = (np.array([7, 3], dtype=np.int64), previstas('2024-03-01', '2024-03-09'))
+        atuais = (np.array([3, 5, 7], dtype=np.int64), ['Ana', 'Bia', 'Caio'], np.array([4900, 0, 6000]))
+
+        with mock.patch.object(multas, 'carregar_em_aberto', return_value=em_aberto), \
+                mock.patch.object(multas, 'carregar_multas_atuais', return_value=atuais):
+            dados = relatorio(date(2024, 3, 11), hoje=date(2024, 3, 10))
+
+        self.assertEqual(dados['emprestimos'], 2)
+        self.assertEqual(dados['total_corrente'], 20.00)
+        self.assertEqual(dados['total_projetado'], 24.00)
+
+        caio, ana = dados['linhas']
+        self.assertEqual((caio['nome'], caio['multa_projetada'], caio['total_projetado']), ('Caio', 20.0, 80.0))
+        self.assertTrue(caio['bloqueado'])
+        self.assertFalse(caio['cruza_bloqueio'])
+        # Ana tem R$ 49,00 e passa do bloqueio com 2 dias de atraso
+        self.assertEqual((ana['nome'], ana['multa_corrente'], ana['total_projetado']), ('Ana', 2.0, 53.0))
+        self.assertTrue(ana['cruza_bloqueio'])
+        self.assertEqual(dados['cruzam_bloqueio'], 1)
+
+    def test_relatorio_vazio(self):
+        vazio = (np.array([], dtype=np.int64), previstas())
+        atuais = (np.array([3], dtype=np.int64), ['Ana'], np.array([0]))
+
+        with mock.patch.object(multas, 'carregar_em_aberto', return_value=vazio), \
+                mock.patch.object(multas, 'carregar_multas_atuais', return_value=atuais):
+            dados = relatorio(date(2024, 3, 10))
+
+        self.assertEqual(dados['linhas'], [])
+        self.assertEqual((dados['usuarios'], dados['total_projetado']), (0, 0))
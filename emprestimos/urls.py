@@ -1,9 +1,16 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Views de leitura assíncronas (biblioteca.db_async) quando PILHA_VIEWS = 'async'
+ASSINCRONA = settings.PILHA_VIEWS == 'async'
+
 urlpatterns = [
-    path('', views.emprestimos, name='emprestimos'),
+    path('', views.aemprestimos if ASSINCRONA else views.emprestimos, name='emprestimos'),
     path('add/', views.emprestimos_add, name='emprestimos_add'),
+    path('lote/', views.emprestimos_lote, name='emprestimos_lote'),
+    path('lote/devolver/', views.emprestimos_devolver_lote, name='emprestimos_devolver_lote'),
+    path('multas/', views.emprestimos_multas, name='emprestimos_multas'),
     path('edit/<int:id>/', views.emprestimos_edit, name='emprestimos_edit'),
     path('delete/<int:id>/', views.emprestimos_delete, name='emprestimos_delete'),
     path('view/<int:id>/', views.emprestimo_detalhes, name='emprestimos_detalhes'),
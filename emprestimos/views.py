@@ -1,7 +1,19 @@
+import json
+from datetime import date
+
+from django.conf import settings
 from django.shortcuts import render, redirect
-from django.db import connection, transaction
 from django.contrib import messages
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
 from django.db.utils import IntegrityError, DatabaseError
+from biblioteca.db import query, execute, chamar
+from biblioteca.db_async import aquery
+from biblioteca import fragmentos
+from biblioteca.versoes import condicional
+from auditoria import fila as auditoria
+from livros.busca import LIMITE, buscar
+from .circulacao import LOTE_MAXIMO, emprestar, emprestar_lote, devolver_lote, registrar_multa
 
 
 def login_required(view_func):
@@ -12,17 +24,12 @@ def login_required(view_func):
     return wrapper
 
 
-def query(sql, params=None):
-    with connection.cursor() as cursor:
-        cursor.execute(sql, params or [])
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-
-def execute(sql, params=None):
-    with transaction.atomic():
-        with connection.cursor() as cursor:
-            cursor.execute(sql, params or [])
+def alogin_required(view_func):
+    async def wrapper(request, *args, **kwargs):
+        if not await request.session.aget('usuario_logado'):
+            return redirect('login')
+        return await view_func(request, *args, **kwargs)
+    return wrapper
 
 
 def get_mysql_message(exception):
@@ -35,26 +42,50 @@ def get_mysql_message(exception):
         return str(exception)
 
 
+LISTAGEM = """
+    SELECT Emprestimos.ID_emprestimo,
+           Usuarios.Nome_usuario,
+           Livros.Titulo,
+           Emprestimos.Data_emprestimo,
+           Emprestimos.Data_devolucao_prevista,
+           Emprestimos.Data_devolucao_real,
+           CASE
+               WHEN Emprestimos.Status_emprestimo = 'pendente'
+                    AND Emprestimos.Data_devolucao_prevista < CURDATE()
+                    AND Emprestimos.Data_devolucao_real IS NULL
+               THEN 'atrasado'
+               ELSE Emprestimos.Status_emprestimo
+           END AS Status_emprestimo
+    FROM Emprestimos
+    JOIN Usuarios ON Emprestimos.Usuario_id = Usuarios.ID_usuario
+    JOIN Livros ON Emprestimos.Livro_id = Livros.ID_livro
+    WHERE Usuarios.ID_usuario = %s
+    ORDER BY Emprestimos.ID_emprestimo DESC
+"""
+
+
 @login_required
 def emprestimos(request):
     usuario_id = request.session.get('usuario_logado')
+    contexto = fragmentos.obter(
+        'emprestimos', request, lambda: {'dados': query(LISTAGEM, [usuario_id])},
+        'emprestimos_tabela.html', extra=f"{usuario_id}|{date.today()}",
+    )
+    return render(request, 'emprestimos.html', contexto)
 
-    dados = query("""
-        SELECT Emprestimos.ID_emprestimo,
-               Usuarios.Nome_usuario,
-               Livros.Titulo,
-               Emprestimos.Data_emprestimo,
-               Emprestimos.Data_devolucao_prevista,
-               Emprestimos.Data_devolucao_real,
-               Emprestimos.Status_emprestimo
-        FROM Emprestimos
-        JOIN Usuarios ON Emprestimos.Usuario_id = Usuarios.ID_usuario
-        JOIN Livros ON Emprestimos.Livro_id = Livros.ID_livro
-        WHERE Usuarios.ID_usuario = %s
-        ORDER BY Emprestimos.ID_emprestimo DESC
-    """, [usuario_id])
 
-    return render(request, 'emprestimos.html', {'dados': dados})
+@alogin_required
+async def aemprestimos(request):
+    usuario_id = await request.session.aget('usuario_logado')
+
+    async def consultar():
+        return {'dados': await aquery(LISTAGEM, [usuario_id])}
+
+    contexto = await fragmentos.aobter(
+        'emprestimos', request, consultar,
+        'emprestimos_tabela.html', extra=f"{usuario_id}|{date.today()}",
+    )
+    return render(request, 'emprestimos.html', contexto)
 
 
 @login_required
@@ -65,25 +96,22 @@ def emprestimos_add(request):
         livro = request.POST.get('livro')
         data_emp = request.POST.get('data_emp') or None
         data_prev = request.POST.get('data_prev') or None
-        status = 'pendente'
 
         try:
-            execute("""
-                INSERT INTO Emprestimos
-                (Usuario_id, Livro_id, Data_emprestimo, Data_devolucao_prevista, Status_emprestimo)
-                VALUES (%s, %s, %s, %s, %s)
-            """, [usuario_id, livro, data_emp, data_prev, status])
-
-            livro_info = query(
-                "SELECT Titulo FROM Livros WHERE ID_livro = %s",
-                [livro]
+            emp_criado = emprestar(usuario_id, livro, data_emp, data_prev)
+
+            auditoria.registrar(
+                'Emprestimos', 'INSERT', emp_criado.ID_emprestimo,
+                dados_novos=f"Usuario_id: {usuario_id}, Livro_id: {livro}, Status: pendente",
+                descricao=f"Novo empréstimo registrado - ID: {emp_criado.ID_emprestimo}",
+                usuario=request.session.get('nome_usuario'),
             )
 
-            titulo_livro = livro_info[0]['Titulo'] if livro_info else "Livro"
+            fragmentos.invalidar('emprestimos', 'livros')
 
             messages.success(
                 request,
-                f"Empréstimo do livro '{titulo_livro}' registrado com sucesso!"
+                f"Empréstimo do livro '{emp_criado.Titulo}' registrado com sucesso!"
             )
 
             messages.info(
@@ -91,26 +119,17 @@ def emprestimos_add(request):
                 "O estoque do livro foi atualizado automaticamente"
             )
 
-            emp_criado = query("""
-                SELECT Data_emprestimo, Data_devolucao_prevista
-                FROM Emprestimos
-                WHERE Usuario_id = %s AND Livro_id = %s
-                ORDER BY ID_emprestimo DESC
-                LIMIT 1
-            """, [usuario_id, livro])
-
-            if emp_criado:
-                if not data_emp:
-                    messages.info(
-                        request,
-                        f"Data de empréstimo definida automaticamente: {emp_criado[0]['Data_emprestimo']}"
-                    )
+            if not data_emp:
+                messages.info(
+                    request,
+                    f"Data de empréstimo definida automaticamente: {emp_criado.Data_emprestimo}"
+                )
 
-                if not data_prev:
-                    messages.info(
-                        request,
-                        f"Data de devolução prevista definida automaticamente: {emp_criado[0]['Data_devolucao_prevista']} (14 dias)"
-                    )
+            if not data_prev:
+                messages.info(
+                    request,
+                    f"Data de devolução prevista definida automaticamente: {emp_criado.Data_devolucao_prevista} (14 dias)"
+                )
 
             return redirect('emprestimos')
 
@@ -125,6 +144,139 @@ def emprestimos_add(request):
     return render(request, 'emprestimo_add.html', {'livros': livros})
 
 
+def dados_lote(request, campo):
+    """
+    Lê a lista de ids e a data opcional de um pedido em lote, vindo de um
+    formulário (campo repetido) ou de um corpo JSON ({"livros": [...]})
+    """
+    if request.content_type == 'application/json':
+        corpo = json.loads(request.body or b'{}')
+        ids = corpo.get(campo, [])
+        data = corpo.get('data')
+    else:
+        ids = request.POST.getlist(campo)
+        data = request.POST.get('data')
+
+    ids = [int(i) for i in ids]
+    data = date.fromisoformat(data) if data else None
+    return ids, data
+
+
+def responder_lote(request, resultados):
+    """Devolve o resultado por item em JSON ou como mensagens na listagem"""
+    if request.content_type == 'application/json':
+        return JsonResponse({'resultados': resultados})
+
+    for r in resultados:
+        if r['ok']:
+            texto = f"'{r['titulo']}': ok"
+            if r.get('multa'):
+                texto += f" (multa de R$ {r['multa']:.2f}, {r['dias_atraso']} dias de atraso)"
+            messages.success(request, texto)
+        else:
+            item = r.get('livro', r.get('emprestimo'))
+            messages.error(request, f"#{item}: {r['mensagem']}")
+
+    return redirect('emprestimos')
+
+
+def erro_lote(request, mensagem):
+    if request.content_type == 'application/json':
+        return JsonResponse({'erro': mensagem}, status=400)
+    messages.error(request, mensagem)
+    return redirect('emprestimos_lote')
+
+
+@login_required
+def emprestimos_lote(request):
+    usuario_id = request.session.get('usuario_logado')
+
+    if request.method == 'POST':
+        try:
+            livros, data_emp = dados_lote(request, 'livros')
+            if len(livros) > LOTE_MAXIMO:
+                return erro_lote(request, f"No máximo {LOTE_MAXIMO} livros por lote")
+            resultados = emprestar_lote(
+                usuario_id, livros, data_emp, usuario=request.session.get('nome_usuario')
+            )
+            fragmentos.invalidar('emprestimos', 'livros')
+        except (TypeError, ValueError):
+            return erro_lote(request, "Dados do lote inválidos")
+        except Exception as e:
+            return erro_lote(request, get_mysql_message(e))
+
+        return responder_lote(request, resultados)
+
+    # Só os livros da busca (ou os primeiros em ordem de título), nunca o acervo inteiro
+    q = request.GET.get('q', '').strip()
+    if q:
+        livros = [l for l in buscar(q) if (l.Quantidade_disponivel or 0) > 0]
+    else:
+        livros = query("""
+            SELECT ID_livro, Titulo, Quantidade_disponivel
+            FROM Livros
+            WHERE Quantidade_disponivel > 0
+            ORDER BY Titulo
+            LIMIT %s
+        """, [LIMITE])
+
+    abertos = query("""
+        SELECT Emprestimos.ID_emprestimo, Livros.Titulo, Emprestimos.Data_devolucao_prevista
+        FROM Emprestimos
+        JOIN Livros ON Emprestimos.Livro_id = Livros.ID_livro
+        WHERE Emprestimos.Usuario_id = %s
+          AND Emprestimos.Status_emprestimo != 'devolvido'
+        ORDER BY Emprestimos.ID_emprestimo
+    """, [usuario_id])
+
+    return render(request, 'emprestimos_lote.html', {'livros': livros, 'abertos': abertos, 'q': q})
+
+
+@login_required
+@require_POST
+def emprestimos_devolver_lote(request):
+    try:
+        ids, data_real = dados_lote(request, 'emprestimos')
+        if len(ids) > LOTE_MAXIMO:
+            return erro_lote(request, f"No máximo {LOTE_MAXIMO} empréstimos por lote")
+        # Só devolve empréstimos do usuário logado
+        resultados = devolver_lote(
+            ids, data_real,
+            usuario=request.session.get('nome_usuario'),
+            dono=request.session.get('usuario_logado'),
+        )
+        fragmentos.invalidar('emprestimos', 'livros')
+    except (TypeError, ValueError):
+        return erro_lote(request, "Dados do lote inválidos")
+    except Exception as e:
+        return erro_lote(request, get_mysql_message(e))
+
+    return responder_lote(request, resultados)
+
+
+@login_required
+def emprestimos_multas(request):
+    """Multas correntes e projetadas por usuário (HTML ou ?formato=json)"""
+    # numpy só é carregado quando o relatório é pedido, não na subida do worker
+    from .multas import relatorio
+
+    try:
+        data_ref = date.fromisoformat(request.GET['data']) if request.GET.get('data') else None
+        # Como nas listagens paginadas: ao menos 1 e no máximo PAGINACAO_TAMANHO_MAXIMO
+        limite = min(max(int(request.GET.get('limite', 200)), 1), settings.PAGINACAO_TAMANHO_MAXIMO)
+    except ValueError:
+        messages.error(request, "Parâmetros inválidos")
+        return redirect('emprestimos_multas')
+
+    dados = relatorio(data_ref)
+    dados['linhas'] = dados['linhas'][:limite]
+
+    if request.GET.get('formato') == 'json':
+        return JsonResponse(dados)
+
+    return render(request, 'emprestimos_multas.html', dados)
+
+
 @login_required
 def emprestimos_edit(request, id):
     if request.method == 'POST':
@@ -136,40 +288,35 @@ def emprestimos_edit(request, id):
         novo_status = request.POST.get('status')
 
         try:
-            emprestimo_atual = query(
-                "SELECT Status_emprestimo FROM Emprestimos WHERE ID_emprestimo = %s",
-                [id]
+            emp_info = chamar(
+                'emprestimos_atualizar',
+                [id, usuario, novo_livro, data_emp, data_prev, data_real, novo_status]
             )
 
-            status_antigo = emprestimo_atual[0]['Status_emprestimo'] if emprestimo_atual else None
+            if emp_info:
+                antigo, novo = emp_info[0].Status_antigo, emp_info[0].Status_emprestimo
+                auditoria.registrar(
+                    'Emprestimos', 'UPDATE', id,
+                    dados_antigos=f"Status: {antigo}",
+                    dados_novos=f"Status: {novo}",
+                    campos_alterados=f"Status: {antigo} -> {novo}; " if antigo != novo else '',
+                    descricao=f"Empréstimo atualizado - ID: {id}",
+                    usuario=request.session.get('nome_usuario'),
+                )
+                if antigo != 'devolvido' and novo == 'devolvido' and (emp_info[0].atraso or 0) > 0:
+                    registrar_multa(
+                        usuario, id, emp_info[0].atraso, request.session.get('nome_usuario')
+                    )
 
-            execute("""
-                UPDATE Emprestimos
-                SET Usuario_id = %s,
-                    Livro_id = %s,
-                    Data_emprestimo = %s,
-                    Data_devolucao_prevista = %s,
-                    Data_devolucao_real = %s,
-                    Status_emprestimo = %s
-                WHERE ID_emprestimo = %s
-            """, [usuario, novo_livro, data_emp, data_prev, data_real, novo_status, id])
+            fragmentos.invalidar('emprestimos', 'livros')
 
             messages.success(request, "Empréstimo atualizado com sucesso!")
 
-            if status_antigo != 'devolvido' and novo_status.lower() == 'devolvido':
+            if emp_info and emp_info[0].Status_antigo != 'devolvido' and novo_status.lower() == 'devolvido':
                 messages.info(request, "O estoque do livro foi incrementado automaticamente")
 
-                emp_info = query("""
-                    SELECT DATEDIFF(
-                        COALESCE(Data_devolucao_real, CURDATE()),
-                        Data_devolucao_prevista
-                    ) AS atraso
-                    FROM Emprestimos
-                    WHERE ID_emprestimo = %s
-                """, [id])
-
-                if emp_info and emp_info[0]['atraso'] > 0:
-                    dias_atraso = emp_info[0]['atraso']
+                if (emp_info[0].atraso or 0) > 0:
+                    dias_atraso = emp_info[0].atraso
                     multa = dias_atraso * 2.00
 
                     messages.warning(
@@ -218,14 +365,16 @@ def emprestimos_delete(request, id):
             messages.error(request, "Empréstimo não encontrado")
             return redirect('emprestimos')
 
-        status = emp_info[0]['Status_emprestimo']
-        titulo = emp_info[0]['Titulo']
+        status = emp_info[0].Status_emprestimo
+        titulo = emp_info[0].Titulo
 
         execute(
             "DELETE FROM Emprestimos WHERE ID_emprestimo = %s",
             [id]
         )
 
+        fragmentos.invalidar('emprestimos', 'livros')
+
         messages.success(request, "Empréstimo excluído com sucesso!")
 
         if status.lower() != 'devolvido':
@@ -244,6 +393,7 @@ def emprestimos_delete(request, id):
 
 
 @login_required
+@condicional('Emprestimos')
 def emprestimo_detalhes(request, id):
     emprestimo = query("""
         SELECT Emprestimos.*,
@@ -1,8 +1,12 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Views de leitura assíncronas (biblioteca.db_async) quando PILHA_VIEWS = 'async'
+ASSINCRONA = settings.PILHA_VIEWS == 'async'
+
 urlpatterns = [
-    path('', views.generos, name='generos'),
+    path('', views.ageneros if ASSINCRONA else views.generos, name='generos'),
     path('add/', views.generos_add, name='generos_add'),
     path('edit/<int:id>/', views.generos_edit, name='generos_edit'),
     path('delete/<int:id>/', views.generos_delete, name='generos_delete'),
@@ -1,6 +1,9 @@
 from django.shortcuts import render, redirect
-from django.db import connection
 from django.contrib import messages
+from biblioteca.db import query, execute
+from biblioteca.referencias import invalidar
+from biblioteca import fragmentos
+from biblioteca.paginacao import paginar, apaginar
 from django.db.utils import IntegrityError
 
 
@@ -11,21 +14,24 @@ def login_required(view_func):
         return view_func(request, *args, **kwargs)
     return wrapper
 
-def query(sql, params=None):
-    with connection.cursor() as cursor:
-        cursor.execute(sql, params or [])
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
-def execute(sql, params=None):
-    with connection.cursor() as cursor:
-        cursor.execute(sql, params or [])
-    return True
+def alogin_required(view_func):
+    async def wrapper(request, *args, **kwargs):
+        if not await request.session.aget('usuario_logado'):
+            return redirect('login')
+        return await view_func(request, *args, **kwargs)
+    return wrapper
+
 
 @login_required
 def generos(request):
-    dados = query("SELECT * FROM Generos")
-    return render(request, 'generos.html', {'dados': dados})
+    contexto = paginar(request, 'Generos', 'ID_genero', {'nome': 'Nome_genero'})
+    return render(request, 'generos.html', contexto)
+
+@alogin_required
+async def ageneros(request):
+    contexto = await apaginar(request, 'Generos', 'ID_genero', {'nome': 'Nome_genero'})
+    return render(request, 'generos.html', contexto)
 
 @login_required
 def generos_add(request):
@@ -37,6 +43,8 @@ def generos_add(request):
                 "INSERT INTO Generos (Nome_genero) VALUES (%s)",
                 [nome]
             )
+            invalidar('generos')
+            fragmentos.invalidar('livros')
             return redirect('generos')
 
         except Exception as e:
@@ -55,6 +63,8 @@ def generos_edit(request, id):
     if request.method == 'POST':
         nome = request.POST.get('nome')
         execute("UPDATE Generos SET Nome_genero=%s WHERE ID_genero=%s", [nome, id])
+        invalidar('generos')
+        fragmentos.invalidar('livros')
         return redirect('generos')
     genero = query("SELECT * FROM Generos WHERE ID_genero=%s", [id])[0]
     return render(request, 'generos_edit.html', {'genero': genero})
@@ -63,6 +73,8 @@ def generos_edit(request, id):
 def generos_delete(request, id):
     try:
         execute("DELETE FROM Generos WHERE ID_genero=%s", [id])
+        invalidar('generos')
+        fragmentos.invalidar('livros')
     except (TypeError, ValueError, IntegrityError):
         messages.error(request, "não foi possivel realizar")
     return redirect('generos')
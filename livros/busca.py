@@ -0,0 +1,58 @@
+"""
+Busca textual no catálogo (título, resumo, autor e gênero).
+
+Usa o índice FULLTEXT de Catalogo em modo booleano: cada termo vira um
+prefixo obrigatório (+termo*) e o resultado sai ordenado pela relevância
+calculada pelo MySQL.
+"""
+import re
+import unicodedata
+
+from biblioteca.db import query
+
+
+# Palavras curtas ou comuns demais para ajudar na busca
+STOPWORDS = {
+    'a', 'o', 'as', 'os', 'e', 'de', 'da', 'do', 'das', 'dos', 'em', 'no',
+    'na', 'nos', 'nas', 'um', 'uma', 'uns', 'umas', 'para', 'por', 'com',
+    'sem', 'que', 'ao', 'aos', 'se', 'sua', 'seu',
+}
+
+TAMANHO_MINIMO = 3
+
+LIMITE = 50
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos ('Ação' -> 'acao')"""
+    decomposto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def termos(texto):
+    """Quebra a consulta em termos úteis para o índice"""
+    return [
+        t for t in re.findall(r'\w+', normalizar(texto))
+        if len(t) >= TAMANHO_MINIMO and t not in STOPWORDS
+    ]
+
+
+def buscar(texto, limite=LIMITE):
+    """Retorna os livros que casam com todos os termos, por relevância"""
+    lista = termos(texto)
+    if not lista:
+        return []
+
+    expressao = ' '.join(f'+{t}*' for t in lista)
+
+    return query("""
+        SELECT ID_livro, Titulo, Nome_autor, Nome_genero, Nome_editora,
+               Quantidade_disponivel,
+               MATCH(Titulo, Resumo, Nome_autor, Nome_genero)
+                   AGAINST (%s IN BOOLEAN MODE) AS relevancia
+        FROM Catalogo
+        WHERE MATCH(Titulo, Resumo, Nome_autor, Nome_genero)
+              AGAINST (%s IN BOOLEAN MODE)
+        ORDER BY relevancia DESC, ID_livro
+        LIMIT %s
+    """, [expressao, expressao, limite])
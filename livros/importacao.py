@@ -0,0 +1,319 @@
+"""
+Importação em massa do catálogo a partir de CSV ou JSON.
+
+O arquivo é lido linha a linha (CSV ou JSON Lines; um .json com uma lista
+é carregado inteiro). Autores, editoras e gêneros são resolvidos pelo
+nome num mapa em memória e os que faltam são criados por lote. ISBNs são
+conferidos contra um conjunto com os já cadastrados e os já vistos no
+arquivo, então os triggers de validação não recusam nada no caminho comum.
+
+Os livros aceitos entram com um INSERT de várias linhas por lote, cada
+lote na sua transação. A auditoria por linha (livros_audit_insert) é
+desligada e cada lote grava um único registro com a faixa de ids. Se um
+lote falhar (ex.: ISBN cadastrado por outra sessão no meio da
+importação), ele é refeito linha a linha e só as linhas recusadas pelo
+MySQL vão para o relatório.
+"""
+import codecs
+import csv
+import json
+
+from django.db import transaction, DatabaseError
+
+from biblioteca import fragmentos
+from biblioteca.db import query, execute, inserir, marcadores, marcadores_in
+from biblioteca.referencias import invalidar
+
+
+LOTE = 1000
+
+COLUNAS = ['titulo', 'autor', 'isbn', 'ano', 'genero', 'editora', 'quantidade', 'resumo']
+
+# Tabela, chave e coluna de nome de cada referência, pela coluna do arquivo
+REFERENCIAS = {
+    'autor': ('Autores', 'ID_autor', 'Nome_autor', 'autores'),
+    'editora': ('Editoras', 'ID_editora', 'Nome_editora', 'editoras'),
+    'genero': ('Generos', 'ID_genero', 'Nome_genero', 'generos'),
+}
+
+
+class Resultado:
+    def __init__(self):
+        self.importados = 0
+        self.criados = dict.fromkeys(REFERENCIAS, 0)
+        self.rejeitados = []
+
+    def rejeitar(self, linha, registro, motivo):
+        self.rejeitados.append({
+            'linha': linha,
+            'isbn': registro.get('isbn') or '',
+            'titulo': registro.get('titulo') or '',
+            'motivo': motivo,
+        })
+
+
+def formato(nome):
+    """Formato pelo nome do arquivo: 'csv', 'jsonl' ou 'json'"""
+    extensao = nome.rsplit('.', 1)[-1].lower()
+    return extensao if extensao in ('csv', 'jsonl', 'json') else 'csv'
+
+
+def _linhas(arquivo, erros):
+    """
+    Decodifica o arquivo linha a linha; uma linha com bytes fora de UTF-8
+    é anotada em `erros` e segue como linha em branco
+    """
+    for numero, linha in enumerate(arquivo, 1):
+        try:
+            yield linha.decode('utf-8-sig' if numero == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            erros.append((numero, {}, "Linha com caracteres fora de UTF-8"))
+            yield '\n'
+
+
+def _csv(texto):
+    leitor = csv.DictReader(texto)
+    while True:
+        try:
+            registro = next(leitor)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield leitor.line_num, None, f"CSV inválido: {e}"
+            continue
+        yield leitor.line_num, registro, None
+
+
+def _jsonl(texto):
+    for numero, linha in enumerate(texto, 1):
+        if not linha.strip():
+            continue
+        try:
+            yield numero, json.loads(linha), None
+        except ValueError as e:
+            yield numero, None, f"JSON inválido: {e}"
+
+
+def _json(texto):
+    try:
+        lista = json.loads(''.join(texto))
+    except ValueError as e:
+        yield getattr(e, 'lineno', 0), None, f"JSON inválido: {e}"
+        return
+    if not isinstance(lista, list):
+        yield 0, None, "O arquivo JSON deve conter uma lista de objetos"
+        return
+    for numero, registro in enumerate(lista, 1):
+        yield numero, registro, None
+
+
+def ler(arquivo, tipo):
+    """
+    Gera (número da linha, registro, motivo) de um arquivo binário. Linhas
+    que não podem ser lidas (bytes fora de UTF-8, CSV ou JSON inválido,
+    item que não é um objeto) vêm com registro vazio e o motivo da recusa,
+    sem interromper a leitura. Colunas ausentes viram None; os nomes das
+    colunas não diferenciam maiúsculas.
+    """
+    erros = []
+    texto = _linhas(arquivo, erros)
+    leitor = {'csv': _csv, 'jsonl': _jsonl}.get(tipo, _json)(texto)
+
+    for numero, registro, motivo in leitor:
+        yield from erros
+        del erros[:]
+
+        if motivo is None and not isinstance(registro, dict):
+            motivo = "Registro não é um objeto JSON"
+        if motivo is not None:
+            yield numero, {}, motivo
+            continue
+
+        registro = {str(k).strip().lower(): v for k, v in registro.items() if k is not None}
+        yield numero, {c: registro.get(c) for c in COLUNAS}, None
+
+    yield from erros
+
+
+def _texto(valor):
+    return str(valor).strip() if valor is not None else ''
+
+
+def _inteiro(valor):
+    valor = _texto(valor)
+    return int(valor) if valor else None
+
+
+class Importador:
+    def __init__(self, lote=LOTE, usuario=None):
+        self.lote = lote
+        self.usuario = usuario or 'importacao'
+        self.resultado = Resultado()
+        self.isbns = {r.ISBN for r in query("SELECT ISBN FROM Livros")}
+        self.mapas = {
+            coluna: {
+                nome.casefold(): id for id, nome in query(f"SELECT {chave}, {nome_col} FROM {tabela}")
+            }
+            for coluna, (tabela, chave, nome_col, _) in REFERENCIAS.items()
+        }
+
+    def validar(self, registro):
+        """Retorna a linha pronta para o INSERT ou levanta ValueError com o motivo"""
+        titulo = _texto(registro['titulo'])
+        if not titulo:
+            raise ValueError("Título vazio")
+        if len(titulo) > 255:
+            raise ValueError("Título com mais de 255 caracteres")
+
+        isbn = _texto(registro['isbn']).replace('-', '').replace(' ', '')
+        if len(isbn) != 13:
+            raise ValueError("ISBN deve conter exatamente 13 caracteres")
+        if isbn in self.isbns:
+            raise ValueError("ISBN já cadastrado no sistema")
+
+        try:
+            ano = _inteiro(registro['ano'])
+            quantidade = _inteiro(registro['quantidade'])
+        except ValueError:
+            raise ValueError("Ano ou quantidade não numérico")
+        if quantidade is not None and quantidade < 0:
+            raise ValueError("Quantidade disponível não pode ser negativa")
+
+        nomes = {}
+        for coluna in REFERENCIAS:
+            nome = _texto(registro[coluna])
+            if len(nome) > 255:
+                raise ValueError(f"Nome de {coluna} com mais de 255 caracteres")
+            nomes[coluna] = nome or None
+
+        self.isbns.add(isbn)
+        return {
+            'titulo': titulo, 'isbn': isbn, 'ano': ano, 'quantidade': quantidade,
+            'resumo': _texto(registro['resumo']), **nomes,
+        }
+
+    def resolver(self, pendentes, novos):
+        """
+        Cria de uma vez as referências do lote que ainda não existem e anota
+        em `novos` as (coluna, nome) incluídas no mapa
+        """
+        for coluna, (tabela, chave_col, nome_col, _) in REFERENCIAS.items():
+            mapa = self.mapas[coluna]
+            faltando = list({
+                p[coluna].casefold(): p[coluna] for _, p in pendentes
+                if p[coluna] and p[coluna].casefold() not in mapa
+            }.items())
+            if not faltando:
+                continue
+
+            nomes = [nome for _, nome in faltando]
+            primeiro = inserir(f"""
+                INSERT INTO {tabela} ({nome_col}) VALUES {marcadores(len(faltando), 1)}
+            """, nomes)
+
+            # Os ids de um INSERT de várias linhas podem não ser consecutivos
+            # (innodb_autoinc_lock_mode=2): relê os criados pelo nome
+            criados = {
+                r.nome.casefold(): r.id for r in query(f"""
+                    SELECT {chave_col} AS id, {nome_col} AS nome
+                    FROM {tabela}
+                    WHERE {chave_col} >= %s AND {nome_col} IN ({marcadores_in(nomes)})
+                    ORDER BY {chave_col}
+                """, [primeiro] + nomes)
+            }
+            for chave, _ in faltando:
+                mapa[chave] = criados[chave]
+                novos.append((coluna, chave))
+
+    def _valores(self, p):
+        ids = [
+            self.mapas[c][p[c].casefold()] if p[c] else None for c in ('autor', 'genero', 'editora')
+        ]
+        return [p['titulo'], ids[0], p['isbn'], p['ano'], ids[1], ids[2], p['quantidade'], p['resumo']]
+
+    def _inserir(self, pendentes):
+        primeiro = inserir(f"""
+            INSERT INTO Livros
+            (Titulo, Autor_id, ISBN, Ano_publicacao, Genero_id, Editora_id, Quantidade_disponivel, Resumo)
+            VALUES {marcadores(len(pendentes), 8)}
+        """, [v for _, p in pendentes for v in self._valores(p)])
+
+        # Sem supor ids consecutivos: o último vem pelos ISBNs (únicos)
+        isbns = [p['isbn'] for _, p in pendentes]
+        ultimo = query(f"""
+            SELECT MAX(ID_livro) AS id FROM Livros WHERE ISBN IN ({marcadores_in(isbns)})
+        """, isbns)[0].id
+
+        execute("""
+            INSERT INTO Auditoria (Tabela_afetada, Operacao, ID_registro, Usuario_sistema, Dados_novos, Descricao)
+            VALUES ('Livros', 'INSERT', %s, %s, %s, %s)
+        """, [
+            primeiro, self.usuario,
+            f"IDs {primeiro} a {ultimo}",
+            f"Importação em lote: {len(pendentes)} livros",
+        ])
+
+    def _transacao(self, pendentes):
+        novos = []
+        try:
+            with transaction.atomic():
+                self.resolver(pendentes, novos)
+                self._inserir(pendentes)
+        except DatabaseError:
+            # Os ids das referências criadas foram desfeitos junto
+            for coluna, chave in novos:
+                del self.mapas[coluna][chave]
+            raise
+
+        for coluna, _ in novos:
+            self.resultado.criados[coluna] += 1
+        for coluna in {coluna for coluna, _ in novos}:
+            invalidar(REFERENCIAS[coluna][3])
+        self.resultado.importados += len(pendentes)
+
+    def gravar(self, pendentes):
+        try:
+            return self._transacao(pendentes)
+        except DatabaseError:
+            pass
+
+        # Lote recusado pelo banco: linha a linha, para isolar a culpada
+        for numero, p in pendentes:
+            try:
+                self._transacao([(numero, p)])
+            except DatabaseError as e:
+                self.resultado.rejeitar(numero, p, e.args[1] if len(e.args) > 1 else str(e))
+
+    def importar(self, registros):
+        """Importa os (linha, registro, motivo) de ler() e retorna o Resultado"""
+        anterior = query("SELECT @auditoria_aplicacao AS valor")[0].valor
+        execute("SET @auditoria_aplicacao = 1")
+        try:
+            pendentes = []
+            for numero, registro, motivo in registros:
+                if motivo is not None:
+                    self.resultado.rejeitar(numero, registro, motivo)
+                    continue
+                try:
+                    pendentes.append((numero, self.validar(registro)))
+                except ValueError as e:
+                    self.resultado.rejeitar(numero, registro, str(e))
+                    continue
+                if len(pendentes) >= self.lote:
+                    self.gravar(pendentes)
+                    pendentes = []
+            if pendentes:
+                self.gravar(pendentes)
+        finally:
+            execute("SET @auditoria_aplicacao = %s", [anterior])
+
+        if self.resultado.importados:
+            fragmentos.invalidar('livros', 'autores')
+        return self.resultado
+
+
+def relatorio(rejeitados, saida):
+    """Grava os rejeitados em CSV (linha, isbn, titulo, motivo) num arquivo texto"""
+    escritor = csv.DictWriter(saida, fieldnames=['linha', 'isbn', 'titulo', 'motivo'])
+    escritor.writeheader()
+    escritor.writerows(rejeitados)
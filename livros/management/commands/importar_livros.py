@@ -0,0 +1,48 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from livros.importacao import LOTE, Importador, formato, ler, relatorio
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa livros de um arquivo CSV, JSON Lines (.jsonl) ou JSON com as "
+        "colunas titulo, autor, isbn, ano, genero, editora, quantidade e resumo. "
+        "Autores, editoras e gêneros inexistentes são criados pelo nome; as "
+        "linhas recusadas vão para um relatório CSV"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo')
+        parser.add_argument('--formato', choices=['csv', 'jsonl', 'json'], default=None)
+        parser.add_argument('--lote', type=int, default=LOTE, help="Livros por INSERT/transação")
+        parser.add_argument('--rejeitados', default=None, help="Arquivo do relatório de recusas")
+
+    def handle(self, *args, **options):
+        tipo = options['formato'] or formato(options['arquivo'])
+        inicio = time.perf_counter()
+
+        try:
+            with open(options['arquivo'], 'rb') as arquivo:
+                resultado = Importador(options['lote']).importar(ler(arquivo, tipo))
+        except OSError as e:
+            raise CommandError(f"Não foi possível ler {options['arquivo']}: {e}")
+
+        decorrido = time.perf_counter() - inicio
+        criados = ', '.join(f"{n} {coluna}(s)" for coluna, n in resultado.criados.items() if n)
+        self.stdout.write(
+            f"{resultado.importados} livros importados em {decorrido:.1f} s "
+            f"({resultado.importados / decorrido:.0f}/s)" + (f"; criados: {criados}" if criados else "")
+        )
+
+        if resultado.rejeitados:
+            saida = options['rejeitados'] or f"importacao-rejeitados-{datetime.now():%Y%m%d-%H%M%S}.csv"
+            with open(saida, 'w', encoding='utf-8', newline='') as arquivo:
+                relatorio(resultado.rejeitados, arquivo)
+            self.stdout.write(self.style.WARNING(
+                f"{len(resultado.rejeitados)} linhas recusadas; relatório em {saida}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("Nenhuma linha recusada"))
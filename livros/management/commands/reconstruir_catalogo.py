@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from biblioteca.db import execute, query
+
+
+class Command(BaseCommand):
+    help = "Reconstrói a tabela Catalogo a partir de Livros, Autores, Gêneros e Editoras"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            execute("DELETE FROM Catalogo")
+            execute("""
+                INSERT INTO Catalogo (
+                    ID_livro, Titulo, ISBN, Ano_publicacao, Quantidade_disponivel,
+                    Autor_id, Nome_autor, Genero_id, Nome_genero, Editora_id, Nome_editora, Resumo
+                )
+                SELECT Livros.ID_livro,
+                       Livros.Titulo,
+                       Livros.ISBN,
+                       Livros.Ano_publicacao,
+                       Livros.Quantidade_disponivel,
+                       Livros.Autor_id,
+                       Autores.Nome_autor,
+                       Livros.Genero_id,
+                       Generos.Nome_genero,
+                       Livros.Editora_id,
+                       Editoras.Nome_editora,
+                       Livros.Resumo
+                FROM Livros
+                LEFT JOIN Autores ON Livros.Autor_id = Autores.ID_autor
+                LEFT JOIN Generos ON Livros.Genero_id = Generos.ID_genero
+                LEFT JOIN Editoras ON Livros.Editora_id = Editoras.ID_editora
+            """)
+
+        total = query("SELECT COUNT(*) AS total FROM Catalogo")[0].total
+        self.stdout.write(self.style.SUCCESS(f"Catálogo reconstruído com {total} livros"))
@@ -1,3 +1,222 @@
-from django.test import TestCase
+import io
+from collections import namedtuple
+from contextlib import nullcontext
+from unittest import mock
 
-# Create your tests here.
+from django.db import DatabaseError, transaction
+from django.test import SimpleTestCase
+
+from livros import busca, importacao
+from livros.busca import TAMANHO_MINIMO, buscar, normalizar, termos
+from livros.importacao import Importador, ler
+
+
+class BuscaTests(SimpleTestCase):
+    def test_normalizar_tira_acentos_e_maiusculas(self):
+        self.assertEqual(normalizar('Ação'), 'acao')
+        self.assertEqual(normalizar('CORAÇÃO Órfão, pinguïm'), 'coracao orfao, pinguim')
+        self.assertEqual(normalizar('São Bernardo'), 'sao bernardo')
+
+    def test_termos_sem_stopwords(self):
+        self.assertEqual(termos('O cortiço de Aluísio'), ['cortico', 'aluisio'])
+        self.assertEqual(termos('Memórias póstumas para uma casa'), ['memorias', 'postumas', 'casa'])
+
+    def test_termos_curtos_descartados(self):
+        self.assertEqual(TAMANHO_MINIMO, 3)
+        self.assertEqual(termos('rio mar pé ir sol'), ['rio', 'mar', 'sol'])
+
+    def test_termos_ignoram_pontuacao_e_operadores(self):
+        self.assertEqual(termos('+casa* -"viagem" (noite)'), ['casa', 'viagem', 'noite'])
+
+    def test_expressao_booleana(self):
+        with mock.patch.object(busca, 'query', return_value=[]) as query:
+            buscar('A Hora da Estrela', limite=10)
+
+        sql, params = query.call_args.args
+        self.assertIn('IN BOOLEAN MODE', sql)
+        self.assertEqual(params, ['+hora* +estrela*', '+hora* +estrela*', 10])
+
+    def test_consulta_sem_termos_nao_vai_ao_banco(self):
+        with mock.patch.object(busca, 'query') as query:
+            for texto in ['', '   ', 'de o a', 'xy z', '!!! ---']:
+                self.assertEqual(buscar(texto), [])
+                self.assertEqual(termos(texto), [])
+        query.assert_not_called()
+
+
+Referencia = namedtuple('Referencia', ['id', 'nome'])
+Ultimo = namedtuple('Ultimo', ['id'])
+
+
+def registro(isbn, titulo='Dom Casmurro', **campos):
+    return {
+        'titulo': titulo, 'autor': None, 'isbn': isbn, 'ano': '1899', 'genero': None,
+        'editora': None, 'quantidade': '3', 'resumo': None, **campos,
+    }
+
+
+class LeituraTests(SimpleTestCase):
+    def test_csv(self):
+        arquivo = io.BytesIO(
+            "\ufeffTitulo,ISBN,Autor,Ano,Quantidade\n"
+            "Dom Casmurro,978-85-359-0277-5,Machado de Assis,1899,3\n"
+            "Iracema,9788572326972,José de Alencar,,\n".encode('utf-8')
+        )
+        lidos = list(ler(arquivo, 'csv'))
+
+        self.assertEqual([(n, m) for n, _, m in lidos], [(2, None), (3, None)])
+        # Nomes de coluna sem diferenciar maiúsculas (e sem o BOM); as ausentes viram None
+        self.assertEqual(lidos[0][1], registro('978-85-359-0277-5', autor='Machado de Assis'))
+        self.assertEqual((lidos[1][1]['titulo'], lidos[1][1]['ano']), ('Iracema', ''))
+
+    def test_jsonl(self):
+        arquivo = io.BytesIO(
+            b'{"titulo": "Iracema", "ISBN": "9788572326972", "ano": 1865}\n'
+            b'\n'
+            b'{"titulo": "sem fim"\n'
+            b'[1, 2]\n'
+            b'{"titulo": "O Guarani", "isbn": "9788508040163", "extra": 1}\n'
+        )
+        lidos = list(ler(arquivo, 'jsonl'))
+
+        self.assertEqual([n for n, _, _ in lidos], [1, 3, 4, 5])
+        self.assertEqual(lidos[0][1]['isbn'], '9788572326972')
+        self.assertEqual(lidos[0][1]['ano'], 1865)
+        self.assertTrue(lidos[1][2].startswith("JSON inválido"))
+        self.assertEqual(lidos[2][1:], ({}, "Registro não é um objeto JSON"))
+        self.assertNotIn('extra', lidos[3][1])
+
+    def test_linha_ilegivel_nao_interrompe_a_leitura(self):
+        arquivo = io.BytesIO(
+            b'titulo,isbn\n'
+            b'Iracema,9788572326972\n'
+            b'S\xe3o Bernardo,9788501012345\n'
+            b'O Guarani,9788508040163\n'
+        )
+        lidos = list(ler(arquivo, 'csv'))
+
+        self.assertEqual([(n, r.get('titulo'), m) for n, r, m in lidos], [
+            (2, 'Iracema', None),
+            (3, None, "Linha com caracteres fora de UTF-8"),
+            (4, 'O Guarani', None),
+        ])
+
+    def test_linha_ilegivel_no_fim_do_arquivo(self):
+        lidos = list(ler(io.BytesIO(b'{"titulo": "Iracema"}\n\xff\xfe\n'), 'jsonl'))
+        self.assertEqual([(n, m) for n, _, m in lidos], [(1, None), (2, "Linha com caracteres fora de UTF-8")])
+
+
+class ImportadorTests(SimpleTestCase):
+    def setUp(self):
+        self.inseridos = []
+        for nome, valor in [
+            ('execute', mock.DEFAULT),
+            ('invalidar', mock.DEFAULT),
+            ('fragmentos', mock.DEFAULT),
+            ('query', mock.DEFAULT),
+            ('inserir', mock.DEFAULT),
+        ]:
+            patcher = mock.patch.object(importacao, nome, valor)
+            setattr(self, nome, patcher.start())
+            self.addCleanup(patcher.stop)
+        # Sem banco: a transação de cada lote não abre conexão
+        patcher = mock.patch.object(transaction, 'atomic', nullcontext)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.query.side_effect = self.responder
+        self.inserir.side_effect = self.gravar_no_banco
+        self.recusados = set()
+
+    def responder(self, sql, params=None):
+        if 'SELECT ISBN FROM Livros' in sql:
+            return [namedtuple('Livro', ['ISBN'])('9788535902775')]
+        if 'MAX(ID_livro)' in sql:
+            return [Ultimo(100 + len(self.inseridos))]
+        if '@auditoria_aplicacao' in sql:
+            return [namedtuple('Flag', ['valor'])(None)]
+        return []
+
+    def gravar_no_banco(self, sql, params):
+        """INSERT INTO Livros falso: recusa o lote que contém um ISBN de self.recusados"""
+        isbns = params[2::8]
+        recusado = self.recusados.intersection(isbns)
+        if recusado:
+            raise DatabaseError(1062, f"Duplicate entry '{recusado.pop()}' for key 'ISBN'")
+        self.inseridos.append(isbns)
+        return 101
+
+    def test_validar(self):
+        importador = Importador()
+
+        valido = importador.validar(registro('978-85-7232-697-2', titulo='  Iracema '))
+        self.assertEqual((valido['titulo'], valido['isbn'], valido['ano']), ('Iracema', '9788572326972', 1899))
+
+        for campos, motivo in [
+            ({'titulo': ''}, "Título vazio"),
+            ({'isbn': '123'}, "ISBN deve conter exatamente 13 caracteres"),
+            ({'isbn': '9788535902775'}, "ISBN já cadastrado no sistema"),
+            ({'ano': 'mil'}, "Ano ou quantidade não numérico"),
+            ({'quantidade': '-1'}, "Quantidade disponível não pode ser negativa"),
+        ]:
+            with self.assertRaisesMessage(ValueError, motivo):
+                importador.validar(registro('9788508040163') | campos)
+
+    def test_isbn_repetido_no_mesmo_arquivo(self):
+        importador = Importador()
+        importador.validar(registro('9788572326972'))
+
+        with self.assertRaisesMessage(ValueError, "ISBN já cadastrado no sistema"):
+            importador.validar(registro('978-8572326972', titulo='Outra edição'))
+
+    def test_importar_em_lotes(self):
+        registros = [(n, registro(f'97885000000{n:02d}'), None) for n in range(1, 6)]
+        registros.insert(2, (3, {}, "Linha com caracteres fora de UTF-8"))
+
+        resultado = Importador(lote=2).importar(registros)
+
+        self.assertEqual(resultado.importados, 5)
+        self.assertEqual([len(lote) for lote in self.inseridos], [2, 2, 1])
+        self.assertEqual([r['motivo'] for r in resultado.rejeitados], ["Linha com caracteres fora de UTF-8"])
+        self.fragmentos.invalidar.assert_called_once_with('livros', 'autores')
+        # A auditoria por linha é desligada durante a importação e restaurada no fim
+        self.assertEqual(self.execute.call_args_list[0].args, ("SET @auditoria_aplicacao = 1",))
+        self.assertEqual(self.execute.call_args_list[-1].args, ("SET @auditoria_aplicacao = %s", [None]))
+
+    def test_lote_recusado_e_refeito_linha_a_linha(self):
+        # ISBN cadastrado por outra sessão depois de lido o conjunto inicial
+        self.recusados = {'9788500000002'}
+        registros = [(n, registro(f'97885000000{n:02d}'), None) for n in range(1, 4)]
+
+        resultado = Importador(lote=10).importar(registros)
+
+        self.assertEqual(self.inseridos, [['9788500000001'], ['9788500000003']])
+        self.assertEqual(resultado.importados, 2)
+        self.assertEqual(resultado.rejeitados, [{
+            'linha': 2, 'isbn': '9788500000002', 'titulo': 'Dom Casmurro',
+            'motivo': "Duplicate entry '9788500000002' for key 'ISBN'",
+        }])
+
+    def test_referencias_criadas_sao_relidas_pelo_nome(self):
+        importador = Importador()
+        pendentes = [
+            (1, importador.validar(registro('9788500000001', autor='Machado de Assis'))),
+            (2, importador.validar(registro('9788500000002', autor='Clarice Lispector'))),
+            (3, importador.validar(registro('9788500000003', autor='Machado de Assis'))),
+        ]
+        self.inserir.side_effect = None
+        self.inserir.return_value = 40
+        # Ids fora da ordem do INSERT, como com innodb_autoinc_lock_mode=2
+        self.query.side_effect = lambda sql, params=None: (
+            [Referencia(40, 'Clarice Lispector'), Referencia(43, 'Machado de Assis')]
+            if 'FROM Autores' in sql else []
+        )
+
+        novos = []
+        importador.resolver(pendentes, novos)
+
+        self.assertEqual(importador.mapas['autor'], {'machado de assis': 43, 'clarice lispector': 40})
+        self.assertEqual(sorted(novos), [('autor', 'clarice lispector'), ('autor', 'machado de assis')])
+        sql, params = self.inserir.call_args.args
+        self.assertIn("INSERT INTO Autores", sql)
+        self.assertEqual(params, ['Machado de Assis', 'Clarice Lispector'])
@@ -1,12 +1,18 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Views de leitura assíncronas (biblioteca.db_async) quando PILHA_VIEWS = 'async'
+ASSINCRONA = settings.PILHA_VIEWS == 'async'
+
 urlpatterns = [
 
-    path('', views.livros, name='livros'),
+    path('', views.alivros if ASSINCRONA else views.livros, name='livros'),
+    path('busca/', views.livros_busca, name='livros_busca'),
     path('add/', views.livros_add, name='livros_add'),
+    path('importar/', views.livros_importar, name='livros_importar'),
     path('edit/<int:id>/', views.livros_edit, name='livros_edit'),
     path('delete/<int:id>/', views.livros_delete, name='livros_delete'),
-    path('view/<int:id>/', views.livro_detalhes, name='livro_detalhes'),
+    path('view/<int:id>/', views.alivro_detalhes if ASSINCRONA else views.livro_detalhes, name='livro_detalhes'),
 
 ]
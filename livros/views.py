@@ -1,6 +1,16 @@
 from django.shortcuts import render, redirect
-from django.db import connection, DatabaseError
+from django.db import DatabaseError
 from django.contrib import messages
+from django.http import HttpResponse
+from biblioteca.db import query, execute, inserir
+from biblioteca.db_async import aquery
+from biblioteca import fragmentos
+from biblioteca.paginacao import paginar, apaginar
+from biblioteca.referencias import referencias
+from biblioteca.versoes import condicional, acondicional
+from auditoria import fila as auditoria
+from .busca import buscar
+from .importacao import Importador, formato, ler, relatorio
 from datetime import date
 
 
@@ -12,23 +22,81 @@ def login_required(view_func):
     return wrapper
 
 
-def query(sql, params=None):
-    with connection.cursor() as cursor:
-        cursor.execute(sql, params or [])
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+def alogin_required(view_func):
+    async def wrapper(request, *args, **kwargs):
+        if not await request.session.aget('usuario_logado'):
+            return redirect('login')
+        return await view_func(request, *args, **kwargs)
+    return wrapper
+
 
+LISTAGEM = (
+    'Catalogo', 'ID_livro', {'titulo': 'Titulo'},
+    'ID_livro, Titulo, Nome_autor, Nome_genero, Nome_editora, Quantidade_disponivel',
+)
 
-def execute(sql, params=None):
-    with connection.cursor() as cursor:
-        cursor.execute(sql, params or [])
-    return True
+DETALHES = """
+    SELECT Livros.*, 
+           Autores.Nome_autor, 
+           Generos.Nome_genero, 
+           Editoras.Nome_editora
+    FROM Livros
+    LEFT JOIN Autores ON Livros.Autor_id = Autores.ID_autor
+    LEFT JOIN Generos ON Livros.Genero_id = Generos.ID_genero
+    LEFT JOIN Editoras ON Livros.Editora_id = Editoras.ID_editora
+    WHERE Livros.ID_livro = %s
+"""
 
 
 @login_required
 def livros(request):
-    dados = query("SELECT * FROM Livros")
-    return render(request, 'livros.html', {'dados': dados})
+    contexto = fragmentos.obter(
+        'livros', request, lambda: paginar(request, *LISTAGEM), 'livros_tabela.html'
+    )
+    return render(request, 'livros.html', contexto)
+
+
+@alogin_required
+async def alivros(request):
+    contexto = await fragmentos.aobter(
+        'livros', request, lambda: apaginar(request, *LISTAGEM), 'livros_tabela.html'
+    )
+    return render(request, 'livros.html', contexto)
+
+
+@login_required
+def livros_busca(request):
+    q = request.GET.get('q', '').strip()
+    dados = buscar(q) if q else []
+    return render(request, 'livros_busca.html', {'dados': dados, 'q': q})
+
+
+@login_required
+def livros_importar(request):
+    if request.method != 'POST':
+        return render(request, 'livros_importar.html')
+
+    arquivo = request.FILES.get('arquivo')
+    if not arquivo:
+        messages.error(request, "Escolha um arquivo CSV ou JSON")
+        return render(request, 'livros_importar.html')
+
+    # Linhas ilegíveis vão para os rejeitados, sem interromper a importação
+    resultado = Importador(usuario=request.session.get('nome_usuario')).importar(
+        ler(arquivo, formato(arquivo.name))
+    )
+
+    if resultado.rejeitados and request.POST.get('relatorio'):
+        resposta = HttpResponse(content_type='text/csv; charset=utf-8')
+        resposta['Content-Disposition'] = 'attachment; filename="importacao-rejeitados.csv"'
+        relatorio(resultado.rejeitados, resposta)
+        return resposta
+
+    messages.success(request, f"{resultado.importados} livros importados")
+    return render(request, 'livros_importar.html', {
+        'resultado': resultado,
+        'rejeitados': resultado.rejeitados[:200],
+    })
 
 
 @login_required
@@ -44,21 +112,30 @@ def livros_add(request):
         resumo = request.POST.get('resumo')
 
         try:
-            execute("""
+            id_livro = inserir("""
                 INSERT INTO Livros 
                 (Titulo, Autor_id, ISBN, Ano_publicacao, Genero_id, Editora_id, Quantidade_disponivel, Resumo)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
             """, [titulo, autor_id, isbn, ano, genero_id, editora_id, qtd, resumo])
 
+            auditoria.registrar(
+                'Livros', 'INSERT', id_livro,
+                dados_novos=f"Título: {titulo}, ISBN: {isbn}, Quantidade: {qtd}",
+                descricao=f"Novo livro cadastrado: {titulo}",
+                usuario=request.session.get('nome_usuario'),
+            )
+
+            fragmentos.invalidar('livros')
+
             messages.success(request, f"Livro '{titulo}' cadastrado com sucesso!")
             return redirect('livros')
 
         except DatabaseError as e:
             messages.error(request, e.args[1])
 
-            autores = query("SELECT * FROM Autores")
-            generos = query("SELECT * FROM Generos")
-            editoras = query("SELECT * FROM Editoras")
+            autores = referencias('autores')
+            generos = referencias('generos')
+            editoras = referencias('editoras')
 
             return render(request, 'livro_add.html', {
                 'autores': autores,
@@ -74,9 +151,9 @@ def livros_add(request):
                 'resumo': resumo
             })
 
-    autores = query("SELECT * FROM Autores")
-    generos = query("SELECT * FROM Generos")
-    editoras = query("SELECT * FROM Editoras")
+    autores = referencias('autores')
+    generos = referencias('generos')
+    editoras = referencias('editoras')
 
     return render(request, 'livro_add.html', {
         'autores': autores,
@@ -111,6 +188,15 @@ def livros_edit(request, id):
                 WHERE ID_livro = %s
             """, [titulo, autor_id, isbn, ano, genero_id, editora_id, qtd, resumo, id])
 
+            auditoria.registrar(
+                'Livros', 'UPDATE', id,
+                dados_novos=f"Título: {titulo}, Qtd: {qtd}",
+                descricao=f"Livro atualizado: {titulo}",
+                usuario=request.session.get('nome_usuario'),
+            )
+
+            fragmentos.invalidar('livros', 'emprestimos')
+
             messages.success(request, f"Livro '{titulo}' atualizado com sucesso!")
             return redirect('livros')
 
@@ -118,9 +204,9 @@ def livros_edit(request, id):
             messages.error(request, e.args[1])
 
     livro = query("SELECT * FROM Livros WHERE ID_livro = %s", [id])[0]
-    autores = query("SELECT * FROM Autores")
-    generos = query("SELECT * FROM Generos")
-    editoras = query("SELECT * FROM Editoras")
+    autores = referencias('autores')
+    generos = referencias('generos')
+    editoras = referencias('editoras')
 
     return render(request, 'livros_edit.html', {
         'livro': livro,
@@ -136,8 +222,9 @@ def livros_delete(request, id):
         livro = query("SELECT Titulo FROM Livros WHERE ID_livro = %s", [id])
 
         if livro:
-            titulo = livro[0]['Titulo']
+            titulo = livro[0].Titulo
             execute("DELETE FROM Livros WHERE ID_livro = %s", [id])
+            fragmentos.invalidar('livros', 'emprestimos')
             messages.success(request, f"Livro '{titulo}' excluído com sucesso!")
         else:
             messages.error(request, "Livro não encontrado")
@@ -149,17 +236,14 @@ def livros_delete(request, id):
 
 
 @login_required
+@condicional('Livros')
 def livro_detalhes(request, id):
-    livro = query("""
-        SELECT Livros.*, 
-               Autores.Nome_autor, 
-               Generos.Nome_genero, 
-               Editoras.Nome_editora
-        FROM Livros
-        LEFT JOIN Autores ON Livros.Autor_id = Autores.ID_autor
-        LEFT JOIN Generos ON Livros.Genero_id = Generos.ID_genero
-        LEFT JOIN Editoras ON Livros.Editora_id = Editoras.ID_editora
-        WHERE Livros.ID_livro = %s
-    """, [id])[0]
+    livro = query(DETALHES, [id])[0]
+    return render(request, 'livro_detalhes.html', {'livro': livro})
+
 
+@alogin_required
+@acondicional('Livros')
+async def alivro_detalhes(request, id):
+    livro = (await aquery(DETALHES, [id]))[0]
     return render(request, 'livro_detalhes.html', {'livro': livro})
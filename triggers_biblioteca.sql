@@ -13,6 +13,13 @@ CREATE TABLE IF NOT EXISTS Auditoria (
     Descricao TEXT
 ) ENGINE=InnoDB;
 
+-- Filtros da tela de auditoria, todos ordenados por Data_hora DESC.
+-- Fora do CREATE TABLE para chegar também às tabelas já existentes
+CREATE INDEX idx_auditoria_data ON Auditoria (Data_hora);
+CREATE INDEX idx_auditoria_tabela_data ON Auditoria (Tabela_afetada, Data_hora);
+CREATE INDEX idx_auditoria_operacao_data ON Auditoria (Operacao, Data_hora);
+CREATE INDEX idx_auditoria_tabela_operacao_data ON Auditoria (Tabela_afetada, Operacao, Data_hora);
+
 
 DELIMITER $$
 DROP TRIGGER IF EXISTS livros_validar_insert$$
@@ -43,18 +50,26 @@ DROP TRIGGER IF EXISTS emprestimos_validar_insert$$
 CREATE TRIGGER emprestimos_validar_insert
 BEFORE INSERT ON Emprestimos
 FOR EACH ROW
-BEGIN
+corpo: BEGIN
     DECLARE qtd_disponivel INT;
     DECLARE emprestimos_ativos INT;
     DECLARE multa_usuario DECIMAL(10,2);
     
-    -- Verificar disponibilidade do livro
-    SELECT Quantidade_disponivel INTO qtd_disponivel
-    FROM Livros WHERE ID_livro = NEW.Livro_id;
+    -- Carga de dados sintéticos (manage.py gerar_dados): histórico já consistente
+    IF @carga_dados = 1 THEN
+        LEAVE corpo;
+    END IF;
     
-    IF qtd_disponivel <= 0 THEN
+    -- Trava o usuário (e depois o livro, na mesma ordem de emprestar_lote):
+    -- dois empréstimos simultâneos não passam juntos pela validação
+    SELECT COALESCE(Multa_atual, 0) INTO multa_usuario
+    FROM Usuarios WHERE ID_usuario = NEW.Usuario_id
+    FOR UPDATE;
+    
+    -- Verificar se usuário tem multas pendentes acima de R$ 50
+    IF multa_usuario > 50.00 THEN
         SIGNAL SQLSTATE '45000'
-        SET MESSAGE_TEXT = 'Livro não disponível para empréstimo';
+        SET MESSAGE_TEXT = 'Usuário possui multa acima de R$ 50.00. Não pode realizar novos empréstimos';
     END IF;
     
     -- Validar limite de empréstimos por usuário (máximo 5 ativos)
@@ -68,13 +83,19 @@ BEGIN
         SET MESSAGE_TEXT = 'Usuário já possui 5 empréstimos ativos (limite máximo)';
     END IF;
     
-    -- Verificar se usuário tem multas pendentes acima de R$ 50
-    SELECT COALESCE(Multa_atual, 0) INTO multa_usuario
-    FROM Usuarios WHERE ID_usuario = NEW.Usuario_id;
+    -- Verificar disponibilidade do livro; emprestimos_registrar já baixou
+    -- o estoque com um UPDATE condicional e marca @estoque_reservado
+    IF @estoque_reservado = 1 THEN
+        LEAVE corpo;
+    END IF;
     
-    IF multa_usuario > 50.00 THEN
+    SELECT Quantidade_disponivel INTO qtd_disponivel
+    FROM Livros WHERE ID_livro = NEW.Livro_id
+    FOR UPDATE;
+    
+    IF qtd_disponivel <= 0 THEN
         SIGNAL SQLSTATE '45000'
-        SET MESSAGE_TEXT = 'Usuário possui multa acima de R$ 50.00. Não pode realizar novos empréstimos';
+        SET MESSAGE_TEXT = 'Livro não disponível para empréstimo';
     END IF;
 END$$
 
@@ -150,7 +171,12 @@ DROP TRIGGER IF EXISTS livros_audit_insert$$
 CREATE TRIGGER livros_audit_insert
 AFTER INSERT ON Livros
 FOR EACH ROW
-BEGIN
+corpo: BEGIN
+    -- Com AUDITORIA_MODO = 'aplicacao' o evento é gravado em lote pelo Django
+    IF @auditoria_aplicacao = 1 THEN
+        LEAVE corpo;
+    END IF;
+
     INSERT INTO Auditoria (
         Tabela_afetada,
         Operacao,
@@ -173,8 +199,13 @@ DROP TRIGGER IF EXISTS livros_audit_update$$
 CREATE TRIGGER livros_audit_update
 AFTER UPDATE ON Livros
 FOR EACH ROW
-BEGIN
+corpo: BEGIN
     DECLARE campos_alterados TEXT DEFAULT '';
+
+    -- Com AUDITORIA_MODO = 'aplicacao' o evento é gravado em lote pelo Django
+    IF @auditoria_aplicacao = 1 THEN
+        LEAVE corpo;
+    END IF;
     
     -- Identificar campos alterados
     IF OLD.Titulo != NEW.Titulo THEN
@@ -211,7 +242,12 @@ DROP TRIGGER IF EXISTS emprestimos_audit_insert$$
 CREATE TRIGGER emprestimos_audit_insert
 AFTER INSERT ON Emprestimos
 FOR EACH ROW
-BEGIN
+corpo: BEGIN
+    -- Com AUDITORIA_MODO = 'aplicacao' o evento é gravado em lote pelo Django
+    IF @auditoria_aplicacao = 1 THEN
+        LEAVE corpo;
+    END IF;
+
     INSERT INTO Auditoria (
         Tabela_afetada,
         Operacao,
@@ -234,8 +270,13 @@ DROP TRIGGER IF EXISTS emprestimos_audit_update$$
 CREATE TRIGGER emprestimos_audit_update
 AFTER UPDATE ON Emprestimos
 FOR EACH ROW
-BEGIN
+corpo: BEGIN
     DECLARE campos_alterados TEXT DEFAULT '';
+
+    -- Com AUDITORIA_MODO = 'aplicacao' o evento é gravado em lote pelo Django
+    IF @auditoria_aplicacao = 1 THEN
+        LEAVE corpo;
+    END IF;
     
     IF OLD.Status_emprestimo != NEW.Status_emprestimo THEN
         SET campos_alterados = CONCAT(campos_alterados, 'Status: ', OLD.Status_emprestimo, ' -> ', NEW.Status_emprestimo, '; ');
@@ -271,8 +312,13 @@ DROP TRIGGER IF EXISTS usuarios_audit_update$$
 CREATE TRIGGER usuarios_audit_update
 AFTER UPDATE ON Usuarios
 FOR EACH ROW
-BEGIN
+corpo: BEGIN
     DECLARE campos_alterados TEXT DEFAULT '';
+
+    -- Com AUDITORIA_MODO = 'aplicacao' o evento é gravado em lote pelo Django
+    IF @auditoria_aplicacao = 1 THEN
+        LEAVE corpo;
+    END IF;
     
     IF OLD.Multa_atual != NEW.Multa_atual THEN
         SET campos_alterados = CONCAT(campos_alterados, 'Multa: R$ ', OLD.Multa_atual, ' -> R$ ', NEW.Multa_atual, '; ');
@@ -314,7 +360,13 @@ DROP TRIGGER IF EXISTS emprestimos_diminuir_estoque$$
 CREATE TRIGGER emprestimos_diminuir_estoque
 AFTER INSERT ON Emprestimos
 FOR EACH ROW
-BEGIN
+corpo: BEGIN
+    -- Na carga de dados o estoque é acertado de uma vez ao final; em
+    -- emprestimos_registrar a baixa já foi feita pelo procedimento
+    IF @carga_dados = 1 OR @estoque_reservado = 1 THEN
+        LEAVE corpo;
+    END IF;
+
     UPDATE Livros
     SET Quantidade_disponivel = Quantidade_disponivel - 1
     WHERE ID_livro = NEW.Livro_id;
@@ -484,20 +536,577 @@ BEGIN
     SET NEW.Resumo = TRIM(COALESCE(NEW.Resumo, ''));
 END$$
 
-SET GLOBAL event_scheduler = ON;
-
+-- O evento diário atualizar_emprestimos_atrasados (UPDATE em todos os
+-- pendentes) foi substituído por manage.py marcar_atrasados, que processa
+-- só os pendentes já vencidos, pelo índice (Status, data prevista).
 DELIMITER $$
 
 DROP EVENT IF EXISTS atualizar_emprestimos_atrasados$$
-CREATE EVENT atualizar_emprestimos_atrasados
-ON SCHEDULE EVERY 1 DAY
-STARTS CURRENT_DATE + INTERVAL 1 DAY
-DO
+
+DELIMITER ;
+
+
+-- Modelo de leitura do catálogo: uma linha por livro já com os nomes de
+-- autor, gênero e editora, mantida pelos triggers abaixo. A listagem de
+-- livros lê daqui sem precisar dos JOINs. A collation _ai_ci torna a busca
+-- textual (FULLTEXT) insensível a acentos e maiúsculas.
+CREATE TABLE IF NOT EXISTS Catalogo (
+    ID_livro INT PRIMARY KEY,
+    Titulo VARCHAR(255) NOT NULL,
+    ISBN VARCHAR(13) NOT NULL,
+    Ano_publicacao INT,
+    Quantidade_disponivel INT,
+    Autor_id INT,
+    Nome_autor VARCHAR(255),
+    Genero_id INT,
+    Nome_genero VARCHAR(255),
+    Editora_id INT,
+    Nome_editora VARCHAR(255),
+    Resumo TEXT,
+    INDEX idx_catalogo_titulo (Titulo),
+    INDEX idx_catalogo_autor (Autor_id),
+    INDEX idx_catalogo_genero (Genero_id),
+    INDEX idx_catalogo_editora (Editora_id),
+    INDEX idx_catalogo_quantidade (Quantidade_disponivel),
+    FULLTEXT INDEX ft_catalogo_busca (Titulo, Resumo, Nome_autor, Nome_genero)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+
+DELIMITER $$
+
+DROP TRIGGER IF EXISTS catalogo_livros_insert$$
+CREATE TRIGGER catalogo_livros_insert
+AFTER INSERT ON Livros
+FOR EACH ROW
 BEGIN
-    -- Atualiza empréstimos pendentes que passaram da data prevista
+    INSERT INTO Catalogo (
+        ID_livro, Titulo, ISBN, Ano_publicacao, Quantidade_disponivel,
+        Autor_id, Nome_autor, Genero_id, Nome_genero, Editora_id, Nome_editora, Resumo
+    ) VALUES (
+        NEW.ID_livro, NEW.Titulo, NEW.ISBN, NEW.Ano_publicacao, NEW.Quantidade_disponivel,
+        NEW.Autor_id, (SELECT Nome_autor FROM Autores WHERE ID_autor = NEW.Autor_id),
+        NEW.Genero_id, (SELECT Nome_genero FROM Generos WHERE ID_genero = NEW.Genero_id),
+        NEW.Editora_id, (SELECT Nome_editora FROM Editoras WHERE ID_editora = NEW.Editora_id),
+        NEW.Resumo
+    );
+END$$
+
+
+DROP TRIGGER IF EXISTS catalogo_livros_update$$
+CREATE TRIGGER catalogo_livros_update
+AFTER UPDATE ON Livros
+FOR EACH ROW
+BEGIN
+    -- Cobre também as mudanças de estoque feitas pelos triggers de empréstimo
+    INSERT INTO Catalogo (
+        ID_livro, Titulo, ISBN, Ano_publicacao, Quantidade_disponivel,
+        Autor_id, Nome_autor, Genero_id, Nome_genero, Editora_id, Nome_editora, Resumo
+    ) VALUES (
+        NEW.ID_livro, NEW.Titulo, NEW.ISBN, NEW.Ano_publicacao, NEW.Quantidade_disponivel,
+        NEW.Autor_id, (SELECT Nome_autor FROM Autores WHERE ID_autor = NEW.Autor_id),
+        NEW.Genero_id, (SELECT Nome_genero FROM Generos WHERE ID_genero = NEW.Genero_id),
+        NEW.Editora_id, (SELECT Nome_editora FROM Editoras WHERE ID_editora = NEW.Editora_id),
+        NEW.Resumo
+    )
+    ON DUPLICATE KEY UPDATE
+        Titulo = VALUES(Titulo),
+        ISBN = VALUES(ISBN),
+        Ano_publicacao = VALUES(Ano_publicacao),
+        Quantidade_disponivel = VALUES(Quantidade_disponivel),
+        Autor_id = VALUES(Autor_id),
+        Nome_autor = VALUES(Nome_autor),
+        Genero_id = VALUES(Genero_id),
+        Nome_genero = VALUES(Nome_genero),
+        Editora_id = VALUES(Editora_id),
+        Nome_editora = VALUES(Nome_editora),
+        Resumo = VALUES(Resumo);
+END$$
+
+
+DROP TRIGGER IF EXISTS catalogo_livros_delete$$
+CREATE TRIGGER catalogo_livros_delete
+AFTER DELETE ON Livros
+FOR EACH ROW
+BEGIN
+    DELETE FROM Catalogo WHERE ID_livro = OLD.ID_livro;
+END$$
+
+
+DROP TRIGGER IF EXISTS catalogo_autores_update$$
+CREATE TRIGGER catalogo_autores_update
+AFTER UPDATE ON Autores
+FOR EACH ROW
+BEGIN
+    IF OLD.Nome_autor != NEW.Nome_autor THEN
+        UPDATE Catalogo SET Nome_autor = NEW.Nome_autor WHERE Autor_id = NEW.ID_autor;
+    END IF;
+END$$
+
+
+DROP TRIGGER IF EXISTS catalogo_generos_update$$
+CREATE TRIGGER catalogo_generos_update
+AFTER UPDATE ON Generos
+FOR EACH ROW
+BEGIN
+    IF OLD.Nome_genero != NEW.Nome_genero THEN
+        UPDATE Catalogo SET Nome_genero = NEW.Nome_genero WHERE Genero_id = NEW.ID_genero;
+    END IF;
+END$$
+
+
+DROP TRIGGER IF EXISTS catalogo_editoras_update$$
+CREATE TRIGGER catalogo_editoras_update
+AFTER UPDATE ON Editoras
+FOR EACH ROW
+BEGIN
+    IF OLD.Nome_editora != NEW.Nome_editora THEN
+        UPDATE Catalogo SET Nome_editora = NEW.Nome_editora WHERE Editora_id = NEW.ID_editora;
+    END IF;
+END$$
+
+DELIMITER ;
+
+
+-- Procedimentos usados pelas telas de empréstimo: gravam e devolvem os
+-- valores gerados (id, datas padrão, atraso) numa única ida ao banco.
+--
+-- emprestimos_registrar baixa o estoque com um UPDATE condicional antes
+-- do INSERT: dois empréstimos do último exemplar não passam juntos e o
+-- estoque nunca fica negativo. Se o INSERT falhar, o exemplar é devolvido
+-- (na transação de emprestimos/circulacao.py: emprestar, o ROLLBACK já
+-- desfaz tudo). O usuário é travado primeiro, na mesma ordem de
+-- emprestar_lote, para não haver deadlock entre os dois caminhos.
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS emprestimos_registrar$$
+CREATE PROCEDURE emprestimos_registrar(
+    IN p_usuario INT,
+    IN p_livro INT,
+    IN p_data_emprestimo DATE,
+    IN p_data_prevista DATE
+)
+BEGIN
+    DECLARE v_id INT;
+    DECLARE v_usuario INT;
+    DECLARE v_reservado BOOLEAN DEFAULT FALSE;
+
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        SET @estoque_reservado = NULL;
+        IF v_reservado THEN
+            UPDATE Livros
+            SET Quantidade_disponivel = Quantidade_disponivel + 1
+            WHERE ID_livro = p_livro;
+        END IF;
+        RESIGNAL;
+    END;
+
+    SELECT ID_usuario INTO v_usuario
+    FROM Usuarios WHERE ID_usuario = p_usuario
+    FOR UPDATE;
+
+    UPDATE Livros
+    SET Quantidade_disponivel = Quantidade_disponivel - 1
+    WHERE ID_livro = p_livro AND Quantidade_disponivel > 0;
+
+    IF ROW_COUNT() = 0 THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Livro não disponível para empréstimo';
+    END IF;
+
+    SET v_reservado = TRUE;
+    SET @estoque_reservado = 1;
+
+    INSERT INTO Emprestimos
+        (Usuario_id, Livro_id, Data_emprestimo, Data_devolucao_prevista, Status_emprestimo)
+    VALUES
+        (p_usuario, p_livro, p_data_emprestimo, p_data_prevista, 'pendente');
+
+    SET v_id = LAST_INSERT_ID();
+    SET @estoque_reservado = NULL;
+
+    SELECT e.ID_emprestimo,
+           e.Data_emprestimo,
+           e.Data_devolucao_prevista,
+           l.Titulo
+    FROM Emprestimos e
+    JOIN Livros l ON e.Livro_id = l.ID_livro
+    WHERE e.ID_emprestimo = v_id;
+END$$
+
+
+DROP PROCEDURE IF EXISTS emprestimos_atualizar$$
+CREATE PROCEDURE emprestimos_atualizar(
+    IN p_id INT,
+    IN p_usuario INT,
+    IN p_livro INT,
+    IN p_data_emprestimo DATE,
+    IN p_data_prevista DATE,
+    IN p_data_real DATE,
+    IN p_status VARCHAR(20)
+)
+BEGIN
+    DECLARE v_status_antigo VARCHAR(20);
+
+    SELECT Status_emprestimo INTO v_status_antigo
+    FROM Emprestimos WHERE ID_emprestimo = p_id;
+
     UPDATE Emprestimos
-    SET Status_emprestimo = 'atrasado'
-    WHERE Status_emprestimo = 'pendente'
-    AND Data_devolucao_prevista < CURDATE()
-    AND Data_devolucao_real IS NULL;
-END$$
\ No newline at end of file
+    SET Usuario_id = p_usuario,
+        Livro_id = p_livro,
+        Data_emprestimo = p_data_emprestimo,
+        Data_devolucao_prevista = p_data_prevista,
+        Data_devolucao_real = p_data_real,
+        Status_emprestimo = p_status
+    WHERE ID_emprestimo = p_id;
+
+    SELECT v_status_antigo AS Status_antigo,
+           Status_emprestimo,
+           Data_devolucao_real,
+           DATEDIFF(
+               COALESCE(Data_devolucao_real, CURDATE()),
+               Data_devolucao_prevista
+           ) AS atraso
+    FROM Emprestimos
+    WHERE ID_emprestimo = p_id;
+END$$
+
+DELIMITER ;
+
+
+-- Agregados do painel da página inicial. Os triggers abaixo cobrem todos
+-- os caminhos de escrita de Emprestimos (telas, lote, procedimentos e
+-- manage.py marcar_atrasados), mas não tocam nas tabelas Painel_*: cada
+-- escrita só acrescenta a Painel_pendentes a contribuição antiga do
+-- empréstimo (Sinal -1) e a nova (Sinal +1). Assim nenhuma transação de
+-- empréstimo disputa as mesmas linhas de contador. As pendências são
+-- somadas aos Painel_* por manage.py consolidar_painel, agendado no cron
+-- (app/painel.py). Para recalcular do zero: manage.py reconstruir_painel.
+--
+-- Um empréstimo conta como atraso no dia seguinte à data prevista quando
+-- foi marcado 'atrasado' ou devolvido depois da data prevista; a mesma
+-- regra vale para a reconstrução.
+CREATE TABLE IF NOT EXISTS Painel_dia (
+    Dia DATE PRIMARY KEY,
+    Emprestimos INT NOT NULL DEFAULT 0,
+    Devolucoes INT NOT NULL DEFAULT 0,
+    Atrasos INT NOT NULL DEFAULT 0
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS Painel_livros (
+    Livro_id INT PRIMARY KEY,
+    Emprestimos INT NOT NULL DEFAULT 0,
+    INDEX idx_painel_livros_emprestimos (Emprestimos)
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS Painel_generos (
+    Genero_id INT PRIMARY KEY,
+    Emprestimos INT NOT NULL DEFAULT 0,
+    INDEX idx_painel_generos_emprestimos (Emprestimos)
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS Painel_situacao (
+    Status_emprestimo VARCHAR(20) PRIMARY KEY,
+    Total INT NOT NULL DEFAULT 0
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS Painel_pendentes (
+    ID_pendente BIGINT AUTO_INCREMENT PRIMARY KEY,
+    Sinal TINYINT NOT NULL,
+    Livro_id INT,
+    Status_emprestimo VARCHAR(20),
+    Dia_emprestimo DATE,
+    Dia_devolucao DATE,
+    Dia_atraso DATE
+) ENGINE=InnoDB;
+
+
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS painel_anotar$$
+CREATE PROCEDURE painel_anotar(
+    IN p_sinal INT,
+    IN p_livro INT,
+    IN p_status VARCHAR(20),
+    IN p_data_emprestimo DATE,
+    IN p_data_prevista DATE,
+    IN p_data_real DATE
+)
+BEGIN
+    INSERT INTO Painel_pendentes
+    (Sinal, Livro_id, Status_emprestimo, Dia_emprestimo, Dia_devolucao, Dia_atraso)
+    VALUES (
+        p_sinal,
+        p_livro,
+        p_status,
+        p_data_emprestimo,
+        IF(p_status = 'devolvido', p_data_real, NULL),
+        IF(
+            p_status = 'atrasado' OR (p_status = 'devolvido' AND p_data_real > p_data_prevista),
+            DATE_ADD(p_data_prevista, INTERVAL 1 DAY),
+            NULL
+        )
+    );
+END$$
+
+
+DROP TRIGGER IF EXISTS painel_emprestimos_insert$$
+CREATE TRIGGER painel_emprestimos_insert
+AFTER INSERT ON Emprestimos
+FOR EACH ROW
+corpo: BEGIN
+    -- Na carga de dados o painel é recalculado ao final (reconstruir_painel)
+    IF @carga_dados = 1 THEN
+        LEAVE corpo;
+    END IF;
+
+    CALL painel_anotar(
+        1, NEW.Livro_id, NEW.Status_emprestimo,
+        NEW.Data_emprestimo, NEW.Data_devolucao_prevista, NEW.Data_devolucao_real
+    );
+END$$
+
+
+DROP TRIGGER IF EXISTS painel_emprestimos_update$$
+CREATE TRIGGER painel_emprestimos_update
+AFTER UPDATE ON Emprestimos
+FOR EACH ROW
+corpo: BEGIN
+    IF @carga_dados = 1 THEN
+        LEAVE corpo;
+    END IF;
+
+    -- Livro, situação ou datas mudaram: troca a contribuição antiga pela nova
+    IF NOT (OLD.Livro_id <=> NEW.Livro_id
+            AND OLD.Status_emprestimo <=> NEW.Status_emprestimo
+            AND OLD.Data_emprestimo <=> NEW.Data_emprestimo
+            AND OLD.Data_devolucao_prevista <=> NEW.Data_devolucao_prevista
+            AND OLD.Data_devolucao_real <=> NEW.Data_devolucao_real) THEN
+        CALL painel_anotar(
+            -1, OLD.Livro_id, OLD.Status_emprestimo,
+            OLD.Data_emprestimo, OLD.Data_devolucao_prevista, OLD.Data_devolucao_real
+        );
+        CALL painel_anotar(
+            1, NEW.Livro_id, NEW.Status_emprestimo,
+            NEW.Data_emprestimo, NEW.Data_devolucao_prevista, NEW.Data_devolucao_real
+        );
+    END IF;
+END$$
+
+
+DROP TRIGGER IF EXISTS painel_emprestimos_delete$$
+CREATE TRIGGER painel_emprestimos_delete
+AFTER DELETE ON Emprestimos
+FOR EACH ROW
+corpo: BEGIN
+    IF @carga_dados = 1 THEN
+        LEAVE corpo;
+    END IF;
+
+    CALL painel_anotar(
+        -1, OLD.Livro_id, OLD.Status_emprestimo,
+        OLD.Data_emprestimo, OLD.Data_devolucao_prevista, OLD.Data_devolucao_real
+    );
+END$$
+
+DELIMITER ;
+
+
+-- Versão de cada registro exibido nas páginas de detalhes, para ETag e
+-- Last-Modified (biblioteca/versoes.py). Cada escrita incrementa a versão
+-- do registro e, quando muda um nome exibido em outra página, também a dos
+-- registros que o mostram (autor/gênero/editora -> livros, título do
+-- livro e nome do usuário -> empréstimos). Registro sem linha aqui é
+-- sempre renderizado normalmente.
+CREATE TABLE IF NOT EXISTS Versoes (
+    Tabela VARCHAR(30) NOT NULL,
+    ID_registro INT NOT NULL,
+    Versao BIGINT NOT NULL DEFAULT 1,
+    Alterado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (Tabela, ID_registro)
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO Versoes (Tabela, ID_registro) SELECT 'Livros', ID_livro FROM Livros;
+INSERT IGNORE INTO Versoes (Tabela, ID_registro) SELECT 'Autores', ID_autor FROM Autores;
+INSERT IGNORE INTO Versoes (Tabela, ID_registro) SELECT 'Editoras', ID_editora FROM Editoras;
+INSERT IGNORE INTO Versoes (Tabela, ID_registro) SELECT 'Usuarios', ID_usuario FROM Usuarios;
+INSERT IGNORE INTO Versoes (Tabela, ID_registro) SELECT 'Emprestimos', ID_emprestimo FROM Emprestimos;
+
+
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS versoes_incrementar$$
+CREATE PROCEDURE versoes_incrementar(IN p_tabela VARCHAR(30), IN p_id INT)
+BEGIN
+    INSERT INTO Versoes (Tabela, ID_registro) VALUES (p_tabela, p_id)
+    ON DUPLICATE KEY UPDATE Versao = Versao + 1;
+END$$
+
+
+DROP TRIGGER IF EXISTS versoes_livros_insert$$
+CREATE TRIGGER versoes_livros_insert
+AFTER INSERT ON Livros
+FOR EACH ROW
+BEGIN
+    CALL versoes_incrementar('Livros', NEW.ID_livro);
+END$$
+
+DROP TRIGGER IF EXISTS versoes_livros_update$$
+CREATE TRIGGER versoes_livros_update
+AFTER UPDATE ON Livros
+FOR EACH ROW
+BEGIN
+    CALL versoes_incrementar('Livros', NEW.ID_livro);
+
+    IF NOT (OLD.Titulo <=> NEW.Titulo) THEN
+        INSERT INTO Versoes (Tabela, ID_registro)
+        SELECT 'Emprestimos', ID_emprestimo FROM Emprestimos WHERE Livro_id = NEW.ID_livro
+        ON DUPLICATE KEY UPDATE Versao = Versao + 1;
+    END IF;
+END$$
+
+DROP TRIGGER IF EXISTS versoes_livros_delete$$
+CREATE TRIGGER versoes_livros_delete
+AFTER DELETE ON Livros
+FOR EACH ROW
+BEGIN
+    DELETE FROM Versoes WHERE Tabela = 'Livros' AND ID_registro = OLD.ID_livro;
+END$$
+
+
+DROP TRIGGER IF EXISTS versoes_autores_insert$$
+CREATE TRIGGER versoes_autores_insert
+AFTER INSERT ON Autores
+FOR EACH ROW
+BEGIN
+    CALL versoes_incrementar('Autores', NEW.ID_autor);
+END$$
+
+DROP TRIGGER IF EXISTS versoes_autores_update$$
+CREATE TRIGGER versoes_autores_update
+AFTER UPDATE ON Autores
+FOR EACH ROW
+BEGIN
+    CALL versoes_incrementar('Autores', NEW.ID_autor);
+
+    IF NOT (OLD.Nome_autor <=> NEW.Nome_autor) THEN
+        INSERT INTO Versoes (Tabela, ID_registro)
+        SELECT 'Livros', ID_livro FROM Livros WHERE Autor_id = NEW.ID_autor
+        ON DUPLICATE KEY UPDATE Versao = Versao + 1;
+    END IF;
+END$$
+
+DROP TRIGGER IF EXISTS versoes_autores_delete$$
+CREATE TRIGGER versoes_autores_delete
+AFTER DELETE ON Autores
+FOR EACH ROW
+BEGIN
+    DELETE FROM Versoes WHERE Tabela = 'Autores' AND ID_registro = OLD.ID_autor;
+END$$
+
+
+DROP TRIGGER IF EXISTS versoes_editoras_insert$$
+CREATE TRIGGER versoes_editoras_insert
+AFTER INSERT ON Editoras
+FOR EACH ROW
+BEGIN
+    CALL versoes_incrementar('Editoras', NEW.ID_editora);
+END$$
+
+DROP TRIGGER IF EXISTS versoes_editoras_update$$
+CREATE TRIGGER versoes_editoras_update
+AFTER UPDATE ON Editoras
+FOR EACH ROW
+BEGIN
+    CALL versoes_incrementar('Editoras', NEW.ID_editora);
+
+    IF NOT (OLD.Nome_editora <=> NEW.Nome_editora) THEN
+        INSERT INTO Versoes (Tabela, ID_registro)
+        SELECT 'Livros', ID_livro FROM Livros WHERE Editora_id = NEW.ID_editora
+        ON DUPLICATE KEY UPDATE Versao = Versao + 1;
+    END IF;
+END$$
+
+DROP TRIGGER IF EXISTS versoes_editoras_delete$$
+CREATE TRIGGER versoes_editoras_delete
+AFTER DELETE ON Editoras
+FOR EACH ROW
+BEGIN
+    DELETE FROM Versoes WHERE Tabela = 'Editoras' AND ID_registro = OLD.ID_editora;
+END$$
+
+
+DROP TRIGGER IF EXISTS versoes_generos_update$$
+CREATE TRIGGER versoes_generos_update
+AFTER UPDATE ON Generos
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.Nome_genero <=> NEW.Nome_genero) THEN
+        INSERT INTO Versoes (Tabela, ID_registro)
+        SELECT 'Livros', ID_livro FROM Livros WHERE Genero_id = NEW.ID_genero
+        ON DUPLICATE KEY UPDATE Versao = Versao + 1;
+    END IF;
+END$$
+
+
+DROP TRIGGER IF EXISTS versoes_usuarios_insert$$
+CREATE TRIGGER versoes_usuarios_insert
+AFTER INSERT ON Usuarios
+FOR EACH ROW
+BEGIN
+    CALL versoes_incrementar('Usuarios', NEW.ID_usuario);
+END$$
+
+DROP TRIGGER IF EXISTS versoes_usuarios_update$$
+CREATE TRIGGER versoes_usuarios_update
+AFTER UPDATE ON Usuarios
+FOR EACH ROW
+BEGIN
+    CALL versoes_incrementar('Usuarios', NEW.ID_usuario);
+
+    IF NOT (OLD.Nome_usuario <=> NEW.Nome_usuario) THEN
+        INSERT INTO Versoes (Tabela, ID_registro)
+        SELECT 'Emprestimos', ID_emprestimo FROM Emprestimos WHERE Usuario_id = NEW.ID_usuario
+        ON DUPLICATE KEY UPDATE Versao = Versao + 1;
+    END IF;
+END$$
+
+DROP TRIGGER IF EXISTS versoes_usuarios_delete$$
+CREATE TRIGGER versoes_usuarios_delete
+AFTER DELETE ON Usuarios
+FOR EACH ROW
+BEGIN
+    DELETE FROM Versoes WHERE Tabela = 'Usuarios' AND ID_registro = OLD.ID_usuario;
+END$$
+
+
+DROP TRIGGER IF EXISTS versoes_emprestimos_insert$$
+CREATE TRIGGER versoes_emprestimos_insert
+AFTER INSERT ON Emprestimos
+FOR EACH ROW
+corpo: BEGIN
+    -- Na carga de dados os empréstimos ficam sem versão (renderizados sempre)
+    IF @carga_dados = 1 THEN
+        LEAVE corpo;
+    END IF;
+
+    CALL versoes_incrementar('Emprestimos', NEW.ID_emprestimo);
+END$$
+
+DROP TRIGGER IF EXISTS versoes_emprestimos_update$$
+CREATE TRIGGER versoes_emprestimos_update
+AFTER UPDATE ON Emprestimos
+FOR EACH ROW
+BEGIN
+    CALL versoes_incrementar('Emprestimos', NEW.ID_emprestimo);
+END$$
+
+DROP TRIGGER IF EXISTS versoes_emprestimos_delete$$
+CREATE TRIGGER versoes_emprestimos_delete
+AFTER DELETE ON Emprestimos
+FOR EACH ROW
+BEGIN
+    DELETE FROM Versoes WHERE Tabela = 'Emprestimos' AND ID_registro = OLD.ID_emprestimo;
+END$$
+
+DELIMITER ;
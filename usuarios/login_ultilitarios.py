@@ -1,27 +1,116 @@
-from django.db import connection
-from werkzeug.security import generate_password_hash, check_password_hash
+"""
+Cadastro e autenticação de usuários.
+
+O hash da senha (scrypt/pbkdf2 do werkzeug) é caro de propósito. Nas views
+síncronas ele roda na própria thread da requisição: repassá-lo a um pool e
+esperar o resultado só ocuparia duas threads em vez de uma. Nas versões
+assíncronas (PILHA_VIEWS = 'async') ele roda num pool limitado de threads
+ou de processos (SENHA_POOL / SENHA_TRABALHADORES em settings.py), e o
+laço de eventos segue atendendo outras requisições. O custo vem de
+SENHA_METODO; hashes gravados com outro método são refeitos no próximo
+login bem-sucedido.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from biblioteca.db import query, execute
+
+
+_pool = None
+_trava = threading.Lock()
+
+
+def pool():
+    """Pool de hash das versões assíncronas, criado no primeiro uso"""
+    global _pool
+    if _pool is None:
+        with _trava:
+            if _pool is None:
+                trabalhadores = settings.SENHA_TRABALHADORES or os.cpu_count() or 1
+                if settings.SENHA_POOL == 'processo':
+                    _pool = ProcessPoolExecutor(max_workers=trabalhadores)
+                else:
+                    _pool = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix='senha')
+    return _pool
+
+
+def _werkzeug():
+    """Importado no primeiro uso, para não pesar na subida dos workers"""
+    from werkzeug.security import generate_password_hash, check_password_hash
+    return generate_password_hash, check_password_hash
+
+
+def gerar_hash(senha):
+    generate_password_hash, _ = _werkzeug()
+    return generate_password_hash(senha, settings.SENHA_METODO, settings.SENHA_SALT_TAMANHO)
+
+
+def conferir_hash(senha_hash, senha):
+    _, check_password_hash = _werkzeug()
+    return check_password_hash(senha_hash, senha)
+
+
+async def agerar_hash(senha):
+    generate_password_hash, _ = _werkzeug()
+    return await asyncio.get_running_loop().run_in_executor(
+        pool(), generate_password_hash, senha, settings.SENHA_METODO, settings.SENHA_SALT_TAMANHO
+    )
+
+
+async def aconferir_hash(senha_hash, senha):
+    _, check_password_hash = _werkzeug()
+    return await asyncio.get_running_loop().run_in_executor(
+        pool(), check_password_hash, senha_hash, senha
+    )
+
+
+def precisa_atualizar(senha_hash):
+    """O hash foi gerado com um método/custo diferente do configurado?"""
+    return senha_hash.split('$', 1)[0] != settings.SENHA_METODO
+
+
+def _buscar(email):
+    usuario = query("SELECT * FROM Usuarios WHERE Email = %s", [email])
+    return usuario[0] if usuario else None
+
+
+def _atualizar_hash(id, senha_hash):
+    execute("UPDATE Usuarios SET Senha = %s WHERE ID_usuario = %s", [senha_hash, id])
 
 
 def criar_usuario(nome, email, telefone, data, multa, senha):
-    senha_hash = generate_password_hash(senha)
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            INSERT INTO Usuarios (Nome_usuario, Email, Numero_telefone, Data_inscricao, Multa_atual, Senha)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, [nome, email, telefone, data, multa, senha_hash])
+    senha_hash = gerar_hash(senha)
+    execute("""
+        INSERT INTO Usuarios (Nome_usuario, Email, Numero_telefone, Data_inscricao, Multa_atual, Senha)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, [nome, email, telefone, data, multa, senha_hash])
 
 
 def autenticar_usuario(email, senha):
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM Usuarios WHERE Email = %s", [email])
-        user = cursor.fetchone()
+    user = _buscar(email)
+
+    if not user or not conferir_hash(user.Senha, senha):
+        return None
 
-        if not user:
-            return None
+    if precisa_atualizar(user.Senha):
+        _atualizar_hash(user.ID_usuario, gerar_hash(senha))
 
-        senha_hash = user[6]
+    return user
 
-        if check_password_hash(senha_hash, senha):
-            return user
 
+async def aautenticar_usuario(email, senha):
+    """Versão assíncrona: o banco roda via sync_to_async e o hash no pool"""
+    user = await sync_to_async(_buscar)(email)
+
+    if not user or not await aconferir_hash(user.Senha, senha):
         return None
+
+    if precisa_atualizar(user.Senha):
+        await sync_to_async(_atualizar_hash)(user.ID_usuario, await agerar_hash(senha))
+
+    return user
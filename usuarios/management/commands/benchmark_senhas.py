@@ -0,0 +1,53 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede logins por segundo (conferência de hash) na thread da requisição "
+        "e nos pools de threads e de processos, por núcleo usado"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument('--metodo', default=settings.SENHA_METODO)
+        parser.add_argument('--trabalhadores', type=int, default=os.cpu_count() or 1)
+
+    def medir(self, executor, senha_hash, logins):
+        inicio = time.perf_counter()
+        if executor is None:
+            for _ in range(logins):
+                check_password_hash(senha_hash, 'senha-de-teste')
+        else:
+            futuros = [
+                executor.submit(check_password_hash, senha_hash, 'senha-de-teste')
+                for _ in range(logins)
+            ]
+            for futuro in futuros:
+                futuro.result()
+        return logins / (time.perf_counter() - inicio)
+
+    def handle(self, *args, **options):
+        logins, metodo, trabalhadores = options['logins'], options['metodo'], options['trabalhadores']
+        nucleos = min(trabalhadores, os.cpu_count() or 1)
+        senha_hash = generate_password_hash('senha-de-teste', method=metodo)
+
+        self.stdout.write(f"método {metodo}, {logins} logins, {trabalhadores} trabalhadores")
+
+        por_segundo = self.medir(None, senha_hash, logins)
+        self.stdout.write(f"{'inline':>9}: {por_segundo:8.1f} logins/s ({por_segundo:.1f} por núcleo)")
+
+        for nome, classe in [('threads', ThreadPoolExecutor), ('processos', ProcessPoolExecutor)]:
+            with classe(max_workers=trabalhadores) as executor:
+                # Aquece o pool antes de medir
+                list(executor.map(check_password_hash, [senha_hash] * trabalhadores,
+                                  ['senha-de-teste'] * trabalhadores))
+                por_segundo = self.medir(executor, senha_hash, logins)
+            self.stdout.write(
+                f"{nome:>9}: {por_segundo:8.1f} logins/s ({por_segundo / nucleos:.1f} por núcleo)"
+            )
@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Login assíncrono (hash no pool, banco via sync_to_async) quando PILHA_VIEWS = 'async'
+ASSINCRONA = settings.PILHA_VIEWS == 'async'
+
 urlpatterns = [
 
     # Usuarios
@@ -9,7 +13,7 @@ urlpatterns = [
     path('delete/<int:id>/', views.usuarios_delete, name='usuarios_delete'),
     path('view/<int:id>/', views.usuario_detalhes, name='usuario_detalhes'),
 
-    path('login/', views.login_view, name='login'),
+    path('login/', views.alogin_view if ASSINCRONA else views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('register/', views.register_view, name='register'),
 ]
@@ -1,7 +1,13 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect
-from django.db import connection, DatabaseError
+from django.db import DatabaseError
 from django.contrib import messages
-from .login_ultilitarios import autenticar_usuario, criar_usuario
+from biblioteca.db import query, execute
+from biblioteca import fragmentos
+from biblioteca.paginacao import paginar
+from biblioteca.versoes import condicional
+from auditoria import fila as auditoria
+from .login_ultilitarios import autenticar_usuario, aautenticar_usuario, criar_usuario
 from datetime import date
 
 
@@ -13,23 +19,10 @@ def login_required(view_func):
     return wrapper
 
 
-def query(sql, params=None):
-    with connection.cursor() as cursor:
-        cursor.execute(sql, params or [])
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-
-def execute(sql, params=None):
-    with connection.cursor() as cursor:
-        cursor.execute(sql, params or [])
-    return True
-
-
 @login_required
 def usuarios(request):
-    dados = query("SELECT * FROM Usuarios")
-    return render(request, 'usuarios.html', {'dados': dados})
+    contexto = paginar(request, 'Usuarios', 'ID_usuario', {'nome': 'Nome_usuario'})
+    return render(request, 'usuarios.html', contexto)
 
 
 @login_required
@@ -53,6 +46,15 @@ def usuarios_edit(request, id):
                 WHERE ID_usuario=%s
             """, [nome, email, telefone, multa, id])
 
+            auditoria.registrar(
+                'Usuarios', 'UPDATE', id,
+                dados_novos=f"Nome: {nome}, Multa: R$ {multa}",
+                descricao=f"Usuário atualizado: {nome}",
+                usuario=request.session.get('nome_usuario'),
+            )
+
+            fragmentos.invalidar('emprestimos')
+
             messages.success(request, "Seus dados foram atualizados com sucesso!")
             return redirect('usuarios')
 
@@ -73,6 +75,7 @@ def usuarios_delete(request, id):
 
     try:
         execute("DELETE FROM Usuarios WHERE ID_usuario=%s", [id])
+        fragmentos.invalidar('emprestimos')
         messages.success(request, "Conta removida com sucesso.")
 
     except DatabaseError as e:
@@ -82,6 +85,7 @@ def usuarios_delete(request, id):
 
 
 @login_required
+@condicional('Usuarios')
 def usuario_detalhes(request, id):
     usuario = query("SELECT * FROM Usuarios WHERE ID_usuario=%s", [id])[0]
     return render(request, 'usuario_detalhes.html', {'usuario': usuario})
@@ -132,6 +136,26 @@ def login_view(request):
     return render(request, 'login.html')
 
 
+async def alogin_view(request):
+    # Assíncrona: enquanto o hash roda no pool o worker atende outras requisições
+    if request.method == 'POST':
+        email = request.POST['email']
+        senha = request.POST['senha']
+
+        user = await aautenticar_usuario(email, senha)
+
+        if user:
+            await request.session.aset('usuario_logado', user[0])
+            await request.session.aset('nome_usuario', user[1])
+
+            messages.success(request, f"Bem-vindo, {user[1]}!")
+            return redirect('index')
+
+        messages.error(request, "Email ou senha incorretos.")
+
+    return await sync_to_async(render)(request, 'login.html')
+
+
 @login_required
 def logout_view(request):
     request.session.flush()